@@ -90,6 +90,23 @@ async def start_session_gc():
 
     asyncio.create_task(_gc_loop())
 
+
+@app.on_event("startup")
+async def start_proctoring_inference():
+    # Spawn the proctoring inference workers (see PROCTOR_WORKERS)
+    await proctoring.start_inference_pool()
+    # Write-behind proctoring telemetry (see PROCTOR_TELEMETRY)
+    proctoring.start_telemetry()
+    # Evidence clips of confirmed alerts (see PROCTOR_EVIDENCE_STORE)
+    proctoring.start_evidence()
+
+
+@app.on_event("shutdown")
+def stop_proctoring_inference():
+    proctoring.stop_inference_pool()
+    proctoring.stop_telemetry()
+    proctoring.stop_evidence()
+
 app.include_router(courseRoute.router) 
 app.include_router(signup.router)
 app.include_router(login.router)
@@ -1,13 +1,50 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Depends, Header, HTTPException, WebSocket, WebSocketDisconnect
+import asyncio
 import cv2
 import numpy as np
 import base64
 import json
-from collections import deque
-from typing import Dict, List, Tuple, Optional
+from typing import Callable, Dict, List, Tuple, Optional
 import mediapipe as mp
 import logging
 import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pydantic import BaseModel
+
+from utils.proctoring.alert_rules import AlertState, assess_frame, finish_assessment
+from utils.proctoring.capture_control import CaptureController
+from utils.proctoring.decode import EncodedFrame
+from utils.proctoring.detector_backends import UltralyticsBackend, load_detector_backend
+from utils.proctoring.evidence import (
+    DirectoryEvidenceStore, EvidenceRecorder, EvidenceWriter, GridFSEvidenceStore,
+)
+from utils.proctoring.face_features import (
+    CHIN, IRIS_INDEX, LEFT_EYE_CORNER, LEFT_EYE_LANDMARKS, LEFT_IRIS_CENTER, LEFT_MOUTH_CORNER,
+    NOSE_TIP, RIGHT_EYE_CORNER, RIGHT_EYE_LANDMARKS, RIGHT_IRIS_CENTER, RIGHT_MOUTH_CORNER,
+    draw_iris_points, face_box, landmarks_to_array,
+)
+from utils.proctoring.graph_pool import GraphPool
+from utils.proctoring.head_pose import HeadPoseEstimator
+from utils.proctoring.history import RingSeries
+from utils.proctoring.inference_pool import InferencePool
+from utils.proctoring.ingest import LatestFrameSlot, PendingFrame
+from utils.proctoring.landmark_tracker import LandmarkFlowTracker
+from utils.proctoring.motion import MotionGate
+from utils.proctoring.offline import find_videos, run_offline_analysis
+from utils.proctoring.profiles import AlertThresholds, ProctoringProfile, resolve_profile
+from utils.proctoring.replay import LandmarkRecorder
+from utils.proctoring.roi import StickyRoi, crop_rgb, face_roi, remap_landmarks, remap_points, upper_body_roi
+from utils.proctoring.stage_timing import DISABLED_TIMER, StageStats, StageTimer, summarize
+from utils.proctoring.telemetry import (
+    SessionTelemetry, TelemetryWriter, ensure_telemetry_collection, telemetry_timeline,
+)
+from utils.proctoring.workspace import FrameWorkspace, prepare_inference_frame, to_rgb
+from utils.proctoring.wire import BINARY_SUBPROTOCOL, encode_message, negotiate_subprotocol
+from utils.proctoring.yolo_batcher import DeviceDetectionBatcher
+from utils.proctoring.yolo_scheduler import AdaptiveYoloScheduler, YoloBudget
 
 # Configure logger
 logger = logging.getLogger(__name__)
@@ -23,44 +60,32 @@ import time
 router = APIRouter()
 
 # ============================================================================
-# LANDMARK DEFINITIONS (MediaPipe FaceMesh 468-point model)
+# LANDMARK DEFINITIONS (MediaPipe FaceMesh 468-point model, see face_features)
 # ============================================================================
-LEFT_EYE_LANDMARKS = [33, 160, 158, 133, 153, 144]
-RIGHT_EYE_LANDMARKS = [362, 385, 387, 263, 373, 380]
-LEFT_IRIS_CENTER = 468
-RIGHT_IRIS_CENTER = 473
-
-# Head pose estimation landmarks
-NOSE_TIP = 1
-CHIN = 152
-LEFT_EYE_CORNER = 33
-RIGHT_EYE_CORNER = 263
-LEFT_MOUTH_CORNER = 61
-RIGHT_MOUTH_CORNER = 291
+# FaceMesh results are converted once into an (N, 3) float32 array per face
+# (landmarks_to_array); everything downstream indexes that array.
+
+# Landmarks propagated by optical flow between FaceMesh keyframes: everything
+# gaze, EAR and head pose read
+FLOW_LANDMARKS = sorted(set(
+    LEFT_EYE_LANDMARKS + RIGHT_EYE_LANDMARKS +
+    [LEFT_IRIS_CENTER, RIGHT_IRIS_CENTER, NOSE_TIP, CHIN, LEFT_EYE_CORNER,
+     RIGHT_EYE_CORNER, LEFT_MOUTH_CORNER, RIGHT_MOUTH_CORNER]
+))
+FLOW_LANDMARKS_NO_IRIS = [idx for idx in FLOW_LANDMARKS if idx not in (LEFT_IRIS_CENTER, RIGHT_IRIS_CENTER)]
 
 mp_face_mesh = mp.solutions.face_mesh
 mp_face_detection = mp.solutions.face_detection
 mp_pose = mp.solutions.pose
 mp_drawing = mp.solutions.drawing_utils
 
-face_mesh = mp_face_mesh.FaceMesh(
-    max_num_faces=2,
-    refine_landmarks=True,
-    min_detection_confidence=0.6,
-    min_tracking_confidence=0.6
-)
-
-face_detection = mp_face_detection.FaceDetection(
-    model_selection=0,  # Short-range model (faster)
-    min_detection_confidence=0.6
-)
-
-pose = mp_pose.Pose(
-    static_image_mode=False,
-    model_complexity=0,  # Lightest model for performance
-    min_detection_confidence=0.6,
-    min_tracking_confidence=0.6
-)
+# Model instances are created per process by load_models(): in the inference
+# pool every worker owns its own graphs and the serving process owns none.
+# FaceDetection keeps no state between frames and is shared; FaceMesh and
+# Pose track from frame to frame, so each session leases its own set from
+# graph_pool (see SessionGraphs).
+face_detection = None
+graph_pool: Optional[GraphPool] = None
 
 # ============================================================================
 # PERFORMANCE OPTIMIZATION SETTINGS
@@ -71,6 +96,192 @@ INFERENCE_SIZE = 360               # Reduced from 640 for faster inference
 VIZ_SIZE = 480                     # Resolution for visualization
 TARGET_FPS = 15                    # Target FPS
 
+# Incoming JPEGs are decoded in the inference workers at the coarsest DCT
+# scale (1/2, 1/4, 1/8) that is still DECODE_MIN_SCALE times the profile's
+# inference width, so the models never see upscaled pixels by default (a
+# 1280 frame decodes at 640 for the 360 standard profile, a 640 frame at
+# full size). Frames that run YOLO or need an ROI crop larger than the
+# reduced frame can supply (see full_resolution_crop) decode the full
+# resolution as well; sessions with the image overlay always decode at full
+# resolution, since it is drawn on every frame.
+DECODE_MIN_SCALE = float(os.getenv("PROCTOR_DECODE_MIN_SCALE", "1.0"))
+
+# Inference pool: frames are analyzed in dedicated worker processes so model
+# inference never runs on the event loop. 0 = analyze in-process on one
+# background thread instead.
+INFERENCE_WORKERS = int(os.getenv("PROCTOR_WORKERS", str(max(1, min(4, (os.cpu_count() or 2) - 1)))))
+INFERENCE_SLOTS_PER_WORKER = int(os.getenv("PROCTOR_SLOTS_PER_WORKER", "4"))
+
+# YOLO micro-batching across sessions. A batch runs once it holds
+# YOLO_MAX_BATCH frames or its oldest frame waited YOLO_MAX_WAIT_MS.
+# YOLO_MAX_BATCH=1 runs YOLO inline per frame. With several inference
+# workers, SHARED_DETECTOR runs YOLO in one detector process fed by all of
+# them (utils/proctoring/shared_detector.py), so batches form across every
+# session instead of the few pinned to each worker; each worker has
+# DETECTOR_SLOTS_PER_WORKER frames in flight at most.
+YOLO_MAX_BATCH = int(os.getenv("PROCTOR_YOLO_MAX_BATCH", "8"))
+YOLO_MAX_WAIT_MS = float(os.getenv("PROCTOR_YOLO_MAX_WAIT_MS", "10"))
+SHARED_DETECTOR = os.getenv("PROCTOR_SHARED_DETECTOR", "true").lower() == "true"
+DETECTOR_SLOTS_PER_WORKER = int(os.getenv("PROCTOR_DETECTOR_SLOTS", "16"))
+
+# Adaptive YOLO cadence: YOLO_SKIP_FRAMES is the base interval. Suspicious
+# evidence (hand near face, looking down, a detected device) drops it to
+# YOLO_MIN_SKIP_FRAMES for YOLO_EVIDENCE_HOLD_SECONDS; calm sessions back off
+# towards YOLO_MAX_SKIP_FRAMES after YOLO_CALM_SECONDS. YOLO_BUDGET caps YOLO
+# runs per second across all sessions of a process (0 = unlimited).
+YOLO_MIN_SKIP_FRAMES = int(os.getenv("PROCTOR_YOLO_MIN_SKIP", "3"))
+YOLO_MAX_SKIP_FRAMES = int(os.getenv("PROCTOR_YOLO_MAX_SKIP", "40"))
+YOLO_CALM_SECONDS = float(os.getenv("PROCTOR_YOLO_CALM_SECONDS", "30"))
+YOLO_EVIDENCE_HOLD_SECONDS = float(os.getenv("PROCTOR_YOLO_EVIDENCE_HOLD_SECONDS", "5"))
+YOLO_BUDGET = float(os.getenv("PROCTOR_YOLO_BUDGET", "20"))
+
+# Motion gating: when the scene barely changed since the last analyzed frame
+# (mean gray-level difference of a 64x48 thumbnail), reuse its face/pose
+# results instead of running the models. Refresh is forced after
+# MOTION_MAX_REUSE_FRAMES reuses or MOTION_MAX_REUSE_SECONDS. 0 disables.
+MOTION_THRESHOLD = float(os.getenv("PROCTOR_MOTION_THRESHOLD", "3.0"))
+MOTION_MAX_REUSE_FRAMES = int(os.getenv("PROCTOR_MOTION_MAX_REUSE_FRAMES", "10"))
+MOTION_MAX_REUSE_SECONDS = float(os.getenv("PROCTOR_MOTION_MAX_REUSE_SECONDS", "2.0"))
+
+# Detector cascade: pose (hand near face / looking down) runs every
+# POSE_INTERVAL received frames, and on every analyzed frame while the last
+# pose result was suspicious. Cached landmarks are used in between.
+POSE_INTERVAL = int(os.getenv("PROCTOR_POSE_INTERVAL", "4"))
+
+# ROI crops: with a single face, FaceMesh runs on a window FACE_ROI_SCALE
+# times the face size and Pose on an upper-body window, both cut from the
+# decoded frame (full resolution when the reduced decode gives too small a
+# crop, see full_resolution_crop). While the mesh only sees its crop,
+# FaceDetection re-checks the whole frame every FACE_RECHECK_INTERVAL
+# received frames.
+ROI_ENABLED = os.getenv("PROCTOR_ROI", "true").lower() == "true"
+FACE_ROI_SCALE = float(os.getenv("PROCTOR_FACE_ROI_SCALE", "2.0"))
+FACE_RECHECK_INTERVAL = int(os.getenv("PROCTOR_FACE_RECHECK_INTERVAL", "6"))
+FACE_ROI_MAX_SIDE = 256            # FaceMesh input is 192x192
+POSE_ROI_MAX_SIDE = 320            # Pose input is 256x256
+
+# MediaPipe graph leases: at most GRAPHS_PER_WORKER FaceMesh/Pose sets per
+# process (one per active session); sessions idle for GRAPH_IDLE_SECONDS give
+# theirs back. With more active sessions the least recently used is taken over.
+GRAPHS_PER_WORKER = int(os.getenv("PROCTOR_GRAPHS_PER_WORKER", "8"))
+GRAPH_IDLE_SECONDS = float(os.getenv("PROCTOR_GRAPH_IDLE_SECONDS", "60"))
+
+# Keyframe/tracking mode: with a single face, FaceMesh runs every
+# LANDMARK_KEYFRAME_INTERVAL analyzed frames and FLOW_LANDMARKS are moved by
+# Lucas-Kanade optical flow in between. A forward-backward error above
+# LANDMARK_FLOW_MAX_ERROR pixels (small frame) forces a FaceMesh keyframe.
+# 1 disables tracking.
+LANDMARK_KEYFRAME_INTERVAL = int(os.getenv("PROCTOR_LANDMARK_KEYFRAME_INTERVAL", "3"))
+LANDMARK_FLOW_MAX_ERROR = float(os.getenv("PROCTOR_LANDMARK_FLOW_MAX_ERROR", "1.5"))
+
+# Server-driven capture for clients that connect with ?capture=server (see
+# utils/proctoring/capture_control.py). CAPTURE_BASE_FPS is the rate other
+# clients send at; each profile asks for that rate over its skip_frames, so
+# the frames it would skip are never captured. Settings step down while the
+# session's inference worker is CAPTURE_HIGH_LOAD busy or frames arrive late
+# or get dropped (at most once per CAPTURE_HOLD_SECONDS), and back up after
+# CAPTURE_RECOVER_SECONDS below CAPTURE_LOW_LOAD.
+CAPTURE_BASE_FPS = float(os.getenv("PROCTOR_CAPTURE_BASE_FPS", "5"))
+CAPTURE_MIN_FPS = float(os.getenv("PROCTOR_CAPTURE_MIN_FPS", "1"))
+CAPTURE_HIGH_LOAD = float(os.getenv("PROCTOR_CAPTURE_HIGH_LOAD", "0.75"))
+CAPTURE_LOW_LOAD = float(os.getenv("PROCTOR_CAPTURE_LOW_LOAD", "0.4"))
+CAPTURE_HOLD_SECONDS = float(os.getenv("PROCTOR_CAPTURE_HOLD_SECONDS", "3"))
+CAPTURE_RECOVER_SECONDS = float(os.getenv("PROCTOR_CAPTURE_RECOVER_SECONDS", "10"))
+
+# Telemetry: every analyzed frame's metrics are buffered per connection and
+# written behind in batches of TELEMETRY_BATCH_SIZE (or every
+# TELEMETRY_FLUSH_SECONDS) to the MongoDB time-series collection
+# TELEMETRY_COLLECTION, kept for TELEMETRY_TTL_DAYS (0 = forever). See
+# utils/proctoring/telemetry.py.
+TELEMETRY_ENABLED = os.getenv("PROCTOR_TELEMETRY", "true").lower() == "true"
+TELEMETRY_COLLECTION = os.getenv("PROCTOR_TELEMETRY_COLLECTION", "proctoring_telemetry")
+TELEMETRY_BATCH_SIZE = int(os.getenv("PROCTOR_TELEMETRY_BATCH_SIZE", "100"))
+TELEMETRY_FLUSH_SECONDS = float(os.getenv("PROCTOR_TELEMETRY_FLUSH_SECONDS", "5"))
+TELEMETRY_TTL_DAYS = int(os.getenv("PROCTOR_TELEMETRY_TTL_DAYS", "90"))
+
+# Evidence clips: each connection keeps the last EVIDENCE_SECONDS of received
+# (still encoded) frames, at most EVIDENCE_MAX_MB. A confirmed alert from
+# EVIDENCE_ALERTS stores them plus EVIDENCE_POST_ROLL_SECONDS of what follows
+# (once per alert type per EVIDENCE_COOLDOWN_SECONDS) in GridFS
+# (EVIDENCE_STORE=gridfs), under EVIDENCE_DIR (disk) or nowhere (off). See
+# utils/proctoring/evidence.py.
+EVIDENCE_STORE = os.getenv("PROCTOR_EVIDENCE_STORE", "gridfs").lower()
+EVIDENCE_DIR = os.getenv("PROCTOR_EVIDENCE_DIR", "proctoring_evidence")
+EVIDENCE_ALERTS = set(filter(None, os.getenv(
+    "PROCTOR_EVIDENCE_ALERTS",
+    "device_detected_phone,device_detected_laptop,device_detected_monitor,multiple_faces,no_face_detected"
+).split(",")))
+EVIDENCE_SECONDS = float(os.getenv("PROCTOR_EVIDENCE_SECONDS", "10"))
+EVIDENCE_POST_ROLL_SECONDS = float(os.getenv("PROCTOR_EVIDENCE_POST_ROLL_SECONDS", "3"))
+EVIDENCE_MAX_MB = float(os.getenv("PROCTOR_EVIDENCE_MAX_MB", "8"))
+EVIDENCE_COOLDOWN_SECONDS = float(os.getenv("PROCTOR_EVIDENCE_COOLDOWN_SECONDS", "30"))
+
+# Offline analysis (admin): recorded videos under OFFLINE_ROOT are re-run
+# through this pipeline in their own pool of OFFLINE_WORKERS processes, one
+# job at a time, with reports written below OFFLINE_OUTPUT_DIR. See
+# utils/proctoring/offline.py.
+OFFLINE_ROOT = os.getenv("PROCTOR_OFFLINE_ROOT", "recordings")
+OFFLINE_OUTPUT_DIR = os.getenv("PROCTOR_OFFLINE_OUTPUT_DIR", "proctoring_reports")
+OFFLINE_WORKERS = int(os.getenv("PROCTOR_OFFLINE_WORKERS", "2"))
+
+# Stage timing: every STAGE_SAMPLE_EVERY-th analyzed frame of a process is
+# timed per pipeline stage (perf_counter_ns) into rolling histograms of the
+# last one to two STAGE_WINDOW_SECONDS windows; the sampled frame's times
+# are in details["stage_ms"]. 0 disables the timing. See
+# utils/proctoring/stage_timing.py and /admin/proctoring/stages.
+STAGE_SAMPLE_EVERY = int(os.getenv("PROCTOR_STAGE_SAMPLE_EVERY", "4"))
+STAGE_WINDOW_SECONDS = float(os.getenv("PROCTOR_STAGE_WINDOW_SECONDS", "60"))
+
+# Landmark recording: with a directory set, every session's model outputs
+# (landmarks, pose, detections) are written there as a stream that
+# utils/proctoring/replay.py replays through the alert rules without models
+LANDMARK_RECORD_DIR = os.getenv("PROCTOR_LANDMARK_RECORD_DIR", "")
+
+# Proctoring profiles: quality tiers a quiz selects with ?profile=<name>.
+# "standard" is the configuration above, "lite" is for low-stakes quizzes
+# (no iris/gaze, no pose, sparse YOLO, client-drawn overlay) and "strict"
+# for high-stakes ones. The YOLO input stays INFERENCE_SIZE for every
+# profile so frames of all sessions can share a batch.
+PROFILES: Dict[str, ProctoringProfile] = {
+    "lite": ProctoringProfile(
+        "lite", inference_size=256, skip_frames=3,
+        refine_landmarks=False, run_pose=False,
+        landmark_keyframe_interval=4, motion_threshold=4.0,
+        yolo_skip_frames=30, yolo_min_skip_frames=10, yolo_max_skip_frames=90,
+        viz_mode="vector", viz_quality=60,
+        capture_fps=round(CAPTURE_BASE_FPS / 3, 2), capture_width=480, capture_quality=70
+    ),
+    "standard": ProctoringProfile(
+        "standard", inference_size=INFERENCE_SIZE, skip_frames=SKIP_FRAMES,
+        pose_interval=POSE_INTERVAL,
+        landmark_keyframe_interval=LANDMARK_KEYFRAME_INTERVAL, motion_threshold=MOTION_THRESHOLD,
+        yolo_skip_frames=YOLO_SKIP_FRAMES, yolo_min_skip_frames=YOLO_MIN_SKIP_FRAMES,
+        yolo_max_skip_frames=YOLO_MAX_SKIP_FRAMES,
+        capture_fps=round(CAPTURE_BASE_FPS / SKIP_FRAMES, 2), capture_width=640
+    ),
+    "strict": ProctoringProfile(
+        "strict", inference_size=480, skip_frames=1,
+        pose_interval=2, landmark_keyframe_interval=1, motion_threshold=1.5,
+        yolo_skip_frames=5, yolo_min_skip_frames=2, yolo_max_skip_frames=10,
+        capture_fps=CAPTURE_BASE_FPS, capture_width=640, capture_quality=85
+    ),
+}
+DEFAULT_PROFILE = os.getenv("PROCTOR_DEFAULT_PROFILE", "standard").lower()
+if DEFAULT_PROFILE not in PROFILES:
+    DEFAULT_PROFILE = "standard"
+
+# Alert rule thresholds (see utils/proctoring/alert_rules.py); the defaults
+# are the tuned values
+ALERT_THRESHOLDS = AlertThresholds()
+
+# Device detector backend: "torch" (ultralytics/PyTorch), "onnx", "onnx-int8"
+# or "openvino" (see utils/proctoring/detector_backends.py). ONNX models are
+# exported next to the weights on first use. DETECTOR_THREADS=0 splits the
+# cores between inference workers.
+DETECTOR_BACKEND = os.getenv("PROCTOR_DETECTOR_BACKEND", "torch").lower()
+DETECTOR_WEIGHTS = os.getenv("PROCTOR_DETECTOR_WEIGHTS", "yolov8n.pt")
+DETECTOR_THREADS = int(os.getenv("PROCTOR_DETECTOR_THREADS", "0"))
+
 # GPU/Device settings
 try:
     import torch
@@ -84,50 +295,150 @@ except Exception as e:
     DEVICE = 'cpu'
 
 yolo_model = None
-yolo_last_results = None
-yolo_last_frame_num = -YOLO_SKIP_FRAMES
+yolo_batcher: Optional[DeviceDetectionBatcher] = None
+yolo_budget = YoloBudget(YOLO_BUDGET)
+_models_loaded = False
+# Per process: each inference worker times its own frames
+stage_stats = StageStats(STAGE_SAMPLE_EVERY or 1, STAGE_WINDOW_SECONDS)
 
-try:
-    import torch
-    from ultralytics import YOLO
-    
-    # Fix for PyTorch 2.6+: Add safe globals if available
-    if hasattr(torch.serialization, 'add_safe_globals'):
-        from ultralytics.nn.tasks import DetectionModel
-        torch.serialization.add_safe_globals([DetectionModel])
+
+def load_yolo_model(threads: int = 0):
+    """
+    Load and warm up the YOLOv8n device detector backend; returns None when
+    no backend is available. ONNX backends fall back to PyTorch on failure.
+    `threads` (ONNX backends) defaults to DETECTOR_THREADS or a worker's
+    share of the cores.
+    """
+    if DETECTOR_BACKEND != "torch":
+        try:
+            threads = threads or DETECTOR_THREADS or max(1, (os.cpu_count() or 1) // max(1, INFERENCE_WORKERS))
+            backend = load_detector_backend(DETECTOR_BACKEND, DETECTOR_WEIGHTS, INFERENCE_SIZE, threads=threads)
+            backend.detect([np.zeros((INFERENCE_SIZE, INFERENCE_SIZE, 3), dtype=np.uint8)])
+            logger.info(f"✅ Device detector: {backend.name} ({backend.model_path}, {threads} threads) warmed up")
+            return backend
+        except Exception as e:
+            logger.warning(f"⚠️  {DETECTOR_BACKEND} detector backend unavailable, falling back to PyTorch: {e}")
     
-    # Load YOLOv8n (nano) model - lightweight & fast
-    logger.info(f"Loading YOLOv8n model on {DEVICE}...")
-    yolo_model = YOLO('yolov8n.pt', task='detect')
+    try:
+        import torch
+        from ultralytics import YOLO
+        
+        # Fix for PyTorch 2.6+: Add safe globals if available
+        if hasattr(torch.serialization, 'add_safe_globals'):
+            from ultralytics.nn.tasks import DetectionModel
+            torch.serialization.add_safe_globals([DetectionModel])
+        
+        # Load YOLOv8n (nano) model - lightweight & fast
+        logger.info(f"Loading YOLOv8n model on {DEVICE}...")
+        model = YOLO(DETECTOR_WEIGHTS, task='detect')
+        
+        # Move to device for inference
+        if DEVICE == 'cuda':
+            model = model.to(DEVICE)
+        
+        # Warm up with reduced size inference
+        dummy_frame = np.zeros((INFERENCE_SIZE, INFERENCE_SIZE, 3), dtype=np.uint8)
+        with torch.no_grad():
+            _ = model(dummy_frame, verbose=False, conf=0.3, imgsz=INFERENCE_SIZE)
+        
+        logger.info(f"✅ YOLOv8n model loaded on {DEVICE} and warmed up successfully")
+        logger.info(f"📊 Optimization: Skip={SKIP_FRAMES}, YOLO_Skip={YOLO_SKIP_FRAMES}, Size={INFERENCE_SIZE}x{INFERENCE_SIZE}")
+        return UltralyticsBackend(model, INFERENCE_SIZE)
+    except Exception as e:
+        logger.warning(f"⚠️  YOLO not loaded - device detection disabled: {e}")
+        return None
+
+
+class SessionGraphs:
+    """
+    The tracking MediaPipe graphs of one session. `kind` is
+    (refine_landmarks, run_pose) of its profile; Pose is only created when
+    the profile runs it.
+    """
+    def __init__(self, kind: Tuple[bool, bool]):
+        refine_landmarks, run_pose = kind
+        self.face_mesh = mp_face_mesh.FaceMesh(
+            max_num_faces=2,
+            refine_landmarks=refine_landmarks,
+            min_detection_confidence=0.6,
+            min_tracking_confidence=0.6
+        )
+        self.pose = None
+        if run_pose:
+            self.pose = mp_pose.Pose(
+                static_image_mode=False,
+                model_complexity=0,  # Lightest model for performance
+                min_detection_confidence=0.6,
+                min_tracking_confidence=0.6
+            )
+    
+    def _graphs(self):
+        return [graph for graph in (self.face_mesh, self.pose) if graph is not None]
+    
+    def reset(self):
+        """Forget tracking state before the graphs serve another session"""
+        for graph in self._graphs():
+            graph.reset()
+    
+    def close(self):
+        for graph in self._graphs():
+            graph.close()
+
+
+def graph_kind(profile: ProctoringProfile) -> Tuple[bool, bool]:
+    return profile.refine_landmarks, profile.run_pose
+
+
+def create_device_batcher(model) -> Optional[DeviceDetectionBatcher]:
+    """Cross-session YOLO batcher over `model` (None when batching is off)"""
+    if model is None or YOLO_MAX_BATCH <= 1:
+        return None
+    return DeviceDetectionBatcher(
+        partial(detect_electronic_devices_batch, yolo_model=model),
+        max_batch_size=YOLO_MAX_BATCH,
+        max_wait_ms=YOLO_MAX_WAIT_MS,
+    )
+
+
+def load_models(load_detector: bool = True):
+    """
+    Create the MediaPipe graphs and the YOLO model for this process
+    (idempotent); without `load_detector` the YOLO batcher is provided
+    from outside (shared detector process)
+    """
+    global face_detection, graph_pool, yolo_model, yolo_batcher, _models_loaded
+    if _models_loaded:
+        return
     
-    # Move to device for inference
-    if DEVICE == 'cuda':
-        yolo_model = yolo_model.to(DEVICE)
+    face_detection = mp_face_detection.FaceDetection(
+        model_selection=0,  # Short-range model (faster)
+        min_detection_confidence=0.6
+    )
     
-    # Warm up with reduced size inference
-    dummy_frame = np.zeros((INFERENCE_SIZE, INFERENCE_SIZE, 3), dtype=np.uint8)
-    with torch.no_grad():
-        _ = yolo_model(dummy_frame, verbose=False, conf=0.3, imgsz=INFERENCE_SIZE)
+    graph_pool = GraphPool(SessionGraphs, max_graphs=GRAPHS_PER_WORKER, idle_seconds=GRAPH_IDLE_SECONDS)
+    graph_pool.prewarm(graph_kind(PROFILES[DEFAULT_PROFILE]))
     
-    logger.info(f"✅ YOLOv8n model loaded on {DEVICE} and warmed up successfully")
-    logger.info(f"📊 Optimization: Skip={SKIP_FRAMES}, YOLO_Skip={YOLO_SKIP_FRAMES}, Size={INFERENCE_SIZE}x{INFERENCE_SIZE}")
-except Exception as e:
-    logger.warning(f"⚠️  YOLO not loaded - device detection disabled: {e}")
-    yolo_model = None
+    if load_detector:
+        yolo_model = load_yolo_model()
+        yolo_batcher = create_device_batcher(yolo_model)
+    _models_loaded = True
+
 
 # TEMPORAL BUFFER FOR TRACKING & SMOOTHING
-class FrameBuffer:
+class FrameBuffer(AlertState):
     """
     Tracks temporal data across frames for smoothing and alert persistence
+    (the alert-rule state comes from AlertState, see utils/proctoring/alert_rules.py)
+    
+    Only scalars are kept (fixed-size rings, no frames), so the history of a
+    connected client takes a few kilobytes.
     """
-    def __init__(self, maxlen=30):
-        self.frames = deque(maxlen=maxlen)
-        self.keypoints = deque(maxlen=maxlen)
-        self.gaze_angles = deque(maxlen=maxlen)
-        self.ear_values = deque(maxlen=maxlen)
-        self.alert_history = deque(maxlen=15)  # Track recent alerts
+    def __init__(self, maxlen=30, profile: Optional[ProctoringProfile] = None,
+                 start_time: Optional[float] = None):
+        self.profile = profile or PROFILES[DEFAULT_PROFILE]
+        super().__init__(maxlen, refine_landmarks=self.profile.refine_landmarks)
         self.frame_count = 0
-        self.fps_history = deque(maxlen=30)
+        self.fps_history = RingSeries(30)
         self.last_process_time = time.time()
         
         # YOLO caching for intelligent device detection
@@ -135,39 +446,53 @@ class FrameBuffer:
         self.last_yolo_detections = []
         self.last_dev_conf = 0.0  # Confidence score from last YOLO run
         self.last_yolo_result_time = 0
+        self.last_yolo_frame = -self.profile.yolo_skip_frames
         self.yolo_cache_valid = False
+        self.yolo_pending = False  # Submitted to the batcher, result not back yet
+        self.last_yolo_batch_size = 0
+        self.yolo_scheduler = AdaptiveYoloScheduler(
+            base_interval=self.profile.yolo_skip_frames,
+            min_interval=self.profile.yolo_min_skip_frames,
+            max_interval=self.profile.yolo_max_skip_frames,
+            calm_after=YOLO_CALM_SECONDS,
+            evidence_hold=YOLO_EVIDENCE_HOLD_SECONDS,
+            now=start_time
+        )
         
-    def add(self, frame, keypoints=None, gaze=None, ear=None):
-        """Add frame data to buffer"""
-        self.frames.append(frame)
-        if keypoints is not None:
-            self.keypoints.append(keypoints)
-        if gaze is not None:
-            self.gaze_angles.append(gaze)
-        if ear is not None:
-            self.ear_values.append(ear)
-        self.frame_count += 1
-    
-    def add_alert(self, alert_type: str):
-        """Track alert for temporal smoothing"""
-        self.alert_history.append({
-            'type': alert_type,
-            'timestamp': time.time()
-        })
-    
-    def should_trigger_alert(self, alert_type: str, required_count: int = 3, time_window: float = 1.0) -> bool:
-        """Determine if an alert should be triggered based on recent history"""
-        if len(self.alert_history) < required_count:
-            return False
+        # Motion gating: model outputs of the last analyzed frame
+        self.motion_gate = MotionGate(
+            threshold=self.profile.motion_threshold,
+            max_reuse_frames=MOTION_MAX_REUSE_FRAMES,
+            max_reuse_seconds=MOTION_MAX_REUSE_SECONDS
+        )
+        self.last_inference = None  # (face_boxes, face_points, pose_landmarks)
         
-        current_time = time.time()
-        recent_alerts = [
-            a for a in self.alert_history 
-            if a['type'] == alert_type and (current_time - a['timestamp']) <= time_window
-        ]
+        # Detector cascade state
+        self.face_tracked = False  # FaceMesh found a face on the last analyzed frame
+        self.last_face_conf = 0.0  # Score of the last standalone face detection
+        self.last_pose_landmarks = None
+        self.last_pose_frame = -self.profile.pose_interval
+        self.last_face_boxes = []
+        self.last_face_detection_frame = -FACE_RECHECK_INTERVAL
+        self.mesh_roi = StickyRoi()
+        self.pose_roi = StickyRoi()
+        self.landmark_tracker = LandmarkFlowTracker(
+            FLOW_LANDMARKS if self.profile.refine_landmarks else FLOW_LANDMARKS_NO_IRIS,
+            keyframe_interval=self.profile.landmark_keyframe_interval,
+            max_error=LANDMARK_FLOW_MAX_ERROR
+        )
+        self.stage_counts = {"frames": 0, "face_detection": 0, "face_mesh": 0,
+                             "landmark_flow": 0, "pose": 0}
+        
+        # Preallocated work buffers reused frame after frame
+        self.workspace = FrameWorkspace()
+        
+        # Head pose warm-starts from the previous frame's solution
+        self.head_pose = HeadPoseEstimator()
+        
+        # Alert-rule inputs for replay (LANDMARK_RECORD_DIR), None when off
+        self.landmark_recorder: Optional[LandmarkRecorder] = None
         
-        return len(recent_alerts) >= required_count
-    
     def update_fps(self) -> float:
         """Calculate and store FPS"""
         current_time = time.time()
@@ -178,171 +503,29 @@ class FrameBuffer:
     
     def get_avg_fps(self) -> float:
         """Get average FPS over recent frames"""
-        if not self.fps_history:
-            return 0.0
-        return sum(self.fps_history) / len(self.fps_history)
-    
-    def clear_old_alerts(self, max_age: float = 5.0):
-        """Remove alerts older than max_age seconds"""
-        current_time = time.time()
-        self.alert_history = deque([
-            a for a in self.alert_history 
-            if (current_time - a['timestamp']) <= max_age
-        ], maxlen=15)
+        return self.fps_history.mean()
+    
+    def store_yolo_result(self, detections: List[Dict], dev_conf: float, batch_size: int = 1):
+        """Cache device detections (called from the YOLO batcher thread)"""
+        self.last_yolo_detections = detections
+        self.last_dev_conf = dev_conf
+        self.last_yolo_result_time = time.time()
+        self.last_yolo_batch_size = batch_size
+        self.yolo_cache_valid = True
+        self.yolo_pending = False
 
 # Store buffers per client
 client_buffers: Dict[str, FrameBuffer] = {}
 
-# EYE TRACKING & GAZE DETECTION
-def calculate_ear(eye_landmarks: np.ndarray) -> float:
-    """
-    Calculate Eye Aspect Ratio (EAR) for blink detection
-    EAR = (vertical_dist1 + vertical_dist2) / (2 * horizontal_dist)
-    
-    Args:
-        eye_landmarks: Array of 6 eye landmark points
-    
-    Returns:
-        EAR value (typically 0.2-0.4 when open, <0.15 when closed)
-    """
-    # Vertical distances
-    v1 = np.linalg.norm(eye_landmarks[1] - eye_landmarks[5])
-    v2 = np.linalg.norm(eye_landmarks[2] - eye_landmarks[4])
-    
-    # Horizontal distance
-    h = np.linalg.norm(eye_landmarks[0] - eye_landmarks[3])
-    
-    if h < 1e-6:
-        return 0.0
-    
-    ear = (v1 + v2) / (2.0 * h)
-    return ear
-
-
-def detect_gaze_direction(face_landmarks, img_w: int, img_h: int) -> Tuple[float, float]:
-    """
-    Detect gaze direction using iris-to-eye-center ratio
-    
-    Formula: gaze_x = (iris_center_x - eye_center_x) / eye_width * 100
-    
-    Returns:
-        (horizontal_angle, vertical_angle) in degrees
-        Positive values = right/down, Negative values = left/up
-    """
-    # Left Eye Analysis
-    l_inner = face_landmarks.landmark[133]  # Inner corner
-    l_outer = face_landmarks.landmark[33]   # Outer corner
-    l_iris = face_landmarks.landmark[LEFT_IRIS_CENTER]
-    
-    l_eye_width = math.hypot((l_inner.x - l_outer.x) * img_w, (l_inner.y - l_outer.y) * img_h)
-    l_eye_center_x = (l_inner.x + l_outer.x) / 2 * img_w
-    l_eye_center_y = (l_inner.y + l_outer.y) / 2 * img_h
-    
-    if l_eye_width > 0:
-        l_gaze_x = ((l_iris.x * img_w) - l_eye_center_x) / l_eye_width * 100
-        l_gaze_y = ((l_iris.y * img_h) - l_eye_center_y) / l_eye_width * 100
-    else:
-        l_gaze_x, l_gaze_y = 0.0, 0.0
-
-    # Right Eye Analysis
-    r_inner = face_landmarks.landmark[362]  # Inner corner
-    r_outer = face_landmarks.landmark[263]  # Outer corner
-    r_iris = face_landmarks.landmark[RIGHT_IRIS_CENTER]
-    
-    r_eye_width = math.hypot((r_inner.x - r_outer.x) * img_w, (r_inner.y - r_outer.y) * img_h)
-    r_eye_center_x = (r_inner.x + r_outer.x) / 2 * img_w
-    r_eye_center_y = (r_inner.y + r_outer.y) / 2 * img_h
-    
-    if r_eye_width > 0:
-        r_gaze_x = ((r_iris.x * img_w) - r_eye_center_x) / r_eye_width * 100
-        r_gaze_y = ((r_iris.y * img_h) - r_eye_center_y) / r_eye_width * 100
-    else:
-        r_gaze_x, r_gaze_y = 0.0, 0.0
-
-    # Average both eyes
-    avg_gaze_x = (l_gaze_x + r_gaze_x) / 2
-    avg_gaze_y = (l_gaze_y + r_gaze_y) / 2
-    
-    return avg_gaze_x, avg_gaze_y
-
-
-def draw_iris_points(frame: np.ndarray, face_landmarks, img_w: int, img_h: int):
-    """Draw iris centers on the frame for visualization"""
-    left_iris = face_landmarks.landmark[LEFT_IRIS_CENTER]
-    right_iris = face_landmarks.landmark[RIGHT_IRIS_CENTER]
-    
-    cv2.circle(frame, (int(left_iris.x * img_w), int(left_iris.y * img_h)), 3, (0, 255, 255), -1)
-    cv2.circle(frame, (int(right_iris.x * img_w), int(right_iris.y * img_h)), 3, (0, 255, 255), -1)
-
-# HEAD POSE ESTIMATION
-
-def calculate_head_pose(face_landmarks, img_w: int, img_h: int) -> Tuple[float, float, float]:
-    """
-    Calculate head pose (pitch, yaw, roll) using solvePnP
-    
-    Returns:
-        (pitch, yaw, roll) in degrees
-        - Pitch: nodding (positive = looking down)
-        - Yaw: turning left/right (positive = looking right)
-        - Roll: tilting head (positive = tilting right)
-    """
-    # 3D model points (generic human face model)
-    model_points = np.array([
-        (0.0, 0.0, 0.0),           # Nose tip
-        (0.0, -330.0, -65.0),      # Chin
-        (-225.0, 170.0, -135.0),   # Left eye left corner
-        (225.0, 170.0, -135.0),    # Right eye right corner
-        (-150.0, -150.0, -125.0),  # Left mouth corner
-        (150.0, -150.0, -125.0)    # Right mouth corner
-    ], dtype=np.float64)
-    
-    # 2D image points from face landmarks
-    image_points = np.array([
-        (face_landmarks.landmark[NOSE_TIP].x * img_w, face_landmarks.landmark[NOSE_TIP].y * img_h),
-        (face_landmarks.landmark[CHIN].x * img_w, face_landmarks.landmark[CHIN].y * img_h),
-        (face_landmarks.landmark[LEFT_EYE_CORNER].x * img_w, face_landmarks.landmark[LEFT_EYE_CORNER].y * img_h),
-        (face_landmarks.landmark[RIGHT_EYE_CORNER].x * img_w, face_landmarks.landmark[RIGHT_EYE_CORNER].y * img_h),
-        (face_landmarks.landmark[LEFT_MOUTH_CORNER].x * img_w, face_landmarks.landmark[LEFT_MOUTH_CORNER].y * img_h),
-        (face_landmarks.landmark[RIGHT_MOUTH_CORNER].x * img_w, face_landmarks.landmark[RIGHT_MOUTH_CORNER].y * img_h)
-    ], dtype=np.float64)
-    
-    # Camera internals (estimated)
-    focal_length = img_w
-    center = (img_w / 2, img_h / 2)
-    camera_matrix = np.array([
-        [focal_length, 0, center[0]],
-        [0, focal_length, center[1]],
-        [0, 0, 1]
-    ], dtype=np.float64)
-    
-    dist_coeffs = np.zeros((4, 1))  # Assuming no lens distortion
-    
-    # Solve PnP
-    success, rotation_vector, translation_vector = cv2.solvePnP(
-        model_points, image_points, camera_matrix, dist_coeffs, flags=cv2.SOLVEPNP_ITERATIVE
-    )
-    
-    if not success:
-        return 0.0, 0.0, 0.0
-    
-    # Convert rotation vector to Euler angles
-    rotation_mat, _ = cv2.Rodrigues(rotation_vector)
-    pose_mat = cv2.hconcat((rotation_mat, translation_vector))
-    _, _, _, _, _, _, euler_angles = cv2.decomposeProjectionMatrix(pose_mat)
-    
-    pitch, yaw, roll = euler_angles.flatten()[:3]
-    
-    return pitch, yaw, roll
-
+# EYE TRACKING, GAZE & HEAD POSE: see utils/proctoring/face_features.py
 
-def draw_head_pose_axis(frame: np.ndarray, face_landmarks, img_w: int, img_h: int,
+def draw_head_pose_axis(frame: np.ndarray, face_points: np.ndarray, img_w: int, img_h: int,
                          pitch: float, yaw: float, roll: float):
     """
     Draw 3D axis on face showing head orientation
     Red = X (right), Green = Y (down), Blue = Z (forward)
     """
-    nose_tip = face_landmarks.landmark[NOSE_TIP]
-    nose_2d = (int(nose_tip.x * img_w), int(nose_tip.y * img_h))
+    nose_2d = (int(face_points[NOSE_TIP, 0] * img_w), int(face_points[NOSE_TIP, 1] * img_h))
     
     # Simplified axis projection (for visualization only)
     axis_length = 100
@@ -359,90 +542,81 @@ def draw_head_pose_axis(frame: np.ndarray, face_landmarks, img_w: int, img_h: in
     cv2.line(frame, nose_2d, x_end, (0, 0, 255), 3)  # Red (X)
     cv2.line(frame, nose_2d, y_end, (0, 255, 0), 3)  # Green (Y)
 
-# POSE DETECTION & SUSPICIOUS ACTIVITY
+# POSE CHECKS, BEHAVIOR STATUS & ALERT RULES: see utils/proctoring/alert_rules.py
+# (shared with the model-free landmark replay)
+
+# YOLO DEVICE DETECTION
+
+# COCO dataset class IDs for devices
+DEVICE_CLASSES = {
+    67: 'cell phone',
+    63: 'laptop',
+    62: 'monitor',
+    66: 'keyboard',
+    64: 'mouse'
+}
+
+_yolo_batches_run = 0
+
+
+def prepare_device_detection_input(frame: np.ndarray) -> np.ndarray:
+    """Resize frame to inference size for faster processing (always a new array)"""
+    return cv2.resize(frame, (INFERENCE_SIZE, INFERENCE_SIZE), interpolation=cv2.INTER_LINEAR)
 
-def detect_suspicious_activity(buffer: FrameBuffer, pose_landmarks) -> Tuple[bool, str, float, Dict]:
+
+def detect_electronic_devices_batch(resized_frames: List[np.ndarray], sizes: List[Tuple[int, int]],
+                                    yolo_model) -> List[Tuple[List[Dict], float]]:
     """
-    Detect suspicious activity using pose analysis:
-    1. Hand near face (potential phone use)
-    2. Looking down significantly (reading notes/phone)
+    Run one batched YOLO forward pass over frames from several sessions.
+    `yolo_model` is a detector backend from load_yolo_model.
     
-    Returns:
-        (is_suspicious, activity_type, confidence, metrics)
-    """
-    alerts = []
-    max_confidence = 0.0
-    metrics = {
-        "hand_face_dist_left": 1.0, 
-        "hand_face_dist_right": 1.0,
-        "nose_shoulder_diff": 0.0
-    }
-    
-    if pose_landmarks is None:
-        return False, "", 0.0, metrics
-    
-    landmarks = pose_landmarks.landmark
-    
-    # Get key points
-    nose = landmarks[mp_pose.PoseLandmark.NOSE.value]
-    left_wrist = landmarks[mp_pose.PoseLandmark.LEFT_WRIST.value]
-    right_wrist = landmarks[mp_pose.PoseLandmark.RIGHT_WRIST.value]
-    
-    # Check visibility (confidence that landmark is in frame)
-    if nose.visibility < 0.5:
-        return False, "", 0.0, metrics
-    
-    # Calculate hand-to-face distances (normalized coordinates)
-    nose_pos = np.array([nose.x, nose.y])
-    left_wrist_pos = np.array([left_wrist.x, left_wrist.y])
-    right_wrist_pos = np.array([right_wrist.x, right_wrist.y])
-    
-    left_dist = np.linalg.norm(nose_pos - left_wrist_pos)
-    right_dist = np.linalg.norm(nose_pos - right_wrist_pos)
-    
-    metrics["hand_face_dist_left"] = float(left_dist)
-    metrics["hand_face_dist_right"] = float(right_dist)
-    
-    # Hand near face detection (tight threshold = phone to ear)
-    if left_wrist.visibility > 0.5 and left_dist < 0.15:
-        alerts.append("hand_near_face")
-        max_confidence = max(max_confidence, 0.60)
+    Args:
+        resized_frames: INFERENCE_SIZE x INFERENCE_SIZE frames
+        sizes: original (width, height) of each frame, to scale boxes back
     
-    if right_wrist.visibility > 0.5 and right_dist < 0.15:
-        alerts.append("hand_near_face")
-        max_confidence = max(max_confidence, 0.60)
+    Returns:
+        [(detections_list, max_confidence), ...] in input order
+    """
+    global _yolo_batches_run
     
-    # Looking down detection (extreme angle only)
-    left_shoulder = landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value]
-    right_shoulder = landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER.value]
+    # Run YOLO inference with optimized settings
+    results = yolo_model.detect(resized_frames, conf=0.3)
     
-    if left_shoulder.visibility > 0.5 and right_shoulder.visibility > 0.5:
-        shoulders_center_y = (left_shoulder.y + right_shoulder.y) / 2
-        diff = nose.y - shoulders_center_y
-        metrics["nose_shoulder_diff"] = float(diff)
+    outputs = []
+    for result, (w, h) in zip(results, sizes):
+        detections = []
+        max_conf = 0.0
+        
+        # Scale bounding box back to original frame size
+        scale_x = w / INFERENCE_SIZE
+        scale_y = h / INFERENCE_SIZE
+        
+        for class_id, confidence, (x1, y1, x2, y2) in result:
+            if class_id in DEVICE_CLASSES:
+                detections.append({
+                    "label": DEVICE_CLASSES[class_id],
+                    "box": [int(x1 * scale_x), int(y1 * scale_y), int(x2 * scale_x), int(y2 * scale_y)],
+                    "conf": confidence
+                })
+                max_conf = max(max_conf, confidence)
         
-        # Only trigger for extreme looking down (head significantly below shoulders)
-        if diff > 0.15:
-            # IMMEDIATE LOOKING DOWN ALERT
-            alerts.append("looking_down")
-            confidences.append(activity_conf if 'activity_conf' in locals() else 0.55) # activity_conf isn't defined here, defaulting
-            max_confidence = max(max_confidence, 0.55)
-            logger.debug(f"🚨 LOOKING DOWN DETECTED")
+        outputs.append((detections, max_conf))
     
-    if alerts:
-        # Remove duplicates
-        unique_alerts = list(set(alerts))
-        return True, " AND ".join(unique_alerts), max_confidence, metrics
+    # Clear GPU cache periodically to prevent memory buildup
+    _yolo_batches_run += 1
+    if DEVICE == 'cuda' and yolo_model.name == 'torch' and _yolo_batches_run % 50 == 0:
+        torch.cuda.empty_cache()
     
-    return False, "", 0.0, metrics
+    return outputs
 
-# YOLO DEVICE DETECTION
 
-def detect_electronic_devices(frame: np.ndarray, yolo_model) -> Tuple[List[Dict], float]:
+def detect_electronic_devices(frame: np.ndarray, yolo_model,
+                              size: Optional[Tuple[int, int]] = None) -> Tuple[List[Dict], float]:
     """
     Detect electronic devices using YOLO with optimizations:
     - Lower resolution inference (360x360 instead of 640x640)
     - GPU acceleration if available
+    - ONNX Runtime / INT8 CPU backends (PROCTOR_DETECTOR_BACKEND)
     - Reduced confidence threshold for faster processing
     
     COCO class IDs:
@@ -452,148 +626,45 @@ def detect_electronic_devices(frame: np.ndarray, yolo_model) -> Tuple[List[Dict]
     - 66: keyboard
     - 64: mouse
     
+    Boxes are in pixels of `size` (width, height), by default the frame's own.
+    
     Returns:
         (detections_list, max_confidence)
     """
     if yolo_model is None:
         return [], 0.0
     
-    detections = []
-    max_conf = 0.0
-    
     try:
-        # Resize frame to inference size for faster processing
-        h, w = frame.shape[:2]
-        resized_frame = cv2.resize(frame, (INFERENCE_SIZE, INFERENCE_SIZE), interpolation=cv2.INTER_LINEAR)
-        
-        # Run YOLO inference with optimized settings
-        with torch.no_grad():
-            results = yolo_model(resized_frame, verbose=False, conf=0.3, imgsz=INFERENCE_SIZE)
-        
-        # COCO dataset class IDs for devices
-        device_classes = {
-            67: 'cell phone',
-            63: 'laptop',
-            62: 'monitor',
-            66: 'keyboard',
-            64: 'mouse'
-        }
-        
-        for result in results:
-            boxes = result.boxes
-            for box in boxes:
-                class_id = int(box.cls[0])
-                confidence = float(box.conf[0])
-                
-                if class_id in device_classes:
-                    device_name = device_classes[class_id]
-                    x1, y1, x2, y2 = box.xyxy[0].tolist()
-                    
-                    # Scale bounding box back to original frame size
-                    scale_x = w / INFERENCE_SIZE
-                    scale_y = h / INFERENCE_SIZE
-                    x1_orig = int(x1 * scale_x)
-                    y1_orig = int(y1 * scale_y)
-                    x2_orig = int(x2 * scale_x)
-                    y2_orig = int(y2 * scale_y)
-                    
-                    detections.append({
-                        "label": device_name,
-                        "box": [x1_orig, y1_orig, x2_orig, y2_orig],
-                        "conf": confidence
-                    })
-                    
-                    max_conf = max(max_conf, confidence)
-        
-        # Clear GPU cache periodically to prevent memory buildup
-        if DEVICE == 'cuda' and buffer.frame_count % 50 == 0:
-            torch.cuda.empty_cache()
-        
+        if size is None:
+            size = (frame.shape[1], frame.shape[0])
+        return detect_electronic_devices_batch([prepare_device_detection_input(frame)], [size], yolo_model)[0]
     except Exception as e:
         logger.warning(f"Error in device detection: {e}")
         return [], 0.0
-    
-    return detections, max_conf
-
-# BEHAVIOR STATUS CLASSIFICATION
-
-def get_human_behavior_status(gaze_h: float, gaze_v: float, pose_landmarks, 
-                               num_faces: int, ear: float) -> str:
-    """
-    Determine current human behavior status for dashboard display
-    
-    Returns human-readable status string with priority:
-    1. Face count issues (most critical)
-    2. Eyes closed
-    3. Gaze direction
-    4. Pose-based detection
-    5. Normal status
-    """
-    # Priority 1: Face count
-    if num_faces == 0:
-        return "No person detected"
-    elif num_faces > 1:
-        return "Multiple people detected"
-    
-    # Priority 2: Eyes closed
-    if ear < 0.15:
-        return "Eyes closed or blinking"
-    
-    # Priority 3: Extreme gaze deviation
-    if abs(gaze_h) > 35 or abs(gaze_v) > 35:
-        if abs(gaze_h) > abs(gaze_v):
-            return "Looking right (away from screen)" if gaze_h > 35 else "Looking left (away from screen)"
-        else:
-            return "Looking down" if gaze_v > 35 else "Looking up"
-    
-    # Priority 4: Pose-based detection
-    if pose_landmarks:
-        landmarks = pose_landmarks.landmark
-        nose = landmarks[mp_pose.PoseLandmark.NOSE.value]
-        
-        if nose.visibility > 0.5:
-            left_shoulder = landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value]
-            right_shoulder = landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER.value]
-            
-            if left_shoulder.visibility > 0.5 and right_shoulder.visibility > 0.5:
-                shoulders_center_y = (left_shoulder.y + right_shoulder.y) / 2
-                if nose.y > shoulders_center_y + 0.20:
-                    return "Looking down significantly"
-    
-    # Priority 5: Moderate gaze deviation (warning level)
-    if abs(gaze_h) > 20 or abs(gaze_v) > 20:
-        return "Slight gaze deviation"
-    
-    # Default: All good
-    return "Focused on screen"
 
 # ============================================================================
 # VISUALIZATION
 # ============================================================================
-def draw_face_boxes(frame: np.ndarray, detections) -> np.ndarray:
+def draw_face_boxes(frame: np.ndarray, face_boxes: List[Tuple]) -> np.ndarray:
     """
-    Draw bounding boxes around detected faces
+    Draw bounding boxes around detected faces (in place)
     Green = exactly 1 face (good), Red = multiple or no faces (bad)
     """
-    if not detections:
+    if not face_boxes:
         return frame
         
-    viz_frame = frame.copy()
+    viz_frame = frame
     h, w = frame.shape[:2]
-    num_faces = len(detections)
+    num_faces = len(face_boxes)
     color = (0, 255, 0) if num_faces == 1 else (0, 0, 255)
     
-    for detection in detections:
-        bboxC = detection.location_data.relative_bounding_box
-        xmin = int(bboxC.xmin * w)
-        ymin = int(bboxC.ymin * h)
-        width = int(bboxC.width * w)
-        height = int(bboxC.height * h)
+    for x0, y0, x1, y1, score in face_boxes:
+        xmin = int(x0 * w)
+        ymin = int(y0 * h)
         
-        cv2.rectangle(viz_frame, (xmin, ymin), (xmin + width, ymin + height), color, 2)
+        cv2.rectangle(viz_frame, (xmin, ymin), (int(x1 * w), int(y1 * h)), color, 2)
         
         # Draw confidence score
-        score = detection.score[0]
         label = f"Face: {score:.2f}"
         cv2.putText(viz_frame, label, (xmin, ymin - 10), 
                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
@@ -602,51 +673,339 @@ def draw_face_boxes(frame: np.ndarray, detections) -> np.ndarray:
 
 
 def create_heatmap_overlay(frame: np.ndarray, alerts: List[str], 
-                           behavior_status: str, fps: float) -> np.ndarray:
+                           behavior_status: str, fps: float,
+                           workspace: Optional[FrameWorkspace] = None) -> np.ndarray:
     """
     Create visualization overlay with alerts and status
+    
+    Draws in place. Only the status bar and the FPS box differ from the
+    input, so only those regions are blended, against copies of their
+    original pixels (kept in `workspace` when given).
     """
-    overlay = frame.copy()
     h, w = frame.shape[:2]
+    fps_text = f"FPS: {fps:.1f}"
+    text_size = cv2.getTextSize(fps_text, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)[0]
+    box_x0 = max(0, w - text_size[0] - 20)
+    bar_h = min(61, h)                 # The filled bar covers rows 0..60
+    box_y0 = max(bar_h, h - 40)
+    
+    bar = frame[:bar_h]
+    box = frame[box_y0:, box_x0:]
+    if workspace is not None:
+        bar_orig = workspace.copy_of("status_bar", bar)
+        box_orig = workspace.copy_of("fps_box", box)
+    else:
+        bar_orig, box_orig = bar.copy(), box.copy()
     
     # Status bar at top
     if alerts:
         color = (0, 0, 255)  # Red for alerts
-        cv2.rectangle(overlay, (0, 0), (w, 60), color, -1)
-        cv2.addWeighted(overlay, 0.3, frame, 0.7, 0, overlay)
+        cv2.rectangle(frame, (0, 0), (w, 60), color, -1)
+        cv2.addWeighted(bar, 0.3, bar_orig, 0.7, 0, bar)
         
         # Alert text
         alert_text = " | ".join(alerts)
-        cv2.putText(overlay, f"ALERT: {alert_text}", (10, 25),
+        cv2.putText(frame, f"ALERT: {alert_text}", (10, 25),
                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
         
         # Behavior status
-        cv2.putText(overlay, f"Status: {behavior_status}", (10, 50),
+        cv2.putText(frame, f"Status: {behavior_status}", (10, 50),
                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
     else:
         color = (0, 255, 0)  # Green for OK
-        cv2.rectangle(overlay, (0, 0), (w, 60), color, -1)
-        cv2.addWeighted(overlay, 0.2, frame, 0.8, 0, overlay)
+        cv2.rectangle(frame, (0, 0), (w, 60), color, -1)
+        cv2.addWeighted(bar, 0.2, bar_orig, 0.8, 0, bar)
         
-        cv2.putText(overlay, f"Status: {behavior_status}", (10, 25),
+        cv2.putText(frame, f"Status: {behavior_status}", (10, 25),
                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
         
-        cv2.putText(overlay, "All Clear - Monitoring Active", (10, 50),
+        cv2.putText(frame, "All Clear - Monitoring Active", (10, 50),
                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
     
-    # FPS counter at bottom right
-    fps_text = f"FPS: {fps:.1f}"
-    text_size = cv2.getTextSize(fps_text, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)[0]
-    cv2.rectangle(overlay, (w - text_size[0] - 20, h - 40), (w, h), (0, 0, 0), -1)
-    cv2.addWeighted(overlay, 0.5, frame, 0.5, 0, overlay)
-    cv2.putText(overlay, fps_text, (w - text_size[0] - 10, h - 15),
+    # FPS counter at bottom right; then the whole overlay is blended 50/50
+    # with the original frame, which only changes the two regions
+    cv2.rectangle(frame, (w - text_size[0] - 20, h - 40), (w, h), (0, 0, 0), -1)
+    cv2.addWeighted(bar, 0.5, bar_orig, 0.5, 0, bar)
+    cv2.addWeighted(box, 0.5, box_orig, 0.5, 0, box)
+    cv2.putText(frame, fps_text, (w - text_size[0] - 10, h - 15),
                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
     
-    return overlay
+    return frame
+
+
+POSE_LANDMARK_SPEC = mp_drawing.DrawingSpec(color=(245, 117, 66), thickness=2, circle_radius=2)
+POSE_CONNECTION_SPEC = mp_drawing.DrawingSpec(color=(245, 66, 230), thickness=2, circle_radius=2)
+
+
+def render_visualization(workspace: FrameWorkspace, frame: np.ndarray, face_boxes: List[Tuple],
+                         face_points: Optional[List[np.ndarray]], pose_landmarks, yolo_detections: List[Dict],
+                         alerts: List[str], behavior_status: str, fps: float,
+                         include_iris: bool = True) -> np.ndarray:
+    """
+    Draw the annotated frame into the session's reusable "viz" buffer.
+    The returned image is overwritten by the next call.
+    """
+    img_h, img_w = frame.shape[:2]
+    viz_frame = workspace.copy_of("viz", frame)
+    
+    # Draw face boxes
+    if face_boxes:
+        draw_face_boxes(viz_frame, face_boxes)
+    
+    # Draw iris points
+    if face_points and include_iris:
+        for points in face_points:
+            draw_iris_points(viz_frame, points, img_w, img_h)
+            # Optionally draw head pose axis
+            # draw_head_pose_axis(viz_frame, points, img_w, img_h, pitch, yaw, roll)
+    
+    # Draw pose skeleton
+    if pose_landmarks:
+        mp_drawing.draw_landmarks(
+            viz_frame,
+            pose_landmarks,
+            mp_pose.POSE_CONNECTIONS,
+            landmark_drawing_spec=POSE_LANDMARK_SPEC,
+            connection_drawing_spec=POSE_CONNECTION_SPEC
+        )
+    
+    # Draw YOLO device bounding boxes
+    for det in yolo_detections:
+        box = det['box']
+        label = f"{det['label']} {det['conf']:.2f}"
+        cv2.rectangle(viz_frame, (box[0], box[1]), (box[2], box[3]), (0, 165, 255), 2)
+        cv2.putText(viz_frame, label, (box[0], box[1] - 10), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 165, 255), 2)
+    
+    # Add status overlay
+    return create_heatmap_overlay(viz_frame, alerts, behavior_status, fps, workspace)
+
+
+def build_overlay_primitives(face_boxes: List[Tuple], face_points: Optional[List[np.ndarray]], pose_landmarks,
+                             yolo_detections: List[Dict], alerts: List[str],
+                             behavior_status: str, fps: float, img_w: int, img_h: int,
+                             include_iris: bool = True) -> Dict:
+    """
+    Overlay primitives for the client to draw on its own video (vector mode).
+    Carries the same information as the rendered visualization without any
+    frame copies or JPEG encoding. Coordinates are normalized to [0, 1].
+    """
+    face_box_list = [
+        [round(x0, 4), round(y0, 4), round(x1, 4), round(y1, 4), round(score, 2)]
+        for x0, y0, x1, y1, score in face_boxes
+    ]
+    
+    iris_points = []
+    for points in (face_points or []) if include_iris else []:
+        iris_points.extend([round(x, 4), round(y, 4)] for x, y in points[IRIS_INDEX, :2].tolist())
+    
+    # [x, y, visibility] in MediaPipe PoseLandmark order; the client owns the
+    # (static) skeleton connection list
+    pose_keypoints = []
+    if pose_landmarks:
+        pose_keypoints = [
+            [round(lm.x, 4), round(lm.y, 4), round(lm.visibility, 2)]
+            for lm in pose_landmarks.landmark
+        ]
+    
+    device_boxes = [
+        {
+            "label": det['label'],
+            "conf": round(det['conf'], 2),
+            "box": [round(det['box'][0] / img_w, 4), round(det['box'][1] / img_h, 4),
+                    round(det['box'][2] / img_w, 4), round(det['box'][3] / img_h, 4)]
+        }
+        for det in yolo_detections
+    ]
+    
+    return {
+        "face_boxes": face_box_list,
+        "iris_points": iris_points,
+        "pose_keypoints": pose_keypoints,
+        "device_boxes": device_boxes,
+        "alerts": sorted(set(alerts)),
+        "behavior_status": behavior_status,
+        "fps": round(fps, 1)
+    }
+
+# PER-FRAME PREPROCESSING: prepare_inference_frame and to_rgb live in utils/proctoring/workspace.py
+
+# DETECTOR CASCADE
+
+def face_boxes_from_detections(detections) -> List[Tuple]:
+    """Normalized (xmin, ymin, xmax, ymax, score) boxes from FaceDetection"""
+    boxes = []
+    for detection in detections or []:
+        bbox = detection.location_data.relative_bounding_box
+        boxes.append((bbox.xmin, bbox.ymin, bbox.xmin + bbox.width,
+                      bbox.ymin + bbox.height, detection.score[0]))
+    return boxes
+
+
+def face_boxes_from_mesh(face_points: List[np.ndarray], score: float) -> List[Tuple]:
+    """Normalized boxes spanning each FaceMesh face (the mesh has no score of its own)"""
+    return [face_box(points) + (score,) for points in face_points or []]
+
+
+def full_resolution_crop(frame: np.ndarray, roi, max_side: int,
+                         full_frame: Optional[Callable[[], np.ndarray]]) -> np.ndarray:
+    """
+    Frame to cut `roi` from: the (possibly reduced) decoded frame, unless its
+    crop would come out smaller than `max_side` and `full_frame` can decode
+    the full resolution instead. ROI boxes are normalized, so either works.
+    """
+    if full_frame is None:
+        return frame
+    h, w = frame.shape[:2]
+    if max((roi[2] - roi[0]) * w, (roi[3] - roi[1]) * h) >= max_side:
+        return frame
+    return full_frame()
+
+
+def run_detector_cascade(buffer: FrameBuffer, frame: np.ndarray, rgb_frame: np.ndarray,
+                         graphs: SessionGraphs, force_process: bool = False,
+                         timer: StageTimer = DISABLED_TIMER,
+                         full_frame: Optional[Callable[[], np.ndarray]] = None
+                         ) -> Tuple[List[Tuple], Optional[list], Optional[object], List[str]]:
+    """
+    Run only the MediaPipe stages this frame needs, cheapest first:
+    
+    1. FaceDetection, only to (re)acquire a face. While FaceMesh is tracking
+       it re-runs its own detector whenever it tracks fewer than
+       max_num_faces, so a second face still shows up without this stage.
+       No face here ends the cascade: mesh and pose have nothing to look at.
+    2. FaceMesh for gaze, EAR and head pose; the face count comes from the
+       mesh whenever it found faces. With a single face the mesh only runs
+       on keyframes and FLOW_LANDMARKS are propagated by optical flow in
+       between ("landmark_flow").
+    3. Pose, only when the hand-near-face / looking-down checks are due
+       (see the profile's pose_interval); otherwise the cached landmarks
+       are returned. Profiles with run_pose=False skip this stage.
+    
+    With a single face (and ROI_ENABLED), FaceMesh and Pose run on crops of
+    the decoded `frame` instead of the downscaled `rgb_frame`, and their
+    landmarks are mapped back to full-frame normalized coordinates. When
+    `frame` was decoded at reduced scale and a crop would be smaller than
+    the model input, `full_frame()` supplies the full resolution instead.
+    Since the mesh cannot see outside its crop, FaceDetection then re-checks
+    the whole frame every FACE_RECHECK_INTERVAL frames for a second person.
+    
+    FaceMesh and Pose are the session's own `graphs` (leased from
+    graph_pool), so their tracking only ever sees this client's frames.
+    Each stage that runs is timed under its name in `timer`.
+    Faces come back as (N, 3) landmark arrays, converted once from the
+    FaceMesh result (see face_features).
+    
+    Returns:
+        (face_boxes, face_points, pose_landmarks, stages_run)
+    """
+    profile = buffer.profile
+    stages = []
+    face_boxes: List[Tuple] = []
+    face_points: Optional[List[np.ndarray]] = None
+    pose_landmarks = None
+    aspect = frame.shape[1] / frame.shape[0]
+    
+    tracker = buffer.landmark_tracker
+    recheck_due = ((buffer.mesh_roi.box is not None or tracker.active) and
+                   buffer.frame_count - buffer.last_face_detection_frame >= FACE_RECHECK_INTERVAL)
+    if not buffer.face_tracked or force_process or recheck_due:
+        stages.append("face_detection")
+        buffer.last_face_detection_frame = buffer.frame_count
+        with timer.stage("face_detection"):
+            face_boxes = face_boxes_from_detections(face_detection.process(rgb_frame).detections)
+        if face_boxes:
+            buffer.last_face_conf = max(box[4] for box in face_boxes)
+    
+    if face_boxes or buffer.face_tracked:
+        gray = None
+        tracked_points = None
+        with timer.stage("landmark_flow"):
+            if profile.landmark_keyframe_interval > 1:
+                # Alternating buffers: the tracker keeps the previous gray frame
+                gray = cv2.cvtColor(rgb_frame, cv2.COLOR_RGB2GRAY,
+                                    dst=buffer.workspace.get_alternating("gray", rgb_frame.shape[:2]))
+            if gray is not None and not force_process and len(face_boxes) <= 1 and not tracker.keyframe_due():
+                tracked_points = tracker.track(gray)
+        
+        if tracked_points is not None:
+            stages.append("landmark_flow")
+            face_points = [tracked_points]
+            face_boxes = [tracker.box]
+        else:
+            stages.append("face_mesh")
+            with timer.stage("face_mesh"):
+                # Crop around the single known face: this frame's detection, else
+                # the previous mesh result
+                known_faces = face_boxes or buffer.last_face_boxes
+                if ROI_ENABLED and len(known_faces) == 1:
+                    roi = buffer.mesh_roi.update(known_faces[0], face_roi(known_faces[0], aspect, FACE_ROI_SCALE))
+                    crop_source = full_resolution_crop(frame, roi, FACE_ROI_MAX_SIDE, full_frame)
+                    mesh_input, roi = crop_rgb(crop_source, roi, FACE_ROI_MAX_SIDE, buffer.workspace, "face_crop")
+                else:
+                    buffer.mesh_roi.reset()
+                    mesh_input, roi = rgb_frame, None
+            
+                multi_face_landmarks = graphs.face_mesh.process(mesh_input).multi_face_landmarks
+                face_points = [landmarks_to_array(fl) for fl in multi_face_landmarks or []]
+                if roi is not None:
+                    for points in face_points:
+                        remap_points(points, roi)
+                buffer.face_tracked = bool(face_points)
+                if face_points:
+                    face_boxes = face_boxes_from_mesh(face_points, buffer.last_face_conf)
+            
+                # New keyframe for the tracker (single face only)
+                if gray is not None and len(face_points) == 1:
+                    tracker.start(gray, face_points[0], face_boxes[0])
+                else:
+                    tracker.reset()
+    
+    if face_boxes:
+        pose_due = profile.run_pose and (
+            force_process
+            or buffer.pose_suspicious
+            or buffer.frame_count - buffer.last_pose_frame >= profile.pose_interval
+        )
+        if pose_due:
+            stages.append("pose")
+            with timer.stage("pose"):
+                if ROI_ENABLED and len(face_boxes) == 1:
+                    roi = buffer.pose_roi.update(face_boxes[0], upper_body_roi(face_boxes[0], aspect))
+                    crop_source = full_resolution_crop(frame, roi, POSE_ROI_MAX_SIDE, full_frame)
+                    pose_input, roi = crop_rgb(crop_source, roi, POSE_ROI_MAX_SIDE, buffer.workspace, "pose_crop")
+                else:
+                    buffer.pose_roi.reset()
+                    pose_input, roi = rgb_frame, None
+            
+                pose_landmarks = graphs.pose.process(pose_input).pose_landmarks
+                if pose_landmarks and roi is not None:
+                    remap_landmarks(pose_landmarks, roi)
+                buffer.last_pose_landmarks = pose_landmarks
+                buffer.last_pose_frame = buffer.frame_count
+        pose_landmarks = buffer.last_pose_landmarks
+    else:
+        # Nobody in frame: forget the pose so it is re-run once a face is back
+        buffer.face_tracked = False
+        buffer.last_pose_landmarks = None
+        buffer.pose_suspicious = False
+        buffer.last_pose_frame = -profile.pose_interval
+        buffer.mesh_roi.reset()
+        buffer.pose_roi.reset()
+        tracker.reset()
+    
+    buffer.last_face_boxes = face_boxes
+    buffer.stage_counts["frames"] += 1
+    for stage in stages:
+        buffer.stage_counts[stage] += 1
+    return face_boxes, face_points, pose_landmarks, stages
 
 # MAIN PROCESSING PIPELINE
 
-async def process_frame(frame: np.ndarray, client_id: str, force_process: bool = False) -> Dict:
+def analyze_frame(frame: np.ndarray, client_id: str, force_process: bool = False,
+                  frame_number: Optional[int] = None, viz_encoding: str = "base64",
+                  viz_mode: str = "image", profile: Optional[str] = None,
+                  timestamp: Optional[float] = None) -> Dict:
     """
     Main processing pipeline with AGGRESSIVE OPTIMIZATIONS:
     
@@ -657,27 +1016,63 @@ async def process_frame(frame: np.ndarray, client_id: str, force_process: bool =
     4. GPU acceleration: Automatic GPU detection and usage
     5. Memory management: Periodic GPU cache clearing
     6. Temporal smoothing: Reduce false positives
+    7. Inference pool: called inside a worker process (see process_frame)
+    8. Detector cascade: only the MediaPipe stages a frame needs
+       (see run_detector_cascade)
+    9. ROI crops: FaceMesh and Pose see only the face / upper body
+    10. Landmark tracking: optical flow between FaceMesh keyframes
     
     Expected performance: 3-5x faster with minimal accuracy loss
     
+    Args:
+        frame: BGR image, or the still-encoded JPEG bytes as a 1-D uint8
+            array (decoded here at reduced scale, see EncodedFrame).
+        frame_number: Arrival number assigned by the WebSocket ingest loop,
+            which has already applied SKIP_FRAMES and dropped stale frames.
+            When omitted, frames are counted and skipped here.
+        viz_encoding: "base64" for the JSON protocol, "jpeg" to return the
+            raw JPEG bytes for the binary protocol.
+        viz_mode: "image" renders and encodes the annotated frame ("viz");
+            "vector" skips rendering and returns overlay primitives
+            ("overlay") for the client to draw.
+        profile: Proctoring profile name (see PROFILES); fixed for the
+            session by its first frame. Unknown names use DEFAULT_PROFILE.
+        timestamp: Capture time of the frame in seconds (recorded video,
+            see utils/proctoring/offline.py); temporal logic then follows
+            the video instead of the clock.
+    
     Returns:
         JSON response with alerts, stats, and visualization
     """
     start_time = time.time()
+    load_models()
     
     # Initialize buffer if needed
     if client_id not in client_buffers:
-        client_buffers[client_id] = FrameBuffer(maxlen=30)
+        client_buffers[client_id] = FrameBuffer(
+            maxlen=30, profile=resolve_profile(profile, PROFILES, DEFAULT_PROFILE), start_time=timestamp
+        )
+        if LANDMARK_RECORD_DIR:
+            client_buffers[client_id].landmark_recorder = LandmarkRecorder(
+                LANDMARK_RECORD_DIR, client_id,
+                {"profile": client_buffers[client_id].profile.name,
+                 "refine_landmarks": client_buffers[client_id].profile.refine_landmarks}
+            )
     
     buffer = client_buffers[client_id]
+    session_profile = buffer.profile
+    buffer.frame_time = timestamp
     buffer.clear_old_alerts(max_age=5.0)  # Clean up old alerts
-    buffer.frame_count += 1
+    if frame_number is not None:
+        buffer.frame_count = frame_number
+    else:
+        buffer.frame_count += 1
     
     # ========================================================================
     # 🚀 OPTIMIZATION 1: FRAME SKIPPING
     # ========================================================================
     # Skip processing on every Nth frame to reduce computational load
-    should_skip = (buffer.frame_count % SKIP_FRAMES) != 0
+    should_skip = frame_number is None and (buffer.frame_count % session_profile.skip_frames) != 0
     
     if should_skip and not force_process:
         # Return minimal response for skipped frame (fast path)
@@ -687,218 +1082,195 @@ async def process_frame(frame: np.ndarray, client_id: str, force_process: bool =
             "fps": buffer.get_avg_fps()
         }
     
+    # Every STAGE_SAMPLE_EVERY-th frame of this process is timed per stage
+    timer = stage_stats.timer() if STAGE_SAMPLE_EVERY > 0 else DISABLED_TIMER
+    
+    # Encoded input: decode straight to about the inference size instead of
+    # decoding full resolution and shrinking it right after. The few
+    # consumers that need full resolution decode it lazily via full_frame
+    # (timed under the face_mesh / pose stage that crops from it, or as
+    # decode when YOLO needs it). The image overlay is drawn on every frame
+    # at full resolution, so those sessions decode once, at full size.
+    source = None
+    full_frame = None
+    if frame.ndim == 1:
+        source = EncodedFrame(frame)
+        with timer.stage("decode"):
+            if viz_mode == "vector":
+                frame = source.decode(session_profile.inference_size, DECODE_MIN_SCALE)
+            else:
+                frame = source.full()
+        if source.reduced:
+            full_frame = source.full
+    
     # ========================================================================
     # 🚀 OPTIMIZATION 2: LOWER RESOLUTION PROCESSING
     # ========================================================================
-    # Process at lower resolution (360x360 sweet spot for speed/accuracy)
+    # Process at lower resolution (360x360 sweet spot for speed/accuracy;
+    # the width comes from the session's profile)
+    # Work buffers come from the session workspace (no per-frame allocation)
     img_h, img_w = frame.shape[:2]
-    scale_factor = INFERENCE_SIZE / img_w
-    new_w, new_h = INFERENCE_SIZE, int(img_h * scale_factor)
-    small_frame = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
-    
-    rgb_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+    with timer.stage("resize"):
+        small_frame = prepare_inference_frame(buffer.workspace, frame, session_profile.inference_size)
     proc_h, proc_w = small_frame.shape[:2]
     
-    alerts = []
-    confidences = []
-    devices_detected = []
-    
-    # 1. FACE DETECTION - Multiple face check
-
-    face_det_results = face_detection.process(rgb_frame)
-    num_faces = 0
-    face_conf = 0.0
+    # ========================================================================
+    # 🚀 OPTIMIZATION 4: MOTION GATING
+    # ========================================================================
+    # A still exam taker produces near-identical frames: reuse the last
+    # analyzed frame's landmarks and pose instead of running the models.
+    # Alert logic below still runs every frame on the reused outputs.
+    with timer.stage("motion_gate"):
+        reuse_inference = buffer.motion_gate.update(
+            small_frame, can_reuse=buffer.last_inference is not None and not force_process,
+            now=buffer.frame_time
+        )
     
-    if face_det_results.detections:
-        num_faces = len(face_det_results.detections)
-        face_conf = max([d.score[0] for d in face_det_results.detections])
-        
-        if num_faces > 1:
-            alerts.append("multiple_faces")
-            confidences.append(0.95)
-        elif num_faces == 0:
-            buffer.add_alert("no_face_detected")
-            if buffer.should_trigger_alert("no_face_detected", required_count=2):
-                alerts.append("no_face_detected")
-                confidences.append(0.90)
+    if reuse_inference:
+        face_boxes, face_points, pose_landmarks = buffer.last_inference
+        stages_run = []
     else:
-        # No faces detected
-        buffer.add_alert("no_face_detected")
-        if buffer.should_trigger_alert("no_face_detected", required_count=2):
-            alerts.append("no_face_detected")
-            confidences.append(0.90)
+        with timer.stage("resize"):
+            rgb_frame = to_rgb(buffer.workspace, small_frame)
+        graphs = graph_pool.acquire(client_id, graph_kind(session_profile))
+        face_boxes, face_points, pose_landmarks, stages_run = run_detector_cascade(
+            buffer, frame, rgb_frame, graphs, force_process, timer, full_frame
+        )
+        buffer.last_inference = (face_boxes, face_points, pose_landmarks)
     
-    # 2. FACE MESH - Gaze tracking and eye analysis
+    # 1-3. Face count, gaze, EAR and pose alerts (see assess_frame)
+    with timer.stage("alert_rules"):
+        assessment = assess_frame(buffer, face_boxes, face_points, pose_landmarks,
+                                  "pose" in stages_run, proc_w, proc_h, ALERT_THRESHOLDS)
+    alerts = assessment["alerts"]
+    suspicious_evidence = assessment["suspicious_evidence"]
     
-    face_mesh_results = face_mesh.process(rgb_frame)
-    gaze_h, gaze_v = 0.0, 0.0
-    avg_ear = 0.3
+    # Head pose estimation (using original frame dimensions)
     pitch, yaw, roll = 0.0, 0.0, 0.0
-    
-    if face_mesh_results.multi_face_landmarks:
-        face_landmarks = face_mesh_results.multi_face_landmarks[0]  # Use first face
-        
-        # Gaze direction
-        gaze_h, gaze_v = detect_gaze_direction(face_landmarks, proc_w, proc_h)
-        
-        # FIXED: Temporal smoothing for gaze alerts (avoid false positives)
-        # IMMEDIATE GAZE ALERT - No temporal smoothing
-        if abs(gaze_h) > 10 or abs(gaze_v) > 10:
-            alerts.append("gaze_off_screen")
-            confidences.append(0.85)
-            print(f"🚨 GAZE ALERT: H={gaze_h:.1f}° V={gaze_v:.1f}°")
-        
-        # Eye Aspect Ratio (blink detection)
-        left_eye_points = np.array([[face_landmarks.landmark[idx].x * proc_w,
-                                     face_landmarks.landmark[idx].y * proc_h] 
-                                    for idx in LEFT_EYE_LANDMARKS])
-        right_eye_points = np.array([[face_landmarks.landmark[idx].x * proc_w,
-                                      face_landmarks.landmark[idx].y * proc_h] 
-                                     for idx in RIGHT_EYE_LANDMARKS])
-        
-        left_ear = calculate_ear(left_eye_points)
-        right_ear = calculate_ear(right_eye_points)
-        avg_ear = (left_ear + right_ear) / 2.0
-        
-        # Head pose estimation (using original frame dimensions)
-        pitch, yaw, roll = calculate_head_pose(face_landmarks, img_w, img_h)
-    
-    # 3. POSE DETECTION - Suspicious activity
-
-    pose_results = pose.process(rgb_frame)
-    pose_metrics = {}
-    
-    if pose_results.pose_landmarks:
-        is_suspicious, activity_type, activity_conf, pose_metrics = detect_suspicious_activity(
-            buffer, pose_results.pose_landmarks
-        )
-        
-        if is_suspicious:
-            buffer.add_alert(activity_type)
-            # Immediate trigger for hand near face (critical)
-            if "hand_near_face" in activity_type:
-                alerts.append(activity_type)
-                confidences.append(activity_conf)
-            # Temporal smoothing for looking down
-            elif "looking_down" in activity_type:
-                if buffer.should_trigger_alert("looking_down", required_count=3, time_window=1.5):
-                    alerts.append(activity_type)
-                    confidences.append(activity_conf)
+    with timer.stage("head_pose"):
+        if face_points:
+            pitch, yaw, roll = buffer.head_pose.estimate(face_points[0], img_w, img_h)
+        else:
+            # The next face starts a fresh solve
+            buffer.head_pose.reset()
     
     # ========================================================================
     # 🚀 OPTIMIZATION 3: YOLO DEVICE DETECTION - Intelligent Caching
     # ========================================================================
     # Run heavy YOLO inference only every Nth frame, use cached results otherwise
     # YOLO is the most expensive operation - caching it saves 80-90% of time
+    # N adapts per session: short while there is suspicious evidence, long
+    # during calm stretches, and bounded by the process-wide budget.
+    # With the batcher, YOLO runs for several sessions at once in the
+    # background and this frame uses whatever is cached.
     yolo_detections = []
-    dev_conf = 0.0
+    run_yolo = False
     
-    if yolo_model is not None:
+    if yolo_model is not None or yolo_batcher is not None:
         # Decide whether to run YOLO or use cached results
-        run_yolo = (buffer.frame_count % YOLO_SKIP_FRAMES == 0) or force_process
+        # Counted in received frames, so dropped frames cannot starve YOLO
+        if buffer.yolo_cache_valid and buffer.last_yolo_detections:
+            suspicious_evidence.append("device_detected")
+        buffer.yolo_scheduler.observe(suspicious_evidence, now=buffer.frame_time)
+        run_yolo = buffer.yolo_scheduler.should_run(
+            buffer.frame_count - buffer.last_yolo_frame, yolo_budget, force=force_process,
+            now=buffer.frame_time
+        )
         
         if run_yolo:
-            # Run expensive YOLO inference
-            yolo_detections, dev_conf = detect_electronic_devices(frame, yolo_model)
-            # Cache the results for next frames
-            buffer.last_yolo_detections = yolo_detections
-            buffer.last_dev_conf = dev_conf
-            buffer.yolo_cache_valid = True
-        else:
-            # Use cached results from previous YOLO run
-            if buffer.yolo_cache_valid and buffer.last_yolo_detections is not None:
-                yolo_detections = buffer.last_yolo_detections
-                dev_conf = buffer.last_dev_conf
-            # else: keep empty list, no detection this frame
-    else:
-        yolo_detections = []
-    
-    # Process YOLO detections
-    if yolo_detections:
-        devices_detected = [d['label'] for d in yolo_detections]
-        dev_conf = max([d['conf'] for d in yolo_detections])
+            buffer.last_yolo_frame = buffer.frame_count
+            # YOLO sees the full resolution; boxes are scaled to the decoded frame
+            yolo_frame = frame
+            if full_frame is not None:
+                with timer.stage("decode"):
+                    yolo_frame = full_frame()
+            if yolo_batcher is not None and not force_process:
+                # Queue for the next cross-session batch; the result lands in
+                # this session's cache via store_yolo_result
+                with timer.stage("yolo_submit"):
+                    buffer.yolo_pending = yolo_batcher.submit(
+                        client_id, prepare_device_detection_input(yolo_frame), (img_w, img_h),
+                        buffer.store_yolo_result
+                    )
+            elif yolo_model is not None:
+                # Run expensive YOLO inline
+                with timer.stage("yolo"):
+                    buffer.store_yolo_result(*detect_electronic_devices(yolo_frame, yolo_model, (img_w, img_h)))
+            else:
+                # Shared detector process (no model here): wait for this frame
+                with timer.stage("yolo"):
+                    buffer.store_yolo_result(*yolo_batcher.detect(prepare_device_detection_input(yolo_frame),
+                                                                  (img_w, img_h)))
         
-        # Immediate alerts for critical devices
-        if 'cell phone' in devices_detected:
-            alerts.append("device_detected_phone")
-            confidences.append(dev_conf)
-        if 'laptop' in devices_detected:
-            alerts.append("device_detected_laptop")
-            confidences.append(dev_conf)
-        if 'monitor' in devices_detected:
-            alerts.append("device_detected_monitor")
-            confidences.append(dev_conf)
+        # Use cached results from the latest YOLO run
+        if buffer.yolo_cache_valid and buffer.last_yolo_detections is not None:
+            yolo_detections = buffer.last_yolo_detections
+        # else: keep empty list, no detection this frame
     
     # ========================================================================
-    # 5. Update buffer and calculate behavior status
+    # 5. Device alerts, update buffer and calculate behavior status
     # ========================================================================
-    buffer.add(small_frame, None, gaze_h, avg_ear)
-    
-    behavior_status = get_human_behavior_status(
-        gaze_h, gaze_v, 
-        pose_results.pose_landmarks if pose_results else None,
-        num_faces, avg_ear
-    )
+    finish_assessment(buffer, assessment, yolo_detections, pose_landmarks, ALERT_THRESHOLDS)
+    behavior_status = assessment["behavior_status"]
+    num_faces = assessment["num_faces"]
+    gaze_h, gaze_v, avg_ear = assessment["gaze_h"], assessment["gaze_v"], assessment["ear"]
+    pose_metrics = assessment["pose_metrics"]
+    
+    if buffer.landmark_recorder is not None:
+        buffer.landmark_recorder.add(
+            buffer.frame_count, buffer.frame_time if buffer.frame_time is not None else time.time(),
+            (img_w, img_h, proc_w, proc_h),
+            face_boxes, face_points, pose_landmarks, "pose" in stages_run, yolo_detections,
+            assessment["alert"]
+        )
     
     # ========================================================================
-    # 6. Create visualization overlay (on original frame for quality)
+    # 6. Create visualization overlay (on the full-resolution frame for quality)
     # ========================================================================
-    viz_frame = frame.copy()
-    
-    # Draw face boxes
-    if face_det_results.detections:
-        viz_frame = draw_face_boxes(viz_frame, face_det_results.detections)
-    
-    # Draw iris points
-    if face_mesh_results.multi_face_landmarks:
-        for fl in face_mesh_results.multi_face_landmarks:
-            draw_iris_points(viz_frame, fl, img_w, img_h)
-            # Optionally draw head pose axis
-            # draw_head_pose_axis(viz_frame, fl, img_w, img_h, pitch, yaw, roll)
-    
-    # Draw pose skeleton
-    if pose_results.pose_landmarks:
-        mp_drawing.draw_landmarks(
-            viz_frame,
-            pose_results.pose_landmarks,
-            mp_pose.POSE_CONNECTIONS,
-            landmark_drawing_spec=mp_drawing.DrawingSpec(color=(245, 117, 66), thickness=2, circle_radius=2),
-            connection_drawing_spec=mp_drawing.DrawingSpec(color=(245, 66, 230), thickness=2, circle_radius=2)
-        )
-    
-    # Draw YOLO device bounding boxes
-    for det in yolo_detections:
-        box = det['box']
-        label = f"{det['label']} {det['conf']:.2f}"
-        cv2.rectangle(viz_frame, (box[0], box[1]), (box[2], box[3]), (0, 165, 255), 2)
-        cv2.putText(viz_frame, label, (box[0], box[1] - 10), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 165, 255), 2)
-    
-    # Add status overlay
     current_fps = buffer.update_fps()
-    viz_frame = create_heatmap_overlay(viz_frame, alerts, behavior_status, current_fps)
-    
-    # Encode to base64
-    _, buffer_img = cv2.imencode('.jpg', viz_frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
-    viz_base64 = base64.b64encode(buffer_img).decode('utf-8')
+    overlay_primitives = None
+    viz_payload = None
+    
+    if viz_mode == "vector":
+        # Client draws on its local video: no frame copies, no JPEG encode
+        with timer.stage("overlay"):
+            overlay_primitives = build_overlay_primitives(
+                face_boxes, face_points,
+                pose_landmarks, yolo_detections, alerts, behavior_status,
+                current_fps, img_w, img_h, include_iris=session_profile.refine_landmarks
+            )
+    else:
+        with timer.stage("render"):
+            viz_frame = render_visualization(
+                buffer.workspace, frame, face_boxes, face_points, pose_landmarks,
+                yolo_detections, alerts, behavior_status, current_fps,
+                include_iris=session_profile.refine_landmarks
+            )
+        
+        # Encode to JPEG (base64 only for the JSON protocol)
+        with timer.stage("encode"):
+            _, buffer_img = cv2.imencode('.jpg', viz_frame, [cv2.IMWRITE_JPEG_QUALITY, session_profile.viz_quality])
+            if viz_encoding == "jpeg":
+                viz_payload = buffer_img.tobytes()
+            else:
+                viz_payload = base64.b64encode(buffer_img).decode('utf-8')
     
     # ========================================================================
     # 7. Calculate metrics and prepare response
     # ========================================================================
     processing_time = (time.time() - start_time) * 1000  # milliseconds
-    
-    alert_string = " AND ".join(set(alerts)) if alerts else "none"  # Remove duplicates
-    max_conf = max(confidences) if confidences else 1.0
+    if timer.enabled:
+        stage_stats.record(timer.finish())
     
     response = {
-        "alert": alert_string,
-        "conf": round(max_conf, 2),
-        "viz": viz_base64,
+        "alert": assessment["alert"],
+        "conf": round(assessment["conf"], 2),
+        "viz": viz_payload,
         "behavior_status": behavior_status,
-        "devices_detected": list(set(devices_detected)),  # Remove duplicates
+        "devices_detected": list(set(assessment["devices_detected"])),  # Remove duplicates
         "details": {
             "num_faces": num_faces,
-            "face_detection_confidence": round(face_conf, 2),
+            "face_detection_confidence": round(assessment["face_conf"], 2),
             "gaze_horizontal": round(gaze_h, 2),
             "gaze_vertical": round(gaze_v, 2),
             "ear": round(avg_ear, 3),
@@ -912,85 +1284,661 @@ async def process_frame(frame: np.ndarray, client_id: str, force_process: bool =
             "fps": round(current_fps, 1),
             "avg_fps": round(buffer.get_avg_fps(), 1),
             "frame_count": buffer.frame_count,
-            "yolo_cached": not run_yolo,
+            "profile": session_profile.name,
+            "decode_scale": source.factor if source is not None else 1,
+            "yolo_cached": not run_yolo or buffer.yolo_pending,
+            "yolo_batch_size": buffer.last_yolo_batch_size,
+            "yolo_interval": buffer.yolo_scheduler.interval,
+            "yolo_reason": buffer.yolo_scheduler.reason,
+            "inference_reused": reuse_inference,
+            "motion_score": (round(buffer.motion_gate.last_score, 2)
+                             if buffer.motion_gate.last_score is not None else None),
+            "reuse_ratio": round(buffer.motion_gate.reuse_ratio, 3),
+            "stages_run": stages_run,
+            "flow_error": (round(buffer.landmark_tracker.last_error, 2)
+                           if buffer.landmark_tracker.last_error is not None else None),
+            "stage_counts": dict(buffer.stage_counts),
+            "stage_ms": timer.as_ms(),
+            "graph_pool": graph_pool.stats(),
             "skipped": False
         },
         "timestamp": time.time()
     }
+    if overlay_primitives is not None:
+        del response["viz"]
+        response["overlay"] = overlay_primitives
     
     # DEBUG LOGGING - Log all detections with debug level
     if DEBUG:
         logger.debug("\n" + "="*60)
         logger.debug(f"Frame #{buffer.frame_count}")
         logger.debug(f"Faces: {num_faces}, Gaze: H={gaze_h:.1f}° V={gaze_v:.1f}°")
-        logger.debug(f"Devices: {devices_detected}")
+        logger.debug(f"Devices: {assessment['devices_detected']}")
         logger.debug(f"Alerts: {alerts}")
         logger.debug(f"Behavior: {behavior_status}")
         logger.debug("="*60 + "\n")
     
     return response
 
+# ============================================================================
+# INFERENCE DISPATCH
+# ============================================================================
+inference_pool: Optional[InferencePool] = None
+# MediaPipe graphs are not thread-safe, so the in-process fallback is serial
+_inline_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="proctor-inline")
+
+
+def init_inference_worker(worker_index: int, num_workers: int, device_detector=None):
+    """
+    Inference pool hook: split the cores between workers and load models.
+    With a shared detector, `device_detector` (a SharedDetectorClient)
+    replaces this worker's own YOLO model and batcher.
+    """
+    global yolo_batcher
+    cv2.setNumThreads(1)
+    try:
+        import torch
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // num_workers))
+    except Exception:
+        pass
+    if device_detector is not None:
+        yolo_batcher = device_detector
+    load_models(load_detector=device_detector is None)
+    logger.info(f"Inference worker {worker_index} ready (pid {os.getpid()})"
+                + (", shared device detector" if device_detector is not None else ""))
+
+
+def init_device_detector() -> Optional[DeviceDetectionBatcher]:
+    """
+    Inference pool hook of the shared detector process: the YOLO model with
+    its batcher, using the cores the inference workers leave
+    """
+    global yolo_model
+    threads = DETECTOR_THREADS or max(1, (os.cpu_count() or 1) // (INFERENCE_WORKERS + 1))
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except Exception:
+        pass
+    yolo_model = load_yolo_model(threads)
+    batcher = create_device_batcher(yolo_model)
+    logger.info(f"Shared device detector ready (pid {os.getpid()}, {threads} threads)")
+    return batcher
+
+
+def release_client(client_id: str):
+    """Drop all per-session state for a disconnected client"""
+    buffer = client_buffers.pop(client_id, None)
+    if buffer is not None and buffer.landmark_recorder is not None:
+        buffer.landmark_recorder.close()
+    if graph_pool is not None:
+        graph_pool.release(client_id)
+    if yolo_batcher is not None:
+        yolo_batcher.cancel(client_id)
+
+
+def stage_timing_state() -> Dict:
+    """Inference pool hook: this process's stage histograms (see stage_timing)"""
+    return stage_stats.state()
+
+
+def yolo_batch_state() -> Dict[int, int]:
+    """Inference pool hook: this process's YOLO frames by the size of the batch they ran in"""
+    return dict(yolo_batcher.batch_sizes) if yolo_batcher is not None else {}
+
+
+async def process_frame(frame: np.ndarray, client_id: str, force_process: bool = False,
+                        **options) -> Dict:
+    """Analyze a frame without blocking the event loop (options go to analyze_frame)"""
+    if inference_pool is not None and inference_pool.running:
+        return await inference_pool.submit(client_id, frame, force_process=force_process, **options)
+    
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _inline_executor, partial(analyze_frame, frame, client_id, force_process, **options)
+    )
+
+
+async def release_client_session(client_id: str):
+    if inference_pool is not None and inference_pool.running:
+        inference_pool.release(client_id)
+    else:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(_inline_executor, release_client, client_id)
+
+
+async def start_inference_pool():
+    """Start the worker pool (or load models in-process when disabled)"""
+    global inference_pool
+    if INFERENCE_WORKERS <= 0:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(_inline_executor, load_models)
+        logger.info("Proctoring inference running in-process")
+        return
+    
+    shared_detector = SHARED_DETECTOR and INFERENCE_WORKERS > 1 and YOLO_MAX_BATCH > 1
+    inference_pool = InferencePool(
+        "routes.proctoring",
+        num_workers=INFERENCE_WORKERS,
+        slots_per_worker=INFERENCE_SLOTS_PER_WORKER,
+        # prepare_device_detection_input frames
+        detector_slot_size=INFERENCE_SIZE * INFERENCE_SIZE * 3 if shared_detector else 0,
+        detector_slots_per_worker=DETECTOR_SLOTS_PER_WORKER,
+    )
+    inference_pool.start()
+
+
+def stop_inference_pool():
+    global inference_pool
+    if inference_pool is not None:
+        inference_pool.stop()
+        inference_pool = None
+
+# ============================================================================
+# TELEMETRY
+# ============================================================================
+telemetry_writer: Optional[TelemetryWriter] = None
+_telemetry_collection = None
+_telemetry_collection_lock = threading.Lock()
+
+
+def telemetry_collection():
+    """The telemetry collection with a relaxed write concern, resolved (and
+    created if needed) once and reused by the writer and the timeline reads.
+    Imported lazily: inference workers import this module but never touch
+    the database."""
+    global _telemetry_collection
+    with _telemetry_collection_lock:
+        if _telemetry_collection is None:
+            from pymongo.write_concern import WriteConcern
+            from db import client
+            collection = ensure_telemetry_collection(
+                client["immersia"], TELEMETRY_COLLECTION, TELEMETRY_TTL_DAYS * 86400
+            )
+            _telemetry_collection = collection.with_options(write_concern=WriteConcern(w=1, j=False))
+        return _telemetry_collection
+
+
+def start_telemetry():
+    global telemetry_writer
+    if not TELEMETRY_ENABLED:
+        return
+    telemetry_writer = TelemetryWriter(telemetry_collection)
+    telemetry_writer.start()
+
+
+def stop_telemetry():
+    global telemetry_writer
+    if telemetry_writer is not None:
+        telemetry_writer.stop()
+        logger.info(f"Telemetry writer stopped: {telemetry_writer.stats()}")
+        telemetry_writer = None
+
+
+# ============================================================================
+# EVIDENCE CLIPS
+# ============================================================================
+evidence_writer: Optional[EvidenceWriter] = None
+
+
+def evidence_store():
+    if EVIDENCE_STORE == "disk":
+        return DirectoryEvidenceStore(EVIDENCE_DIR)
+    from db import client
+    return GridFSEvidenceStore(client["immersia"])
+
+
+def start_evidence():
+    global evidence_writer
+    if EVIDENCE_STORE not in ("gridfs", "disk") or not EVIDENCE_ALERTS:
+        return
+    evidence_writer = EvidenceWriter(evidence_store)
+    evidence_writer.start()
+
+
+def stop_evidence():
+    global evidence_writer
+    if evidence_writer is not None:
+        evidence_writer.stop()
+        logger.info(f"Evidence writer stopped: {evidence_writer.stats()}")
+        evidence_writer = None
+
+
 # WEBSOCKET ENDPOINT
 
-@router.websocket("/ws/proctor")
-async def websocket_endpoint(websocket: WebSocket):
+def create_capture_controller(profile: ProctoringProfile) -> CaptureController:
+    return CaptureController(
+        profile.capture_fps, profile.capture_width, profile.capture_quality,
+        min_fps=CAPTURE_MIN_FPS, min_width=max(320, profile.inference_size),
+        high_load=CAPTURE_HIGH_LOAD, low_load=CAPTURE_LOW_LOAD,
+        hold_seconds=CAPTURE_HOLD_SECONDS, recover_seconds=CAPTURE_RECOVER_SECONDS
+    )
+
+
+def session_load(client_id: str) -> float:
+    """Busy fraction of the inference worker serving this session"""
+    if inference_pool is not None and inference_pool.running:
+        return inference_pool.load(client_id)
+    return 0.0
+
+
+class ProctorConnection:
     """
-    WebSocket endpoint for real-time proctoring
-    
-    Protocol:
-    - Client sends: {"frame": "base64_jpeg_data"}
-    - Server responds: JSON with alerts, stats, and visualization
+    Per-connection ingest state for /ws/proctor.
+
+    A receiver task reads messages as fast as they arrive and parks the newest
+    frame in a size-1 slot without decoding it; a processor task sends
+    whatever is newest to the inference pool (which decodes it) when it
+    becomes free. Under overload stale
+    frames are dropped before any decode work, so latency stays flat.
     """
-    await websocket.accept()
-    client_id = str(id(websocket))
-    
-    logger.info(f"✅ Client {client_id} connected to proctoring WebSocket")
-    
+    def __init__(self, websocket: WebSocket, client_id: str, user_id: str,
+                 subprotocol: Optional[str] = None):
+        self.websocket = websocket
+        self.client_id = client_id
+        self.user_id = user_id
+        self.binary = subprotocol == BINARY_SUBPROTOCOL
+        # ?profile=lite|standard|strict: quality tier chosen by the quiz
+        self.profile = resolve_profile(websocket.query_params.get("profile"), PROFILES, DEFAULT_PROFILE)
+        # ?overlay=vector: client draws overlay primitives on its own video
+        # (some profiles always use it)
+        self.viz_mode = self.profile.viz_mode or (
+            "vector" if websocket.query_params.get("overlay") == "vector" else "image"
+        )
+        # ?capture=server: the client captures at the rate, width and quality
+        # it is sent (capture_settings messages), so nothing is skipped here.
+        # Its frames still advance the frame counter by skip_frames, keeping
+        # the frame-based cadences (pose, YOLO, face re-checks) on the same
+        # clock as for clients whose frames are skipped.
+        self.capture = (
+            create_capture_controller(self.profile)
+            if websocket.query_params.get("capture") == "server" else None
+        )
+        self.frame_stride = self.profile.skip_frames if self.capture is not None else 1
+        # ?quiz_id=: attempt the stored telemetry and evidence belong to; the
+        # user is the authenticated one (see authenticate_websocket), never a
+        # parameter
+        meta = {
+            "session": client_id,
+            "user": user_id,
+            "quiz": websocket.query_params.get("quiz_id"),
+        }
+        self.telemetry = None
+        if telemetry_writer is not None and telemetry_writer.running:
+            self.telemetry = SessionTelemetry(telemetry_writer, meta, batch_size=TELEMETRY_BATCH_SIZE,
+                                              flush_seconds=TELEMETRY_FLUSH_SECONDS)
+        self.evidence = None
+        if evidence_writer is not None and evidence_writer.running:
+            self.evidence = EvidenceRecorder(
+                evidence_writer, meta, EVIDENCE_ALERTS, seconds=EVIDENCE_SECONDS,
+                post_roll=EVIDENCE_POST_ROLL_SECONDS, max_bytes=int(EVIDENCE_MAX_MB * 1024 * 1024),
+                cooldown=EVIDENCE_COOLDOWN_SECONDS
+            )
+        self.slot = LatestFrameSlot()
+        self.frames_received = 0
+        self.last_avg_fps = 0.0
+        self._send_lock = asyncio.Lock()
+    
+    async def send_json(self, payload: Dict):
+        """Send a result, skip notice or error in the negotiated protocol"""
+        # Receiver and processor both reply; keep messages from interleaving
+        async with self._send_lock:
+            if self.binary:
+                await self.websocket.send_bytes(encode_message(payload))
+            else:
+                await self.websocket.send_json(payload)
+
+
+async def receive_frames(conn: ProctorConnection):
+    """Receiver task: accept frames, apply the profile's skip_frames, keep only the newest"""
     try:
         while True:
-            # Receive frame data
-            data = await websocket.receive_text()
-            message = json.loads(data)
+            message = await conn.websocket.receive()
+            received_at = time.perf_counter()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            
+            if message.get("bytes") is not None:
+                # Binary protocol: the message is the raw JPEG
+                frame_data = message["bytes"]
+            else:
+                frame_data = json.loads(message.get("text") or "{}").get("frame", "")
             
-            # Extract frame
-            frame_data = message.get("frame", "")
             if not frame_data:
-                await websocket.send_json({"error": "No frame data received"})
+                await conn.send_json({"error": "No frame data received"})
                 continue
             
-            # Remove data URL prefix if present (e.g., "data:image/jpeg;base64,")
-            if "," in frame_data:
-                frame_data = frame_data.split(",")[1]
-            
-            # Decode base64 to numpy array
-            try:
-                img_bytes = base64.b64decode(frame_data)
-                nparr = np.frombuffer(img_bytes, np.uint8)
-                frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-                
-                if frame is None:
-                    await websocket.send_json({"error": "Failed to decode frame"})
-                    continue
-            except Exception as e:
-                await websocket.send_json({"error": f"Frame decode error: {str(e)}"})
+            conn.frames_received += conn.frame_stride
+            if conn.evidence is not None:
+                # Kept as received: no decode, no copy
+                conn.evidence.add_frame(frame_data, conn.frames_received)
+            if conn.frames_received % conn.profile.skip_frames != 0:
+                # Skipped frames are answered without ever being decoded
+                await conn.send_json({
+                    "status": "frame_skipped",
+                    "frame_number": conn.frames_received,
+                    "fps": conn.last_avg_fps,
+                    "dropped_frames": conn.slot.dropped
+                })
                 continue
             
-            # Process frame
-            result = await process_frame(frame, client_id)
-            
-            # Send result
-            await websocket.send_json(result)
+            conn.slot.put(PendingFrame(frame_data, conn.frames_received, received_at))
+    finally:
+        conn.slot.close()
+
+
+async def process_frames(conn: ProctorConnection):
+    """Processor task: analyze the newest pending frame"""
+    while True:
+        pending = await conn.slot.get()
+        if pending is None:
+            return
+        dequeued_at = time.perf_counter()
+        frame_data = pending.payload
+        
+        # Undo base64 (JSON protocol only); the JPEG itself is decoded by the
+        # inference worker at reduced scale, never on the event loop
+        try:
+            if isinstance(frame_data, bytes):
+                img_bytes = frame_data
+            else:
+                # Remove data URL prefix if present (e.g., "data:image/jpeg;base64,")
+                if "," in frame_data:
+                    frame_data = frame_data.split(",")[1]
+                img_bytes = base64.b64decode(frame_data)
+            frame = np.frombuffer(img_bytes, np.uint8)
             
+            if frame.size == 0:
+                await conn.send_json({"error": "Failed to decode frame"})
+                continue
+        except Exception as e:
+            await conn.send_json({"error": f"Frame decode error: {str(e)}"})
+            continue
+        
+        # Process frame (in the inference pool)
+        try:
+            result = await process_frame(
+                frame, conn.client_id,
+                frame_number=pending.frame_number,
+                viz_encoding="jpeg" if conn.binary else "base64",
+                viz_mode=conn.viz_mode,
+                profile=conn.profile.name,
+            )
+        except (ValueError, RuntimeError) as e:
+            await conn.send_json({"error": f"Frame processing error: {str(e)}"})
+            continue
+        
+        details = result.get("details")
+        if details is not None:
+            conn.last_avg_fps = details.get("avg_fps", conn.last_avg_fps)
+            details["dropped_frames"] = conn.slot.dropped
+            details["queue_delay_ms"] = round((dequeued_at - pending.received_at) * 1000, 2)
+            details["server_latency_ms"] = round((time.perf_counter() - pending.received_at) * 1000, 2)
+        
+        # Send result
+        await conn.send_json(result)
+        if conn.telemetry is not None:
+            conn.telemetry.add(result)
+        if conn.evidence is not None and result.get("alert", "none") != "none":
+            conn.evidence.on_alerts(result["alert"].split(" AND "))
+        
+        if conn.capture is not None and details is not None:
+            update = conn.capture.observe(session_load(conn.client_id),
+                                          details["server_latency_ms"] / 1000, conn.slot.dropped)
+            if update is not None:
+                logger.info(f"📷 Client {conn.client_id} capture level {conn.capture.level}: "
+                            f"{update.fps} fps, {update.width}px, quality {update.quality}")
+                await conn.send_json(update.as_message())
+
+
+# ============================================================================
+# AUTHENTICATION
+# ============================================================================
+# Roles allowed to read other users' proctoring data
+PROCTORING_REVIEWER_ROLES = {"mentor", "admin"}
+
+
+async def require_proctoring_reviewer(authorization: Optional[str] = Header(None)) -> Dict:
+    """
+    Authenticated mentor or admin (routes.admin.admin.get_current_user).
+    Imported lazily like db: inference workers import this module too.
+    """
+    from routes.admin.admin import get_current_user
+    user = await get_current_user(authorization)
+    if user.get("role") not in PROCTORING_REVIEWER_ROLES:
+        raise HTTPException(status_code=403, detail="Mentor or admin access required")
+    return user
+
+
+async def require_proctoring_admin(authorization: Optional[str] = Header(None)) -> Dict:
+    """Authenticated admin, for the endpoints that start work on the server"""
+    from routes.admin.admin import get_current_user
+    user = await get_current_user(authorization)
+    if user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user
+
+
+async def authenticate_websocket(websocket: WebSocket) -> Optional[Dict]:
+    """
+    User behind a proctoring connection: the login session cookie, else a
+    bearer token from the Authorization header or ?token= (browsers cannot
+    set headers on a WebSocket). None when neither is valid.
+    """
+    from middleware import session_manager
+    from routes.admin.admin import get_current_user, users_collection
+    
+    sid = websocket.cookies.get(session_manager.cookie_name)
+    if sid:
+        session = session_manager.validate_session(websocket, sid)
+        if session:
+            session_manager.refresh_session(sid)
+            user = users_collection.find_one({"email": session.get("email")})
+            if user:
+                return user
+    
+    authorization = websocket.headers.get("authorization")
+    token = websocket.query_params.get("token")
+    if not authorization and token:
+        authorization = f"Bearer {token}"
+    if not authorization:
+        return None
+    try:
+        return await get_current_user(authorization)
+    except HTTPException:
+        return None
+
+
+@router.websocket("/ws/proctor")
+async def websocket_endpoint(websocket: WebSocket):
+    """
+    WebSocket endpoint for real-time proctoring
+    
+    Protocol (negotiated via Sec-WebSocket-Protocol, see utils/proctoring/wire.py):
+    - immersia.proctor.v1.binary: client sends raw JPEG bytes, server answers
+      with struct-framed results carrying the visualization as raw JPEG
+    - JSON (default): client sends {"frame": "base64_jpeg_data"}, server
+      responds with JSON alerts, stats, and base64 visualization
+    Details include dropped_frames, queue_delay_ms and server_latency_ms.
+    
+    Query parameters:
+    - overlay=vector: return "overlay" primitives instead of a rendered "viz"
+    - profile=lite|standard|strict: proctoring quality tier (see PROFILES)
+    - quiz_id: attempt the stored telemetry and evidence belong to; both
+      are filed under the authenticated user (session cookie, or
+      token=<JWT>), and unauthenticated connections are refused
+    - capture=server: the server tells the client how to capture with
+      {"type": "capture_settings", "fps", "width", "quality"} messages (on
+      connect and on every change) and skips none of its frames
+    """
+    user = await authenticate_websocket(websocket)
+    if user is None:
+        # Closing before accept() rejects the handshake (HTTP 403)
+        await websocket.close(code=1008)
+        return
+    
+    subprotocol = negotiate_subprotocol(websocket.scope.get("subprotocols"))
+    await websocket.accept(subprotocol=subprotocol)
+    client_id = str(id(websocket))
+    conn = ProctorConnection(websocket, client_id, str(user["_id"]), subprotocol)
+    
+    logger.info(f"✅ Client {client_id} connected to proctoring WebSocket (profile: {conn.profile.name})")
+    if conn.capture is not None:
+        await conn.send_json(conn.capture.settings.as_message())
+    
+    receiver = asyncio.create_task(receive_frames(conn))
+    try:
+        await process_frames(conn)
+        # Processor only stops once the receiver closed the slot
+        await receiver
     except WebSocketDisconnect:
         logger.info(f"❌ Client {client_id} disconnected")
-        if client_id in client_buffers:
-            del client_buffers[client_id]
     except Exception as e:
         logger.error(f"⚠️  Error in WebSocket handler: {e}")
         try:
-            await websocket.send_json({"error": str(e)})
+            await conn.send_json({"error": str(e)})
         except:
             pass
-        finally:
-            if client_id in client_buffers:
-                del client_buffers[client_id]
\ No newline at end of file
+    finally:
+        receiver.cancel()
+        if conn.telemetry is not None:
+            conn.telemetry.flush()
+        if conn.evidence is not None:
+            conn.evidence.finish()
+        await release_client_session(client_id)
+
+
+@router.get("/api/proctoring/timeline/{quiz_id}")
+def get_proctoring_timeline(quiz_id: str, user_id: Optional[str] = None, points: int = 200,
+                            reviewer: Dict = Depends(require_proctoring_reviewer)):
+    """
+    Proctoring telemetry of a quiz attempt, downsampled to about `points`
+    buckets (averaged metrics, alerts and devices per bucket). Mentors and
+    admins only. A sync handler, so the aggregation runs in the
+    threadpool, off the event loop.
+    """
+    if not TELEMETRY_ENABLED:
+        raise HTTPException(status_code=404, detail="Proctoring telemetry is disabled")
+    points = max(1, min(points, 2000))
+    try:
+        timeline = telemetry_timeline(telemetry_collection(), quiz_id, points, user_id)
+    except Exception as e:
+        logger.error(f"❌ Telemetry timeline query failed for quiz {quiz_id}: {e}")
+        raise HTTPException(status_code=500, detail="Failed to load proctoring timeline")
+    return {"quiz_id": quiz_id, "user_id": user_id, "points": len(timeline), "timeline": timeline}
+
+
+@router.get("/admin/proctoring/stages")
+async def get_stage_timings(reviewer: Dict = Depends(require_proctoring_reviewer)):
+    """
+    Per-stage latency percentiles (ms) over the last one to two windows,
+    merged across the inference workers, slowest stage first. Mentors and
+    admins only: every call queries each inference worker.
+    """
+    if inference_pool is not None and inference_pool.running:
+        states = await inference_pool.call("stage_timing_state")
+        failed = [str(state) for state in states if isinstance(state, Exception)]
+        if failed:
+            logger.warning(f"⚠️  Stage timings missing from {len(failed)} workers: {failed}")
+        states = [state for state in states if not isinstance(state, Exception)]
+        workers = len(states)
+        batch_states = await inference_pool.call("yolo_batch_state")
+    else:
+        states = [stage_timing_state()]
+        workers = 0
+        batch_states = [yolo_batch_state()]
+    # Frames by the YOLO batch they ran in; with the shared detector every
+    # worker reports the batches of its own frames
+    yolo_batch_sizes: Dict[int, int] = {}
+    for state in batch_states:
+        if isinstance(state, Exception):
+            continue
+        for size, frames in state.items():
+            yolo_batch_sizes[size] = yolo_batch_sizes.get(size, 0) + frames
+    return {
+        "sample_every": STAGE_SAMPLE_EVERY,
+        "window_seconds": STAGE_WINDOW_SECONDS,
+        "workers": workers,
+        "stages": summarize(states),
+        "yolo_batch_sizes": dict(sorted(yolo_batch_sizes.items())),
+    }
+
+
+# ============================================================================
+# OFFLINE ANALYSIS (ADMIN)
+# ============================================================================
+offline_jobs: Dict[str, Dict] = {}
+_offline_lock = threading.Lock()
+
+
+class OfflineJobRequest(BaseModel):
+    paths: List[str]                  # Files or directories, relative to OFFLINE_ROOT
+    profile: Optional[str] = None
+    fps: Optional[float] = None
+    format: str = "json"              # "json" or "parquet"
+    workers: Optional[int] = None
+
+
+def _resolve_offline_path(path: str) -> str:
+    root = os.path.realpath(OFFLINE_ROOT)
+    resolved = os.path.realpath(os.path.join(root, path))
+    if resolved != root and not resolved.startswith(root + os.sep):
+        raise HTTPException(status_code=400, detail=f"Path outside the recordings directory: {path}")
+    return resolved
+
+
+def _run_offline_job(job: Dict, videos: List[str], request: OfflineJobRequest):
+    def progress(summary: Dict):
+        job["done"] += 1
+    
+    try:
+        job["report"] = run_offline_analysis(
+            videos, job["out_dir"], min(request.workers if request.workers is not None else OFFLINE_WORKERS, OFFLINE_WORKERS),
+            request.fps, request.profile, request.format, progress=progress
+        )
+        job["status"] = "finished"
+    except Exception as e:
+        logger.error(f"❌ Offline job {job['id']} failed: {e}")
+        job["status"] = "failed"
+        job["error"] = str(e)
+    job["finished_at"] = time.time()
+
+
+@router.post("/admin/proctoring/offline")
+def start_offline_job(request: OfflineJobRequest, admin: Dict = Depends(require_proctoring_admin)):
+    """Re-analyze recorded exam videos in the background (admins only); poll the job for its report"""
+    if request.format not in ("json", "parquet"):
+        raise HTTPException(status_code=400, detail="format must be 'json' or 'parquet'")
+    if request.workers is not None and request.workers <= 0:
+        raise HTTPException(status_code=400, detail="workers must be a positive number")
+    videos = find_videos(_resolve_offline_path(path) for path in request.paths)
+    if not videos:
+        raise HTTPException(status_code=404, detail="No videos found")
+    
+    with _offline_lock:
+        if any(job["status"] == "running" for job in offline_jobs.values()):
+            raise HTTPException(status_code=409, detail="An offline analysis job is already running")
+        job_id = uuid.uuid4().hex[:12]
+        job = offline_jobs[job_id] = {
+            "id": job_id,
+            "status": "running",
+            "videos": len(videos),
+            "done": 0,
+            "out_dir": os.path.join(OFFLINE_OUTPUT_DIR, job_id),
+            "started_at": time.time(),
+            "finished_at": None,
+            "report": None,
+            "error": None,
+        }
+    threading.Thread(target=_run_offline_job, args=(job, videos, request),
+                     name=f"offline-{job_id}", daemon=True).start()
+    logger.info(f"🎬 Offline job {job_id} started: {len(videos)} videos")
+    return job
+
+
+@router.get("/admin/proctoring/offline/{job_id}")
+def get_offline_job(job_id: str, admin: Dict = Depends(require_proctoring_admin)):
+    job = offline_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
@@ -0,0 +1,10 @@
+# tests/conftest.py
+"""Run the tests against the Backend package (python -m pytest from Backend/)."""
+
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
@@ -0,0 +1,45 @@
+# tests/test_benchmark.py
+"""The benchmark's checked-in frames and its scenario validation (no models run)."""
+
+import pytest
+
+from utils.proctoring.benchmark import FRAMES_DIR, SCENARIOS, check_scenario, scenario_sources
+
+
+def _result(mean_faces, devices=None, analyzed=100):
+    return {"analyzed": analyzed, "mean_faces": mean_faces, "devices": devices or {}}
+
+
+@pytest.mark.parametrize("scenario", ["no_face", "one_face", "two_faces"])
+def test_checked_in_frames_are_used(scenario):
+    sources, origin = scenario_sources(scenario, 640, 480, FRAMES_DIR, seed=0)
+    assert origin == "recorded"
+    assert all(source.shape == (480, 640, 3) for source in sources)
+
+
+def test_scenarios_without_frames_fall_back_to_synthetic():
+    for scenario in SCENARIOS:
+        sources, origin = scenario_sources(scenario, 320, 240, None, seed=0)
+        assert origin == "synthetic"
+        assert sources[0].shape == (240, 320, 3)
+
+
+@pytest.mark.parametrize("scenario, result", [
+    ("no_face", _result(0.0)),
+    ("one_face", _result(1.1)),
+    ("two_faces", _result(1.9)),
+    ("phone", _result(1.0, {"cell phone": 12})),
+])
+def test_matching_results_are_valid(scenario, result):
+    assert check_scenario(scenario, result) == []
+
+
+@pytest.mark.parametrize("scenario, result, problem", [
+    ("one_face", _result(0.0), "mean_faces 0.0, expected 1"),
+    ("two_faces", _result(1.2), "mean_faces 1.2, expected 2"),
+    ("no_face", _result(0.0, {"cell phone": 3}), "3 'cell phone' detections, expected none"),
+    ("phone", _result(1.0, {"laptop": 5}), "no 'cell phone' detected"),
+    ("phone", _result(0.0, analyzed=0), "no frame was analyzed"),
+])
+def test_mismatching_results_are_invalid(scenario, result, problem):
+    assert problem in check_scenario(scenario, result)
@@ -0,0 +1,62 @@
+# tests/test_detector_backends.py
+"""
+Detection matching, and the ONNX backend's recall against the PyTorch path.
+
+The recall test needs ultralytics, onnxruntime, the YOLO weights on disk
+(PROCTOR_DETECTOR_WEIGHTS, default yolov8n.pt; never downloaded here) and
+sample frames with devices in them: PROCTOR_PARITY_IMAGES, or the
+benchmark frames. It is skipped when any of them is missing.
+"""
+
+import glob
+import os
+
+import cv2
+import pytest
+
+from utils.proctoring.detector_backends import (
+    UltralyticsBackend, _iou, compare_backends, load_detector_backend, match_detections,
+)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WEIGHTS = os.getenv("PROCTOR_DETECTOR_WEIGHTS", "yolov8n.pt")
+IMAGES_DIR = os.getenv("PROCTOR_PARITY_IMAGES", os.path.join(BACKEND_DIR, "benchmarks", "frames"))
+IMGSZ = 360
+MIN_RECALL = 0.9
+
+
+def test_iou():
+    assert _iou([0, 0, 10, 10], [0, 0, 10, 10]) == 1.0
+    assert _iou([0, 0, 10, 10], [5, 0, 15, 10]) == pytest.approx(50 / 150)
+    assert _iou([0, 0, 10, 10], [20, 20, 30, 30]) == 0.0
+
+
+def test_match_detections_same_class_by_iou():
+    reference = [(67, 0.9, [0, 0, 10, 10]), (63, 0.8, [50, 50, 90, 90]), (67, 0.4, [100, 0, 110, 10])]
+    candidate = [(63, 0.7, [52, 50, 90, 92]), (67, 0.85, [1, 0, 10, 10]), (66, 0.5, [100, 0, 110, 10])]
+    matches = match_detections(reference, candidate)
+    assert [(ref[0], cand[0]) for ref, cand in matches] == [(67, 67), (63, 63)]
+
+
+def _sample_frames():
+    paths = sorted(path for ext in ("jpg", "jpeg", "png")
+                   for path in glob.glob(os.path.join(IMAGES_DIR, "**", f"*.{ext}"), recursive=True))
+    frames = [cv2.imread(path) for path in paths]
+    return [cv2.resize(frame, (IMGSZ, IMGSZ)) for frame in frames if frame is not None]
+
+
+def test_onnx_recall_against_torch():
+    ultralytics = pytest.importorskip("ultralytics")
+    pytest.importorskip("onnxruntime")
+    if not os.path.exists(WEIGHTS):
+        pytest.skip(f"YOLO weights {WEIGHTS} not found")
+    frames = _sample_frames()
+    if not frames:
+        pytest.skip(f"No sample frames in {IMAGES_DIR}")
+
+    reference = UltralyticsBackend(ultralytics.YOLO(WEIGHTS, task="detect"), IMGSZ)
+    candidate = load_detector_backend("onnx", WEIGHTS, IMGSZ)
+    report = compare_backends(reference, candidate, frames, repeats=1)
+    if not report["reference_detections"]:
+        pytest.skip(f"No device detected in the sample frames of {IMAGES_DIR}")
+    assert report["recall"] >= MIN_RECALL, report
@@ -0,0 +1,34 @@
+# tests/test_face_features.py
+"""The landmark-array features against per-landmark attribute access."""
+
+import numpy as np
+import pytest
+
+from utils.proctoring.face_features import (
+    HEAD_POSE_LANDMARKS, _array_path, _attribute_path, _synthetic_face, landmarks_to_array,
+)
+
+W, H = 360, 270
+
+
+@pytest.mark.parametrize("roi", [(0.0, 0.0, 1.0, 1.0), (0.2, 0.1, 0.7, 0.8)])
+@pytest.mark.parametrize("seed", range(3))
+def test_array_path_matches_attribute_path(roi, seed):
+    # Two faces: the attribute path remaps its landmarks in place
+    array_face, _ = _synthetic_face(np.random.default_rng(seed))
+    attribute_face, _ = _synthetic_face(np.random.default_rng(seed))
+    image_points = np.empty((len(HEAD_POSE_LANDMARKS), 2), dtype=np.float64)
+
+    old = _attribute_path(attribute_face, roi, W, H)
+    new = _array_path(array_face, roi, W, H, image_points)
+    # float32 storage on the array path
+    for name, a, b, atol in zip(("box", "gaze", "EAR", "head points"), old, new, (1e-6, 1e-3, 1e-5, 1e-3)):
+        np.testing.assert_allclose(b, a, rtol=1e-4, atol=atol, err_msg=name)
+
+
+def test_landmarks_to_array():
+    face, _ = _synthetic_face(np.random.default_rng(0))
+    points = landmarks_to_array(face)
+    assert points.shape == (478, 3) and points.dtype == np.float32
+    expected = [(lm.x, lm.y, lm.z) for lm in face.landmark]
+    np.testing.assert_allclose(points, expected, rtol=1e-6)
@@ -0,0 +1,44 @@
+# tests/test_head_pose.py
+"""HeadPoseEstimator against calculate_head_pose on a synthetic head trajectory."""
+
+import numpy as np
+
+from utils.proctoring.face_features import calculate_head_pose
+from utils.proctoring.head_pose import (
+    _GL_TO_CV, _MIRROR_THRESHOLD, HeadPoseEstimator, _angle_error, _synthetic_trajectory, rotation_to_euler,
+)
+
+W, H = 640, 480
+FRAMES = 600
+
+
+def _trajectory(noise: float):
+    return _synthetic_trajectory(FRAMES, W, H, noise, np.random.default_rng(0))
+
+
+def test_warm_start_agrees_with_reference():
+    faces, rotations = _trajectory(noise=0.5)
+    reference = [calculate_head_pose(points, W, H) for points in faces]
+    estimator = HeadPoseEstimator()
+    warm = [estimator.estimate(points, W, H) for points in faces]
+
+    # A cold solve occasionally lands on the mirrored pose behind the camera;
+    # compare only frames where the reference found the true head
+    truth = [rotation_to_euler(rotation) for rotation in rotations]
+    valid = [i for i, angles in enumerate(reference) if _angle_error(angles, truth[i]) < _MIRROR_THRESHOLD]
+    assert len(valid) > FRAMES // 2
+    assert max(_angle_error(reference[i], warm[i]) for i in valid) <= 0.05
+
+    # ...and the warm start lands there no more often than the reference
+    mirrored = FRAMES - len(valid)
+    assert sum(_angle_error(a, b) >= _MIRROR_THRESHOLD for a, b in zip(warm, truth)) <= mirrored
+    assert estimator.cold_solves < FRAMES
+
+
+def test_transformation_matrix_agrees_with_pnp():
+    faces, rotations = _trajectory(noise=0.0)
+    reference = [calculate_head_pose(points, W, H) for points in faces]
+    estimator = HeadPoseEstimator()
+    for rotation, expected in zip(rotations, reference):
+        matrix = np.block([[_GL_TO_CV @ rotation, np.zeros((3, 1))], [np.zeros((1, 3)), np.ones((1, 1))]])
+        assert _angle_error(estimator.estimate(None, W, H, matrix), expected) <= 0.01
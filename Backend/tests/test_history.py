@@ -0,0 +1,72 @@
+# tests/test_history.py
+"""AlertWindow and RingSeries against the deque-based history they replaced."""
+
+import random
+from collections import deque
+
+import numpy as np
+import pytest
+
+from utils.proctoring.history import AlertWindow, RingSeries
+
+ALERT_TYPES = ["no_face_detected", "looking_down", "hand_near_face", "hand_near_face AND looking_down"]
+
+
+class DequeAlerts:
+    """The former FrameBuffer alert history, as reference"""
+
+    def __init__(self):
+        self.alert_history = deque(maxlen=15)
+
+    def add(self, alert_type: str, now: float):
+        self.alert_history.append({'type': alert_type, 'timestamp': now})
+
+    def prune(self, max_age: float, now: float):
+        self.alert_history = deque([
+            a for a in self.alert_history
+            if (now - a['timestamp']) <= max_age
+        ], maxlen=15)
+
+    def should_trigger(self, alert_type: str, required_count: int, time_window: float, now: float) -> bool:
+        if len(self.alert_history) < required_count:
+            return False
+        recent_alerts = [
+            a for a in self.alert_history
+            if a['type'] == alert_type and (now - a['timestamp']) <= time_window
+        ]
+        return len(recent_alerts) >= required_count
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_alert_window_matches_deque_history(seed):
+    rng = random.Random(seed)
+    reference, window = DequeAlerts(), AlertWindow()
+    now = 1000.0
+    for _ in range(20000):
+        # Frame-rate steps with occasional pauses, alerts in bursts
+        now += rng.choice([0.0, 0.033, 0.066, 0.1, 0.4, 2.5])
+        reference.prune(5.0, now)
+        window.prune(5.0, now)
+        for _ in range(rng.choice([0, 0, 1, 1, 2, 3])):
+            alert_type = rng.choice(ALERT_TYPES)
+            reference.add(alert_type, now)
+            window.add(alert_type, now)
+        alert_type = rng.choice(ALERT_TYPES)
+        required = rng.choice([1, 2, 3, 4])
+        time_window = rng.choice([0.5, 1.0, 1.5, 6.0])
+        expected = reference.should_trigger(alert_type, required, time_window, now)
+        assert window.should_trigger(alert_type, required, time_window, now) == expected, (
+            f"t={now:.3f} {alert_type} (count {required}, window {time_window}s)"
+        )
+
+
+def test_ring_series_matches_deque():
+    rng = np.random.default_rng(0)
+    reference, ring = deque(maxlen=30), RingSeries(30)
+    for value in rng.normal(0, 20, 500).astype(np.float32):
+        reference.append(float(value))
+        ring.append(float(value))
+        assert len(ring) == len(reference)
+        assert ring.mean() == pytest.approx(np.mean(reference), abs=1e-3)
+        assert ring.last() == reference[-1]
+    np.testing.assert_array_equal(ring.values(), np.array(reference, dtype=np.float32))
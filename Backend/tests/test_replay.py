@@ -0,0 +1,78 @@
+# tests/test_replay.py
+"""
+Regression test of the alert rules over a checked-in landmark stream.
+
+data/replay_synthetic.npz is a synthetic 103-frame session at 10 fps
+(640x480, iris landmarks): a calm start, a missing face, gaze off screen,
+closed eyes, a hand at the face, looking down, a phone, a book (no alert),
+a second face and a calm end. Its recorded live alerts are the ones the
+rules decided when it was written, so any change to the rules or the
+default thresholds that alters a decision changes the digest below. When
+that change is intended, update EXPECTED_DIGEST together with it.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+from utils.proctoring.profiles import AlertThresholds
+from utils.proctoring.replay import LandmarkStream, main, replay_stream, summarize_replay
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(TESTS_DIR)
+STREAM_PATH = os.path.join(TESTS_DIR, "data", "replay_synthetic.npz")
+EXPECTED_DIGEST = "d6508642791ec919f1beb30577e53c46454bd65d"
+EXPECTED_ALERT_FRAMES = {
+    "device_detected_phone": 10,
+    "gaze_off_screen": 10,
+    "hand_near_face": 10,
+    "looking_down": 13,
+    "multiple_faces": 8,
+    "no_face_detected": 9,
+}
+
+
+def test_synthetic_stream_replays_to_expected_digest():
+    stream = LandmarkStream.load(STREAM_PATH)
+    summary = summarize_replay(stream, replay_stream(stream, AlertThresholds()))
+    assert summary["frames"] == 103
+    assert summary["alert_frames"] == EXPECTED_ALERT_FRAMES
+    assert summary["live_agreement"] == 1.0
+    assert summary["digest"] == EXPECTED_DIGEST
+
+
+def test_threshold_change_changes_decisions():
+    stream = LandmarkStream.load(STREAM_PATH)
+    records = replay_stream(stream, AlertThresholds(gaze_degrees=30.0))
+    summary = summarize_replay(stream, records)
+    assert "gaze_off_screen" not in summary["alert_frames"]
+    assert summary["digest"] != EXPECTED_DIGEST
+
+
+def test_gaze_rules_follow_refine_landmarks():
+    stream = LandmarkStream.load(STREAM_PATH)
+    records = replay_stream(stream, AlertThresholds(), refine_landmarks=False)
+    assert not any("gaze_off_screen" in record["alert"] for record in records)
+
+
+def test_expect_round_trip(tmp_path, capsys):
+    report = tmp_path / "replay.json"
+    assert main([STREAM_PATH, "--out", str(report)]) == 0
+    assert main([STREAM_PATH, "--expect", str(report)]) == 0
+
+    expected = json.loads(report.read_text())
+    expected["runs"][0]["streams"][STREAM_PATH]["digest"] = "0" * 40
+    report.write_text(json.dumps(expected))
+    assert main([STREAM_PATH, "--expect", str(report)]) == 1
+    assert "❌" in capsys.readouterr().out
+
+
+def test_replay_imports_no_models_or_routes():
+    # A fresh interpreter: other tests may have imported anything
+    code = ("import sys, utils.proctoring.replay; "
+            "print(sorted(m for m in sys.modules if m.split('.')[0] in "
+            "('routes', 'mediapipe', 'ultralytics', 'torch', 'fastapi')))")
+    result = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True,
+                            text=True, check=True)
+    assert result.stdout.strip() == "[]"
@@ -0,0 +1,64 @@
+# tests/test_shared_detector.py
+"""The shared detector process batches frames from several workers' slot rings (detector simulated)."""
+
+import multiprocessing
+import threading
+
+import numpy as np
+import pytest
+
+from utils.proctoring.shared_detector import SharedDetector, SharedDetectorClient
+
+
+@pytest.fixture
+def detector(monkeypatch):
+    # Read by _simulated_batcher in the spawned detector process
+    for name, value in {"PROCTOR_SIM_DETECT_MS": "1", "PROCTOR_SIM_PER_FRAME_MS": "0",
+                        "PROCTOR_SIM_MAX_BATCH": "8", "PROCTOR_SIM_MAX_WAIT_MS": "300"}.items():
+        monkeypatch.setenv(name, value)
+    detector = SharedDetector(multiprocessing.get_context("spawn"), "utils.proctoring.shared_detector",
+                              num_workers=2, slots_per_worker=2, slot_size=32 * 32 * 3,
+                              hook="_simulated_batcher")
+    detector.start()
+    clients = [SharedDetectorClient(*detector.channel(index), timeout=30.0) for index in range(2)]
+    yield detector, clients
+    for client in clients:
+        client.stop()
+    detector.stop()
+
+
+def test_frames_from_all_workers_share_a_batch(detector):
+    _, clients = detector
+    frame = np.zeros((32, 32, 3), dtype=np.uint8)
+    clients[0].detect(frame, (640, 480))  # Wait for the detector process to come up
+
+    results = threading.Semaphore(0)
+    batch_sizes = []
+
+    def on_result(detections, max_conf, batch_size):
+        batch_sizes.append(batch_size)
+        results.release()
+
+    for client in clients:
+        for session in ("a", "b"):
+            assert client.submit(session, frame, (640, 480), on_result)
+    assert all(results.acquire(timeout=30.0) for _ in range(4))
+    assert batch_sizes == [4] * 4
+
+
+def test_one_request_in_flight_per_session_and_no_free_slot_drops(detector):
+    _, clients = detector
+    client = clients[0]
+    frame = np.zeros((32, 32, 3), dtype=np.uint8)
+    results = threading.Semaphore(0)
+
+    def on_result(detections, max_conf, batch_size):
+        results.release()
+
+    assert client.submit("a", frame, (640, 480), on_result)
+    assert client.submit("a", frame, (640, 480), on_result)  # Previous one still out: not queued again
+    assert client.submit("b", frame, (640, 480), on_result)
+    assert not client.submit("c", frame, (640, 480), on_result)  # Both slots busy
+    assert client.dropped == 1
+    assert results.acquire(timeout=30.0) and results.acquire(timeout=30.0)
+    assert not results.acquire(timeout=0.5)
@@ -0,0 +1,79 @@
+# tests/test_workspace_alloc.py
+"""
+Steady-state allocations of the per-frame path (tracemalloc).
+
+Once a session's resolution settles, the buffer-reusing steps must not
+allocate frame-sized images: the bounds below are far under one
+inference-size frame (256x192x3 = 144 KiB at the lite profile).
+"""
+
+import cv2
+import numpy as np
+import pytest
+
+from utils.proctoring.roi import crop_rgb
+from utils.proctoring.workspace import (
+    FrameWorkspace, measure_peak, measure_steady_state, prepare_inference_frame, to_rgb,
+)
+
+MAX_PEAK_BYTES = 64 * 1024
+MAX_GROWTH_BYTES = 64
+RESOLUTIONS = [(640, 480), (1280, 720)]
+INFERENCE_SIZES = [256, 360, 480]  # lite, standard, strict
+
+
+def _frame(width: int, height: int) -> np.ndarray:
+    return np.random.default_rng(0).integers(0, 255, (height, width, 3), dtype=np.uint8)
+
+
+def _preprocessing_step(workspace: FrameWorkspace, frame: np.ndarray, inference_size: int):
+    """What analyze_frame does to every analyzed frame before the models"""
+    def step():
+        small = prepare_inference_frame(workspace, frame, inference_size)
+        rgb = to_rgb(workspace, small)
+        gray = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY, dst=workspace.get_alternating("gray", rgb.shape[:2]))
+        face_crop, _ = crop_rgb(frame, (0.3, 0.15, 0.7, 0.75), 192, workspace, "face_crop")
+        pose_crop, _ = crop_rgb(frame, (0.1, 0.0, 0.9, 1.0), 256, workspace, "pose_crop")
+        return small, rgb, gray, face_crop, pose_crop
+    return step
+
+
+@pytest.mark.parametrize("inference_size", INFERENCE_SIZES)
+@pytest.mark.parametrize("width, height", RESOLUTIONS)
+def test_preprocessing_reuses_buffers(width, height, inference_size):
+    workspace = FrameWorkspace()
+    step = _preprocessing_step(workspace, _frame(width, height), inference_size)
+
+    assert measure_steady_state(step, frames=30) <= MAX_GROWTH_BYTES
+    assert measure_peak(step, frames=30) <= MAX_PEAK_BYTES
+    allocations = workspace.allocations
+    step()
+    assert workspace.allocations == allocations
+
+
+def test_measurement_catches_per_frame_allocation():
+    # The same resize without a destination buffer: must exceed the bound
+    frame = _frame(640, 480)
+    peak = measure_peak(lambda: cv2.resize(frame, (360, 270), interpolation=cv2.INTER_LINEAR), frames=10)
+    assert peak > MAX_PEAK_BYTES
+
+
+def test_rendering_reuses_buffers():
+    try:
+        from routes import proctoring
+    except Exception as e:  # MediaPipe (solutions API) missing or broken
+        pytest.skip(f"routes.proctoring not importable: {e}")
+
+    workspace = FrameWorkspace()
+    frame = _frame(640, 480)
+    preprocess = _preprocessing_step(workspace, frame, proctoring.PROFILES[proctoring.DEFAULT_PROFILE].inference_size)
+
+    def step():
+        preprocess()
+        return proctoring.render_visualization(
+            workspace, frame, [(0.3, 0.2, 0.6, 0.7, 0.9)], None, None, [],
+            ["gaze_off_screen"], "Focused on screen", 15.0, include_iris=False
+        )
+
+    assert measure_steady_state(step, frames=30) <= MAX_GROWTH_BYTES
+    assert measure_peak(step, frames=30) <= MAX_PEAK_BYTES
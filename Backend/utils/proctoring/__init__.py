@@ -0,0 +1 @@
+"""Proctoring pipeline support modules."""
@@ -0,0 +1,327 @@
+# utils/proctoring/alert_rules.py
+"""
+The alert rules: everything from model outputs to alerts.
+
+analyze_frame (routes/proctoring.py) and the model-free landmark replay
+(utils/proctoring/replay.py) both run these functions, so a replay decides
+exactly like the live pipeline. The module needs NumPy and the face
+feature helpers only (no MediaPipe, FastAPI or detector), which keeps the
+replay and its regression tests runnable in a lightweight environment.
+
+Pose landmarks are read through `.landmark[i].x/.y/.visibility`, which
+both MediaPipe's result and the replay's recorded landmarks provide.
+"""
+
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.proctoring.face_features import detect_gaze_direction, eye_aspect_ratios, has_iris
+from utils.proctoring.history import AlertWindow, RingSeries
+from utils.proctoring.profiles import AlertThresholds
+
+logger = logging.getLogger(__name__)
+
+# MediaPipe Pose landmark indices (mp.solutions.pose.PoseLandmark)
+POSE_NOSE = 0
+POSE_LEFT_SHOULDER = 11
+POSE_RIGHT_SHOULDER = 12
+POSE_LEFT_WRIST = 15
+POSE_RIGHT_WRIST = 16
+
+DEFAULT_THRESHOLDS = AlertThresholds()
+
+
+class AlertState:
+    """
+    Per-session state the alert rules read and update: alert smoothing
+    history, gaze and EAR series, and whether the last pose was suspicious.
+    FrameBuffer extends it with the pipeline state; the replay uses it alone.
+    """
+
+    def __init__(self, maxlen: int = 30, refine_landmarks: bool = True):
+        # Gaze needs the iris landmarks (the profile's refine_landmarks)
+        self.refine_landmarks = refine_landmarks
+        self.gaze_angles = RingSeries(maxlen)
+        self.ear_values = RingSeries(maxlen)
+        self.alert_history = AlertWindow(max_alerts=15)  # Track recent alerts
+        self.pose_suspicious = False
+        
+        # Capture time of the current frame when analyzing recorded video;
+        # None (live) uses the clock. Drives alert smoothing, motion reuse
+        # and the YOLO cadence.
+        self.frame_time: Optional[float] = None
+
+    def add(self, gaze=None, ear=None):
+        """Add frame data to buffer"""
+        if gaze is not None:
+            self.gaze_angles.append(gaze)
+        if ear is not None:
+            self.ear_values.append(ear)
+    
+    def add_alert(self, alert_type: str):
+        """Track alert for temporal smoothing"""
+        self.alert_history.add(alert_type, self.frame_time)
+    
+    def should_trigger_alert(self, alert_type: str, required_count: int = 3, time_window: float = 1.0) -> bool:
+        """Determine if an alert should be triggered based on recent history"""
+        return self.alert_history.should_trigger(alert_type, required_count, time_window, self.frame_time)
+
+    def clear_old_alerts(self, max_age: float = 5.0):
+        """Remove alerts older than max_age seconds"""
+        self.alert_history.prune(max_age, self.frame_time)
+
+
+# POSE DETECTION & SUSPICIOUS ACTIVITY
+
+def detect_suspicious_activity(buffer: AlertState, pose_landmarks,
+                               thresholds: AlertThresholds = DEFAULT_THRESHOLDS) -> Tuple[bool, str, float, Dict]:
+    """
+    Detect suspicious activity using pose analysis:
+    1. Hand near face (potential phone use)
+    2. Looking down significantly (reading notes/phone)
+    
+    Returns:
+        (is_suspicious, activity_type, confidence, metrics)
+    """
+    alerts = []
+    max_confidence = 0.0
+    metrics = {
+        "hand_face_dist_left": 1.0, 
+        "hand_face_dist_right": 1.0,
+        "nose_shoulder_diff": 0.0
+    }
+    
+    if pose_landmarks is None:
+        return False, "", 0.0, metrics
+    
+    landmarks = pose_landmarks.landmark
+    
+    # Get key points
+    nose = landmarks[POSE_NOSE]
+    left_wrist = landmarks[POSE_LEFT_WRIST]
+    right_wrist = landmarks[POSE_RIGHT_WRIST]
+    
+    # Check visibility (confidence that landmark is in frame)
+    if nose.visibility < thresholds.visibility:
+        return False, "", 0.0, metrics
+    
+    # Calculate hand-to-face distances (normalized coordinates)
+    nose_pos = np.array([nose.x, nose.y])
+    left_wrist_pos = np.array([left_wrist.x, left_wrist.y])
+    right_wrist_pos = np.array([right_wrist.x, right_wrist.y])
+    
+    left_dist = np.linalg.norm(nose_pos - left_wrist_pos)
+    right_dist = np.linalg.norm(nose_pos - right_wrist_pos)
+    
+    metrics["hand_face_dist_left"] = float(left_dist)
+    metrics["hand_face_dist_right"] = float(right_dist)
+    
+    # Hand near face detection (tight threshold = phone to ear)
+    if left_wrist.visibility > thresholds.visibility and left_dist < thresholds.hand_face_distance:
+        alerts.append("hand_near_face")
+        max_confidence = max(max_confidence, 0.60)
+    
+    if right_wrist.visibility > thresholds.visibility and right_dist < thresholds.hand_face_distance:
+        alerts.append("hand_near_face")
+        max_confidence = max(max_confidence, 0.60)
+    
+    # Looking down detection (extreme angle only)
+    left_shoulder = landmarks[POSE_LEFT_SHOULDER]
+    right_shoulder = landmarks[POSE_RIGHT_SHOULDER]
+    
+    if left_shoulder.visibility > thresholds.visibility and right_shoulder.visibility > thresholds.visibility:
+        shoulders_center_y = (left_shoulder.y + right_shoulder.y) / 2
+        diff = nose.y - shoulders_center_y
+        metrics["nose_shoulder_diff"] = float(diff)
+        
+        # Only trigger for extreme looking down (head significantly below shoulders)
+        if diff > thresholds.looking_down_diff:
+            # IMMEDIATE LOOKING DOWN ALERT
+            alerts.append("looking_down")
+            max_confidence = max(max_confidence, 0.55)
+            logger.debug(f"🚨 LOOKING DOWN DETECTED")
+    
+    if alerts:
+        # Remove duplicates
+        unique_alerts = list(set(alerts))
+        return True, " AND ".join(unique_alerts), max_confidence, metrics
+    
+    return False, "", 0.0, metrics
+
+
+# BEHAVIOR STATUS CLASSIFICATION
+
+def get_human_behavior_status(gaze_h: float, gaze_v: float, pose_landmarks, 
+                               num_faces: int, ear: float) -> str:
+    """
+    Determine current human behavior status for dashboard display
+    
+    Returns human-readable status string with priority:
+    1. Face count issues (most critical)
+    2. Eyes closed
+    3. Gaze direction
+    4. Pose-based detection
+    5. Normal status
+    """
+    # Priority 1: Face count
+    if num_faces == 0:
+        return "No person detected"
+    elif num_faces > 1:
+        return "Multiple people detected"
+    
+    # Priority 2: Eyes closed
+    if ear < 0.15:
+        return "Eyes closed or blinking"
+    
+    # Priority 3: Extreme gaze deviation
+    if abs(gaze_h) > 35 or abs(gaze_v) > 35:
+        if abs(gaze_h) > abs(gaze_v):
+            return "Looking right (away from screen)" if gaze_h > 35 else "Looking left (away from screen)"
+        else:
+            return "Looking down" if gaze_v > 35 else "Looking up"
+    
+    # Priority 4: Pose-based detection
+    if pose_landmarks:
+        landmarks = pose_landmarks.landmark
+        nose = landmarks[POSE_NOSE]
+        
+        if nose.visibility > 0.5:
+            left_shoulder = landmarks[POSE_LEFT_SHOULDER]
+            right_shoulder = landmarks[POSE_RIGHT_SHOULDER]
+            
+            if left_shoulder.visibility > 0.5 and right_shoulder.visibility > 0.5:
+                shoulders_center_y = (left_shoulder.y + right_shoulder.y) / 2
+                if nose.y > shoulders_center_y + 0.20:
+                    return "Looking down significantly"
+    
+    # Priority 5: Moderate gaze deviation (warning level)
+    if abs(gaze_h) > 20 or abs(gaze_v) > 20:
+        return "Slight gaze deviation"
+    
+    # Default: All good
+    return "Focused on screen"
+
+
+# ALERT RULES
+
+DEVICE_ALERTS = (
+    ("cell phone", "device_detected_phone"),
+    ("laptop", "device_detected_laptop"),
+    ("monitor", "device_detected_monitor"),
+)
+
+
+def assess_frame(buffer: AlertState, face_boxes: List[Tuple], face_points: Optional[List[np.ndarray]],
+                 pose_landmarks, pose_ran: bool, proc_w: int, proc_h: int,
+                 thresholds: AlertThresholds = DEFAULT_THRESHOLDS) -> Dict:
+    """
+    Face count, gaze, EAR and pose alerts of one frame.
+    
+    `pose_ran` tells whether Pose ran on this frame (otherwise the landmarks
+    are cached). The returned assessment also lists the suspicious evidence
+    that drives the YOLO cadence; finish_assessment adds the device alerts
+    and the behavior status.
+    """
+    alerts = []
+    confidences = []
+    
+    # 1. FACE DETECTION - Multiple face check (count from the mesh when it ran)
+    num_faces = len(face_boxes)
+    if num_faces > 1:
+        alerts.append("multiple_faces")
+        confidences.append(0.95)
+    elif num_faces == 0:
+        buffer.add_alert("no_face_detected")
+        if buffer.should_trigger_alert("no_face_detected", required_count=thresholds.no_face_count,
+                                       time_window=thresholds.no_face_window):
+            alerts.append("no_face_detected")
+            confidences.append(0.90)
+    
+    # 2. FACE MESH - Gaze tracking and eye analysis
+    gaze_h, gaze_v = 0.0, 0.0
+    avg_ear = 0.3
+    if face_points:
+        points = face_points[0]  # Use first face
+        
+        # Gaze direction (needs iris landmarks, i.e. refine_landmarks)
+        if buffer.refine_landmarks and has_iris(points):
+            gaze_h, gaze_v = detect_gaze_direction(points, proc_w, proc_h)
+            
+            # IMMEDIATE GAZE ALERT - No temporal smoothing
+            if abs(gaze_h) > thresholds.gaze_degrees or abs(gaze_v) > thresholds.gaze_degrees:
+                alerts.append("gaze_off_screen")
+                confidences.append(0.85)
+                logger.debug(f"🚨 GAZE ALERT: H={gaze_h:.1f}° V={gaze_v:.1f}°")
+        
+        # Eye Aspect Ratio (blink detection)
+        left_ear, right_ear = eye_aspect_ratios(points, proc_w, proc_h)
+        avg_ear = (left_ear + right_ear) / 2.0
+    
+    # 3. POSE DETECTION - Suspicious activity
+    pose_metrics = {}
+    suspicious_evidence = []
+    if pose_landmarks:
+        is_suspicious, activity_type, activity_conf, pose_metrics = detect_suspicious_activity(
+            buffer, pose_landmarks, thresholds
+        )
+        if pose_ran:
+            # Keep pose running every frame until the activity clears
+            buffer.pose_suspicious = is_suspicious
+        
+        if is_suspicious:
+            suspicious_evidence.extend(activity_type.split(" AND "))
+            buffer.add_alert(activity_type)
+            # Immediate trigger for hand near face (critical)
+            if "hand_near_face" in activity_type:
+                alerts.append(activity_type)
+                confidences.append(activity_conf)
+            # Temporal smoothing for looking down
+            elif "looking_down" in activity_type:
+                if buffer.should_trigger_alert("looking_down", required_count=thresholds.looking_down_count,
+                                               time_window=thresholds.looking_down_window):
+                    alerts.append(activity_type)
+                    confidences.append(activity_conf)
+    
+    return {
+        "alerts": alerts,
+        "confidences": confidences,
+        "num_faces": num_faces,
+        "face_conf": max((box[4] for box in face_boxes), default=0.0),
+        "gaze_h": gaze_h,
+        "gaze_v": gaze_v,
+        "ear": avg_ear,
+        "pose_metrics": pose_metrics,
+        "suspicious_evidence": suspicious_evidence,
+    }
+
+
+def finish_assessment(buffer: AlertState, assessment: Dict, yolo_detections: List[Dict], pose_landmarks,
+                      thresholds: AlertThresholds = DEFAULT_THRESHOLDS) -> Dict:
+    """
+    Device alerts from the detections in use this frame (fresh or cached),
+    gaze/EAR history and behavior status; adds "devices_detected",
+    "behavior_status", "alert" (the " AND "-joined alert string) and "conf"
+    """
+    alerts, confidences = assessment["alerts"], assessment["confidences"]
+    devices = [d for d in yolo_detections if d["conf"] >= thresholds.device_conf]
+    devices_detected = [d["label"] for d in devices]
+    if devices:
+        dev_conf = max(d["conf"] for d in devices)
+        # Immediate alerts for critical devices
+        for label, alert in DEVICE_ALERTS:
+            if label in devices_detected:
+                alerts.append(alert)
+                confidences.append(dev_conf)
+    
+    buffer.add(assessment["gaze_h"], assessment["ear"])
+    assessment["devices_detected"] = devices_detected
+    assessment["behavior_status"] = get_human_behavior_status(
+        assessment["gaze_h"], assessment["gaze_v"], pose_landmarks,
+        assessment["num_faces"], assessment["ear"]
+    )
+    # Sorted: the same alerts always give the same string
+    assessment["alert"] = " AND ".join(sorted(set(alerts))) if alerts else "none"
+    assessment["conf"] = max(confidences) if confidences else 1.0
+    return assessment
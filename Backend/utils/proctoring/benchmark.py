@@ -0,0 +1,439 @@
+# utils/proctoring/benchmark.py
+"""
+Reproducible micro-benchmark of the proctoring hot path.
+
+Feeds the handler module's analyze_frame (the in-process path of
+process_frame) fixed frame sequences for four scenarios at fixed
+resolutions and reports frames per second, per-stage times (see
+stage_timing) and peak RSS as JSON, so settings like the profile, ROI
+crops or the detector backend can be compared across commits on one
+machine:
+
+- no_face, one_face, two_faces, phone: the checked-in photographs of
+  benchmarks/frames/<scenario>/ (see its README for sources and licenses),
+  or --frames DIR with the same layout; a missing two_faces is composed
+  from one_face side by side
+- a scenario without photographs (or --synthetic) uses a scene drawn from
+  a fixed seed: it exercises decode, resize, motion gate and the detector
+  cascade's cost, but the models may not see a face or a phone in it
+
+Every scenario is checked against what it claims (SCENARIO_EXPECTATIONS:
+mean faces, phone detections). A scenario the pipeline did not see that
+way is marked invalid with the reasons, since its numbers measured a
+different path (e.g. no_face cost for a one_face run); the CLI then exits
+1 unless --allow-invalid. Frames go in JPEG encoded, as the binary protocol
+delivers them (--input bgr skips decode), and move a few pixels per frame
+so the motion gate does not reuse everything.
+
+    python -m utils.proctoring.benchmark --out baseline.json
+    python -m utils.proctoring.benchmark --synthetic --allow-invalid   # drawn scenes only
+    python -m utils.proctoring.benchmark --frames bench_frames/ --profile strict \\
+        --env PROCTOR_ROI=false --compare baseline.json
+"""
+
+import argparse
+import importlib
+import json
+import logging
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from utils.proctoring.offline import WORKER_ENV
+from utils.proctoring.stage_timing import StageStats, summarize
+
+logger = logging.getLogger(__name__)
+
+SCENARIOS = ("no_face", "one_face", "two_faces", "phone")
+# Per scenario: expected face count and whether a phone must be detected
+SCENARIO_EXPECTATIONS = {
+    "no_face": (0, False),
+    "one_face": (1, False),
+    "two_faces": (2, False),
+    "phone": (1, True),
+}
+PHONE_LABEL = "cell phone"
+FRAMES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                          "benchmarks", "frames")
+DEFAULT_RESOLUTIONS = ((640, 480), (1280, 720))
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+# Benchmark settings: time every frame, YOLO inline whenever it is due
+BENCHMARK_ENV = {**WORKER_ENV, "PROCTOR_STAGE_SAMPLE_EVERY": "1"}
+
+
+# ============================================================================
+# FRAMES
+# ============================================================================
+
+def _draw_person(canvas: np.ndarray, cx: float, scale: float, rng: np.random.Generator):
+    """Head and shoulders around x = cx (fraction of the width)"""
+    h, w = canvas.shape[:2]
+    x, unit = int(cx * w), int(scale * h)
+    shirt = tuple(int(c) for c in rng.integers(40, 200, 3))
+    skin = (int(rng.integers(90, 150)), int(rng.integers(130, 180)), int(rng.integers(180, 230)))
+    cv2.ellipse(canvas, (x, h), (int(unit * 1.6), int(unit * 1.1)), 0, 180, 360, shirt, -1)
+    cv2.rectangle(canvas, (x - unit // 5, int(h - unit * 1.3)), (x + unit // 5, int(h - unit * 0.9)), skin, -1)
+    head = (x, int(h - unit * 1.75))
+    cv2.ellipse(canvas, head, (int(unit * 0.42), int(unit * 0.55)), 0, 0, 360, skin, -1)
+    cv2.ellipse(canvas, (head[0], head[1] - int(unit * 0.35)), (int(unit * 0.45), int(unit * 0.3)),
+                0, 180, 360, (30, 30, 40), -1)
+    for side in (-1, 1):
+        eye = (head[0] + side * int(unit * 0.16), head[1] - int(unit * 0.05))
+        cv2.ellipse(canvas, eye, (int(unit * 0.08), int(unit * 0.04)), 0, 0, 360, (245, 245, 245), -1)
+        cv2.circle(canvas, eye, max(1, int(unit * 0.03)), (40, 30, 20), -1)
+        cv2.line(canvas, (eye[0] - int(unit * 0.08), eye[1] - int(unit * 0.08)),
+                 (eye[0] + int(unit * 0.08), eye[1] - int(unit * 0.09)), (40, 40, 50), max(1, unit // 40))
+    cv2.line(canvas, head, (head[0], head[1] + int(unit * 0.15)), (80, 100, 150), max(1, unit // 50))
+    cv2.ellipse(canvas, (head[0], head[1] + int(unit * 0.28)), (int(unit * 0.12), int(unit * 0.04)),
+                0, 0, 180, (70, 60, 150), max(1, unit // 35))
+    return head, unit, skin
+
+
+def synthetic_scene(scenario: str, width: int, height: int, seed: int = 0) -> np.ndarray:
+    """A fixed BGR scene for `scenario` (same seed, same pixels)"""
+    rng = np.random.default_rng(seed)
+    ramp = np.linspace(0.7, 1.0, height, dtype=np.float32)[:, None, None]
+    wall = np.array(rng.integers(150, 220, 3), dtype=np.float32)
+    canvas = np.ascontiguousarray(np.broadcast_to(ramp * wall, (height, width, 3)).astype(np.uint8))
+    cv2.rectangle(canvas, (int(width * 0.65), int(height * 0.1)), (int(width * 0.9), int(height * 0.45)),
+                  (90, 110, 140), -1)  # A picture on the wall
+
+    if scenario == "one_face" or scenario == "phone":
+        head, unit, skin = _draw_person(canvas, 0.5, 0.36, rng)
+        if scenario == "phone":
+            # Phone held up next to the face, fingers around it
+            top_left = (head[0] + int(unit * 0.55), head[1] - int(unit * 0.1))
+            bottom_right = (top_left[0] + int(unit * 0.32), top_left[1] + int(unit * 0.6))
+            cv2.rectangle(canvas, top_left, bottom_right, (20, 20, 20), -1)
+            cv2.rectangle(canvas, (top_left[0] + 4, top_left[1] + 6), (bottom_right[0] - 4, bottom_right[1] - 10),
+                          (200, 160, 90), -1)
+            cv2.ellipse(canvas, (top_left[0] + int(unit * 0.16), bottom_right[1]),
+                        (int(unit * 0.22), int(unit * 0.14)), 0, 0, 360, skin, -1)
+    elif scenario == "two_faces":
+        _draw_person(canvas, 0.3, 0.32, rng)
+        _draw_person(canvas, 0.72, 0.3, rng)
+    elif scenario != "no_face":
+        raise ValueError(f"Unknown scenario '{scenario}'")
+
+    noise = rng.normal(0, 3, canvas.shape)
+    return np.clip(canvas + noise, 0, 255).astype(np.uint8)
+
+
+def load_recorded(frames_dir: str, scenario: str) -> List[np.ndarray]:
+    """Images of DIR/<scenario>/ in name order (empty when there are none)"""
+    directory = os.path.join(frames_dir, scenario)
+    if not os.path.isdir(directory):
+        return []
+    images = []
+    for name in sorted(os.listdir(directory)):
+        if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+            image = cv2.imread(os.path.join(directory, name), cv2.IMREAD_COLOR)
+            if image is not None:
+                images.append(image)
+    return images
+
+
+def fit(image: np.ndarray, width: int, height: int) -> np.ndarray:
+    """`image` scaled and center-cropped to width x height"""
+    scale = max(width / image.shape[1], height / image.shape[0])
+    resized = cv2.resize(image, (math.ceil(image.shape[1] * scale), math.ceil(image.shape[0] * scale)),
+                         interpolation=cv2.INTER_AREA)
+    y = (resized.shape[0] - height) // 2
+    x = (resized.shape[1] - width) // 2
+    return np.ascontiguousarray(resized[y:y + height, x:x + width])
+
+
+def scenario_sources(scenario: str, width: int, height: int, frames_dir: Optional[str],
+                     seed: int) -> Tuple[List[np.ndarray], str]:
+    """Base images of a scenario at width x height and where they came from"""
+    if frames_dir:
+        recorded = load_recorded(frames_dir, scenario)
+        if recorded:
+            return [fit(image, width, height) for image in recorded], "recorded"
+        if scenario == "two_faces":
+            singles = load_recorded(frames_dir, "one_face")
+            if singles:
+                pairs = [np.hstack([fit(a, width // 2, height), fit(b, width - width // 2, height)])
+                         for a, b in zip(singles, singles[1:] + singles[:1])]
+                return pairs, "composed"
+    return [synthetic_scene(scenario, width, height, seed)], "synthetic"
+
+
+def frame_sequence(sources: List[np.ndarray], count: int, encode: bool,
+                   quality: int = 80) -> List[np.ndarray]:
+    """
+    `count` frames cycling through `sources`, each shifted a few pixels
+    along a fixed path (small head movement), JPEG encoded unless encode
+    is False. Encoded up front so the loop times the pipeline only.
+    """
+    frames = []
+    for i in range(count):
+        source = sources[i % len(sources)]
+        dx, dy = 6.0 * math.sin(i / 7.0), 3.0 * math.sin(i / 11.0)
+        shift = np.float32([[1, 0, dx], [0, 1, dy]])
+        frame = cv2.warpAffine(source, shift, (source.shape[1], source.shape[0]),
+                               borderMode=cv2.BORDER_REPLICATE)
+        if encode:
+            _, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            frame = jpeg.reshape(-1)
+        frames.append(frame)
+    return frames
+
+
+# ============================================================================
+# MEASUREMENT
+# ============================================================================
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process so far"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, bytes on macOS
+        return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    except ImportError:
+        pass
+    try:
+        import psutil
+        return round(psutil.Process().memory_info().peak_wset / (1024 * 1024), 1)
+    except Exception:
+        return None
+
+
+def run_scenario(handler, frames: List[np.ndarray], warmup: int, profile: Optional[str],
+                 viz_mode: str, client_id: str, in_pipeline_skip: bool = False) -> Dict:
+    """Time analyze_frame over `frames` after the first `warmup` of them (untimed)"""
+    skip = handler.resolve_profile(profile, handler.PROFILES, handler.DEFAULT_PROFILE).skip_frames
+
+    def feed(index: int, frame: np.ndarray) -> Dict:
+        # Numbered like the ingest loop (already skipped), or unnumbered so
+        # analyze_frame applies the profile's frame skipping itself
+        number = None if in_pipeline_skip else (index + 1) * skip
+        return handler.analyze_frame(frame, client_id, frame_number=number,
+                                     viz_encoding="jpeg", viz_mode=viz_mode, profile=profile)
+
+    try:
+        for index in range(warmup):
+            feed(index, frames[index])
+        handler.stage_stats = StageStats(1, window_seconds=float("inf"))
+
+        faces, alerts, devices = [], Counter(), Counter()
+        analyzed = 0
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+        for index in range(warmup, len(frames)):
+            result = feed(index, frames[index])
+            details = result.get("details")
+            if details is None:
+                continue  # skipped by analyze_frame
+            analyzed += 1
+            faces.append(details["num_faces"])
+            for alert in result["alert"].split(" AND "):
+                alerts[alert] += 1
+            devices.update(result["devices_detected"])
+        wall_s = time.perf_counter() - start
+        cpu_s = time.process_time() - cpu_start
+    finally:
+        handler.release_client(client_id)
+
+    timed = len(frames) - warmup
+    return {
+        "frames": timed,
+        "analyzed": analyzed,
+        "wall_s": round(wall_s, 3),
+        "cpu_s": round(cpu_s, 3),
+        "fps": round(timed / wall_s, 2) if wall_s > 0 else 0.0,
+        "mean_faces": round(float(np.mean(faces)), 2) if faces else 0.0,
+        "alerts": dict(alerts),
+        "devices": dict(devices),
+        "stages": summarize([handler.stage_stats.state()]),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def check_scenario(scenario: str, result: Dict) -> List[str]:
+    """Why `result` did not measure what `scenario` claims (empty when it did)"""
+    faces, phone = SCENARIO_EXPECTATIONS[scenario]
+    problems = []
+    if not result["analyzed"]:
+        return ["no frame was analyzed"]
+    if abs(result["mean_faces"] - faces) >= 0.5:
+        problems.append(f"mean_faces {result['mean_faces']}, expected {faces}")
+    phones = result["devices"].get(PHONE_LABEL, 0)
+    if phone and not phones:
+        problems.append(f"no '{PHONE_LABEL}' detected")
+    elif not phone and phones:
+        problems.append(f"{phones} '{PHONE_LABEL}' detections, expected none")
+    return problems
+
+
+def environment() -> Dict:
+    """What a baseline was measured on"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "proctor_env": {key: value for key, value in sorted(os.environ.items()) if key.startswith("PROCTOR_")},
+    }
+
+
+def run_benchmark(scenarios: List[str] = SCENARIOS, resolutions: List[Tuple[int, int]] = DEFAULT_RESOLUTIONS,
+                  frames: int = 120, warmup: int = 20, profile: Optional[str] = None,
+                  viz_mode: str = "image", encoded: bool = True, frames_dir: Optional[str] = FRAMES_DIR,
+                  seed: int = 0, in_pipeline_skip: bool = False,
+                  handler_module: str = "routes.proctoring") -> Dict:
+    """Benchmark every scenario at every resolution in this process"""
+    for key, value in BENCHMARK_ENV.items():
+        os.environ.setdefault(key, value)
+    handler = importlib.import_module(handler_module)
+    handler.init_inference_worker(0, 1)
+
+    results = []
+    for width, height in resolutions:
+        for scenario in scenarios:
+            sources, origin = scenario_sources(scenario, width, height, frames_dir, seed)
+            sequence = frame_sequence(sources, warmup + frames, encoded)
+            result = run_scenario(handler, sequence, warmup, profile, viz_mode,
+                                  client_id=f"benchmark:{scenario}:{width}x{height}",
+                                  in_pipeline_skip=in_pipeline_skip)
+            problems = check_scenario(scenario, result)
+            result.update({"scenario": scenario, "resolution": f"{width}x{height}", "source": origin,
+                           "valid": not problems, "problems": problems})
+            results.append(result)
+            total = result["stages"].get("total", {})
+            logger.info(f"⏱️  {scenario} @ {width}x{height} ({origin}): {result['fps']} fps, "
+                        f"p50 {total.get('p50_ms')} ms, p95 {total.get('p95_ms')} ms")
+            if problems:
+                logger.warning(f"⚠️  {scenario} @ {width}x{height} is invalid: {'; '.join(problems)}")
+
+    return {
+        "config": {
+            "profile": profile or handler.DEFAULT_PROFILE,
+            "viz_mode": viz_mode,
+            "input": "jpeg" if encoded else "bgr",
+            "frames": frames,
+            "warmup": warmup,
+            "seed": seed,
+            "in_pipeline_skip": in_pipeline_skip,
+            "frames_dir": frames_dir,
+        },
+        "environment": environment(),
+        "valid": all(result["valid"] for result in results),
+        "results": results,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def compare(report: Dict, baseline: Dict) -> List[Dict]:
+    """fps and p95 change per scenario and resolution against a previous report"""
+    previous = {(r["scenario"], r["resolution"]): r for r in baseline.get("results", [])}
+    rows = []
+    for result in report["results"]:
+        before = previous.get((result["scenario"], result["resolution"]))
+        if before is None:
+            continue
+        p95 = result["stages"].get("total", {}).get("p95_ms")
+        p95_before = before["stages"].get("total", {}).get("p95_ms")
+        rows.append({
+            "scenario": result["scenario"],
+            "resolution": result["resolution"],
+            "fps": result["fps"],
+            "fps_before": before["fps"],
+            "fps_change_pct": round(100 * (result["fps"] / before["fps"] - 1), 1) if before["fps"] else None,
+            "p95_ms": p95,
+            "p95_ms_before": p95_before,
+            # Both runs measured what the scenario claims
+            "valid": result["valid"] and before.get("valid", True),
+        })
+    return rows
+
+
+def _parse_resolution(text: str) -> Tuple[int, int]:
+    width, _, height = text.lower().partition("x")
+    return int(width), int(height)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the proctoring pipeline on fixed frames")
+    parser.add_argument("--out", default="proctoring_benchmark.json", help="JSON report (baseline) path")
+    parser.add_argument("--compare", default=None, help="previous report to compare against")
+    parser.add_argument("--frames-dir", "--frames", dest="frames_dir", default=FRAMES_DIR,
+                        help="recorded frames, one sub-directory per scenario (default: the checked-in ones)")
+    parser.add_argument("--synthetic", action="store_true", help="drawn scenes for every scenario")
+    parser.add_argument("--allow-invalid", action="store_true",
+                        help="exit 0 even when a scenario did not measure what it claims")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--resolutions", default=",".join(f"{w}x{h}" for w, h in DEFAULT_RESOLUTIONS))
+    parser.add_argument("--count", type=int, default=120, help="timed frames per scenario and resolution")
+    parser.add_argument("--warmup", type=int, default=20, help="untimed frames before each run")
+    parser.add_argument("--profile", default=None, help="lite, standard or strict")
+    parser.add_argument("--viz-mode", choices=("image", "vector"), default="image")
+    parser.add_argument("--input", choices=("jpeg", "bgr"), default="jpeg")
+    parser.add_argument("--in-pipeline-skip", action="store_true",
+                        help="send unnumbered frames so analyze_frame applies frame skipping")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="pipeline setting for this run, e.g. PROCTOR_ROI=false")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    for setting in args.env:
+        key, sep, value = setting.partition("=")
+        if not sep:
+            parser.error(f"--env expects KEY=VALUE, got '{setting}'")
+        os.environ[key] = value
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    report = run_benchmark(
+        scenarios, [_parse_resolution(r) for r in args.resolutions.split(",")], args.count, args.warmup,
+        args.profile, args.viz_mode, args.input == "jpeg", None if args.synthetic else args.frames_dir,
+        args.seed, args.in_pipeline_skip
+    )
+    if args.compare:
+        with open(args.compare) as f:
+            report["comparison"] = compare(report, json.load(f))
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for result in report["results"]:
+        total = result["stages"].get("total", {})
+        print(f"{result['scenario']:>10} {result['resolution']:>9} {result['source']:>9}: "
+              f"{result['fps']:8.2f} fps  p50 {total.get('p50_ms')} ms  p95 {total.get('p95_ms')} ms  "
+              f"faces {result['mean_faces']}" + ("" if result["valid"] else "  INVALID"))
+    for row in report.get("comparison", []):
+        change = f" ({row['fps_change_pct']:+}%)" if row["fps_change_pct"] is not None else ""
+        print(f"{row['scenario']:>10} {row['resolution']:>9}: {row['fps_before']} -> {row['fps']} fps{change}"
+              + ("" if row["valid"] else "  (invalid)"))
+    print(f"Peak RSS {report['peak_rss_mb']} MB, report written to {args.out}")
+    if not report["valid"]:
+        for result in report["results"]:
+            if not result["valid"]:
+                print(f"❌ {result['scenario']} @ {result['resolution']} ({result['source']}): "
+                      f"{'; '.join(result['problems'])}")
+        return 0 if args.allow_invalid else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+# utils/proctoring/capture_control.py
+"""
+Server-driven capture settings for /ws/proctor clients.
+
+Without it the browser captures at its own rate and size and the server
+throws frames away (skip_frames) after they crossed the network. A client
+that connects with ?capture=server instead receives
+
+    {"type": "capture_settings", "fps": 2.5, "width": 640, "quality": 80}
+
+on connect and whenever the settings change, and captures accordingly, so
+frames the server would not analyze are never sent. The targets come from
+the session's profile; CaptureController steps them down (fps first, then
+width and JPEG quality) while the server is overloaded and back up once it
+has been calm for a while.
+"""
+
+import math
+import time
+from typing import Dict, Optional
+
+CONTROL_MESSAGE = "capture_settings"
+
+# Per level below the profile's targets
+_FPS_STEP = 0.75
+_WIDTH_STEP = 0.875
+_QUALITY_STEP = 5
+
+
+class CaptureSettings:
+    """What the client should capture: frames per second, frame width, JPEG quality (1-100)"""
+
+    __slots__ = ("fps", "width", "quality")
+
+    def __init__(self, fps: float, width: int, quality: int):
+        self.fps = fps
+        self.width = width
+        self.quality = quality
+
+    def __eq__(self, other) -> bool:
+        return (isinstance(other, CaptureSettings)
+                and (self.fps, self.width, self.quality) == (other.fps, other.width, other.quality))
+
+    def as_message(self) -> Dict:
+        return {"type": CONTROL_MESSAGE, "fps": self.fps, "width": self.width, "quality": self.quality}
+
+
+class CaptureController:
+    """
+    Capture settings of one connection.
+
+    Level 0 is the profile's target; each level lowers the rate by a quarter,
+    the width by an eighth (multiples of 16) and the quality by 5, down to
+    the minimums. observe() is fed after every analyzed frame:
+
+    - overloaded: the session's worker is at least `high_load` busy, the
+      server latency exceeds the capture interval, or frames were dropped
+      since the last observation; steps down at most once per `hold_seconds`
+    - calm: load at most `low_load` and latency under half the interval for
+      `recover_seconds`; steps back up one level
+    """
+
+    def __init__(self, fps: float, width: int, quality: int, *, min_fps: float = 1.0,
+                 min_width: int = 320, min_quality: int = 50, max_level: int = 4,
+                 high_load: float = 0.75, low_load: float = 0.4,
+                 hold_seconds: float = 3.0, recover_seconds: float = 10.0):
+        self.target = CaptureSettings(fps, width, quality)
+        self.min_fps = min(min_fps, fps)
+        self.min_width = min(min_width, width)
+        self.min_quality = min(min_quality, quality)
+        self.max_level = max_level
+        self.high_load = high_load
+        self.low_load = low_load
+        self.hold_seconds = hold_seconds
+        self.recover_seconds = recover_seconds
+
+        self.level = 0
+        self.settings = self.target
+        self.changes = 0
+        self._last_change = -math.inf
+        self._calm_since: Optional[float] = None
+        self._dropped = 0
+
+    def settings_for(self, level: int) -> CaptureSettings:
+        if level <= 0:
+            return self.target
+        target = self.target
+        fps = max(self.min_fps, round(target.fps * _FPS_STEP ** level, 2))
+        width = max(self.min_width, int(target.width * _WIDTH_STEP ** level) // 16 * 16)
+        quality = max(self.min_quality, target.quality - _QUALITY_STEP * level)
+        return CaptureSettings(fps, width, quality)
+
+    def observe(self, load: float, latency_s: float, dropped: int,
+                now: Optional[float] = None) -> Optional[CaptureSettings]:
+        """
+        Record one analyzed frame: load of the session's worker (0-1), server
+        latency of the frame in seconds and the connection's dropped-frame
+        total. Returns the new settings when they change, else None.
+        """
+        now = time.monotonic() if now is None else now
+        interval = 1.0 / self.settings.fps
+        dropped_since, self._dropped = dropped - self._dropped, dropped
+
+        if load >= self.high_load or latency_s > interval or dropped_since > 0:
+            self._calm_since = None
+            if self.level < self.max_level and now - self._last_change >= self.hold_seconds:
+                return self._set_level(self.level + 1, now)
+            return None
+
+        if load <= self.low_load and latency_s < interval / 2:
+            if self._calm_since is None:
+                self._calm_since = now
+            if (self.level > 0 and now - self._calm_since >= self.recover_seconds
+                    and now - self._last_change >= self.recover_seconds):
+                return self._set_level(self.level - 1, now)
+        else:
+            self._calm_since = None
+        return None
+
+    def _set_level(self, level: int, now: float) -> Optional[CaptureSettings]:
+        self.level = level
+        self._last_change = now
+        self._calm_since = None
+        settings = self.settings_for(level)
+        if settings == self.settings:
+            return None  # Already at the minimums
+        self.settings = settings
+        self.changes += 1
+        return settings
+
+    def stats(self) -> Dict:
+        settings = self.settings
+        return {"level": self.level, "changes": self.changes,
+                "fps": settings.fps, "width": settings.width, "quality": settings.quality}
@@ -0,0 +1,102 @@
+# utils/proctoring/decode.py
+
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+# libjpeg scales by 1/2, 1/4 and 1/8 in the DCT domain while decoding
+_REDUCED_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+# Start-of-frame markers carrying the image size (not DHT/JPG/DAC)
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def jpeg_dimensions(data) -> Optional[Tuple[int, int]]:
+    """(width, height) from the JPEG headers, or None for anything else"""
+    buf = memoryview(data).cast("B")
+    n = len(buf)
+    if n < 4 or buf[0] != 0xFF or buf[1] != 0xD8:
+        return None
+
+    i = 2
+    while i + 9 < n:
+        if buf[i] != 0xFF:
+            return None
+        marker = buf[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:  # markers without a length
+            i += 2
+            continue
+        if marker in _SOF_MARKERS:
+            height = (buf[i + 5] << 8) | buf[i + 6]
+            width = (buf[i + 7] << 8) | buf[i + 8]
+            return width, height
+        i += 2 + ((buf[i + 2] << 8) | buf[i + 3])
+    return None
+
+
+def reduction_factor(width: int, target_width: int, min_scale: float = 1.0) -> int:
+    """
+    Largest libjpeg scale (1, 2, 4, 8) that keeps the width at least
+    `min_scale` * target_width, i.e. the coarsest decode near the target
+    """
+    factor = 1
+    for candidate in (2, 4, 8):
+        if width // candidate >= target_width * min_scale:
+            factor = candidate
+    return factor
+
+
+class EncodedFrame:
+    """
+    A received JPEG that is decoded only as far as consumers need.
+
+    decode(target_width) decodes once at the coarsest DCT scale that is
+    still at least `min_scale` * target_width pixels wide; full() decodes
+    at full resolution on first use, for the frames whose consumers need
+    every pixel (YOLO, small ROI crops). Non-JPEG input is always decoded
+    at full resolution.
+    """
+
+    def __init__(self, data: np.ndarray):
+        self.data = data
+        dims = jpeg_dimensions(data)
+        self.full_size: Optional[Tuple[int, int]] = dims
+        self.factor = 1
+        self._reduced: Optional[np.ndarray] = None
+        self._full: Optional[np.ndarray] = None
+
+    def _imdecode(self, flag: int) -> np.ndarray:
+        image = cv2.imdecode(self.data, flag)
+        if image is None:
+            raise ValueError("Failed to decode frame")
+        return image
+
+    def decode(self, target_width: int, min_scale: float = 1.0) -> np.ndarray:
+        if self._reduced is None:
+            if self.full_size is not None:
+                self.factor = reduction_factor(self.full_size[0], target_width, min_scale)
+            if self.factor == 1:
+                self._reduced = self.full()
+            else:
+                self._reduced = self._imdecode(_REDUCED_FLAGS[self.factor])
+        return self._reduced
+
+    @property
+    def reduced(self) -> bool:
+        """Whether decode() returned less than full resolution"""
+        return self.factor > 1
+
+    def full(self) -> np.ndarray:
+        if self._full is None:
+            self._full = self._imdecode(cv2.IMREAD_COLOR)
+            self.full_size = (self._full.shape[1], self._full.shape[0])
+        return self._full
@@ -0,0 +1,355 @@
+# utils/proctoring/detector_backends.py
+"""
+Pluggable backends for YOLOv8 device detection.
+
+- "torch":     ultralytics YOLO on PyTorch (CUDA when available)
+- "onnx":      yolov8n exported once to ONNX, run by onnxruntime on CPU
+- "onnx-int8": the same model quantized to INT8
+- "openvino":  the ONNX model through onnxruntime's OpenVINO provider
+
+Every backend returns, per input frame, (class_id, confidence, [x1, y1, x2, y2])
+tuples in input pixel coordinates, restricted to COCO ids 62-67 (tv/monitor,
+laptop, mouse, remote, keyboard, cell phone).
+
+Run as a module to export/quantize models and to compare a backend with the
+PyTorch path (parity and latency; tests/test_detector_backends.py bounds
+the ONNX recall):
+
+    python -m utils.proctoring.detector_backends export --int8
+    python -m utils.proctoring.detector_backends compare --backend onnx-int8 --images samples/
+"""
+
+import argparse
+import glob
+import logging
+import os
+import sys
+import time
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEVICE_CLASS_IDS = tuple(range(62, 68))
+BACKENDS = ("torch", "onnx", "onnx-int8", "openvino")
+
+Detection = Tuple[int, float, List[float]]
+
+
+def _stride_multiple(size: int, stride: int = 32) -> int:
+    return int(np.ceil(size / stride) * stride)
+
+
+class UltralyticsBackend:
+    """ultralytics YOLO model (PyTorch)"""
+
+    name = "torch"
+
+    def __init__(self, model, imgsz: int):
+        self.model = model
+        self.imgsz = imgsz
+
+    def detect(self, frames: Sequence[np.ndarray], conf: float = 0.3) -> List[List[Detection]]:
+        import torch
+
+        with torch.no_grad():
+            results = self.model(list(frames), verbose=False, conf=conf, imgsz=self.imgsz)
+
+        outputs = []
+        for result in results:
+            detections = []
+            for box in result.boxes:
+                class_id = int(box.cls[0])
+                if class_id in DEVICE_CLASS_IDS:
+                    detections.append((class_id, float(box.conf[0]), box.xyxy[0].tolist()))
+            outputs.append(detections)
+        return outputs
+
+
+class OnnxBackend:
+    """
+    YOLOv8 ONNX model on onnxruntime.
+
+    Frames are padded (not resized) to the model's square input, so boxes
+    come out directly in input pixel coordinates. Postprocessing only looks
+    at the six device class columns of the 80-class head before NMS.
+    """
+
+    def __init__(self, model_path: str, imgsz: int, threads: int = 0,
+                 providers: Optional[List[str]] = None, name: str = "onnx",
+                 iou_threshold: float = 0.45):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.inter_op_num_threads = 1
+        if threads > 0:
+            options.intra_op_num_threads = threads
+
+        available = ort.get_available_providers()
+        providers = [p for p in (providers or []) if p in available] + ["CPUExecutionProvider"]
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=providers)
+        self.input_name = self.session.get_inputs()[0].name
+        self.name = name
+        self.model_path = model_path
+        self.imgsz = _stride_multiple(imgsz)
+        self.iou_threshold = iou_threshold
+        self.class_rows = np.array(DEVICE_CLASS_IDS) + 4  # rows of the (4 + 80, N) output
+
+    def _preprocess(self, frames: Sequence[np.ndarray]) -> np.ndarray:
+        batch = np.full((len(frames), self.imgsz, self.imgsz, 3), 114, dtype=np.uint8)
+        for i, frame in enumerate(frames):
+            h, w = frame.shape[:2]
+            if h > self.imgsz or w > self.imgsz:
+                raise ValueError(f"Frame {w}x{h} larger than detector input {self.imgsz}")
+            batch[i, :h, :w] = frame
+        # BGR HWC uint8 -> RGB CHW float32 in [0, 1]
+        return np.ascontiguousarray(batch[..., ::-1].transpose(0, 3, 1, 2), dtype=np.float32) / 255.0
+
+    def _postprocess(self, output: np.ndarray, conf: float) -> List[Detection]:
+        scores = output[self.class_rows]                # (6, N)
+        best = scores.argmax(axis=0)
+        confidences = scores[best, np.arange(scores.shape[1])]
+        keep = confidences >= conf
+        if not keep.any():
+            return []
+
+        cx, cy, bw, bh = output[:4, keep]
+        boxes = np.stack([cx - bw / 2, cy - bh / 2, bw, bh], axis=1)
+        class_ids = np.array(DEVICE_CLASS_IDS)[best[keep]]
+        confidences = confidences[keep]
+
+        # Class-aware NMS: shift boxes of different classes apart
+        offset_boxes = boxes.copy()
+        offset_boxes[:, :2] += class_ids[:, None] * 4096
+        indices = cv2.dnn.NMSBoxes(offset_boxes.tolist(), confidences.tolist(), conf, self.iou_threshold)
+
+        detections = []
+        for i in np.array(indices).reshape(-1):
+            x, y, w, h = boxes[i]
+            detections.append((int(class_ids[i]), float(confidences[i]),
+                               [float(x), float(y), float(x + w), float(y + h)]))
+        return detections
+
+    def detect(self, frames: Sequence[np.ndarray], conf: float = 0.3) -> List[List[Detection]]:
+        outputs = self.session.run(None, {self.input_name: self._preprocess(frames)})[0]
+        return [self._postprocess(output, conf) for output in outputs]
+
+
+# ============================================================================
+# EXPORT / QUANTIZATION
+# ============================================================================
+def export_onnx(weights: str = "yolov8n.pt", imgsz: int = 360) -> str:
+    """Export the ultralytics weights to ONNX (dynamic batch) once; returns the .onnx path"""
+    onnx_path = os.path.splitext(weights)[0] + ".onnx"
+    if os.path.exists(onnx_path):
+        return onnx_path
+
+    from ultralytics import YOLO
+
+    logger.info(f"Exporting {weights} to ONNX (imgsz={_stride_multiple(imgsz)})...")
+    exported = YOLO(weights, task="detect").export(
+        format="onnx", imgsz=_stride_multiple(imgsz), dynamic=True, simplify=True
+    )
+    return str(exported)
+
+
+class _CalibrationReader:
+    """onnxruntime CalibrationDataReader over preprocessed sample frames"""
+
+    def __init__(self, input_name: str, batches: Iterator[np.ndarray]):
+        self.input_name = input_name
+        self.batches = iter(batches)
+
+    def get_next(self):
+        batch = next(self.batches, None)
+        return None if batch is None else {self.input_name: batch}
+
+
+def quantize_int8(onnx_path: str, calibration_frames: Optional[List[np.ndarray]] = None,
+                  imgsz: int = 360) -> str:
+    """
+    Quantize an ONNX model to INT8 once; returns the quantized model path.
+
+    With calibration frames (real webcam captures) activations are quantized
+    statically (QDQ); without, only weights are quantized (dynamic).
+    """
+    int8_path = os.path.splitext(onnx_path)[0] + ".int8.onnx"
+    if os.path.exists(int8_path):
+        return int8_path
+
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_dynamic, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    prepared_path = os.path.splitext(onnx_path)[0] + ".prep.onnx"
+    quant_pre_process(onnx_path, prepared_path)
+
+    try:
+        if calibration_frames:
+            logger.info(f"Quantizing {onnx_path} to INT8 with {len(calibration_frames)} calibration frames...")
+            backend = OnnxBackend(onnx_path, imgsz)
+            batches = (backend._preprocess([cv2.resize(f, (imgsz, imgsz))]) for f in calibration_frames)
+            quantize_static(
+                prepared_path, int8_path, _CalibrationReader(backend.input_name, batches),
+                quant_format=QuantFormat.QDQ, activation_type=QuantType.QUInt8,
+                weight_type=QuantType.QInt8, per_channel=True
+            )
+        else:
+            logger.info(f"Quantizing {onnx_path} weights to INT8 (no calibration frames)...")
+            quantize_dynamic(prepared_path, int8_path, weight_type=QuantType.QUInt8)
+    finally:
+        if os.path.exists(prepared_path):
+            os.remove(prepared_path)
+    return int8_path
+
+
+def load_detector_backend(name: str, weights: str = "yolov8n.pt", imgsz: int = 360, threads: int = 0,
+                          calibration_frames: Optional[List[np.ndarray]] = None):
+    """
+    Build an ONNX-based backend ("onnx", "onnx-int8", "openvino"), exporting
+    and quantizing the model on first use. The "torch" backend needs the
+    loaded ultralytics model and is built by the caller (UltralyticsBackend).
+    """
+    if name not in BACKENDS or name == "torch":
+        raise ValueError(f"Unknown ONNX detector backend: {name}")
+
+    model_path = export_onnx(weights, imgsz)
+    if name == "onnx-int8":
+        model_path = quantize_int8(model_path, calibration_frames, imgsz)
+    providers = ["OpenVINOExecutionProvider"] if name == "openvino" else []
+    return OnnxBackend(model_path, imgsz, threads=threads, providers=providers, name=name)
+
+
+# ============================================================================
+# PARITY / LATENCY COMPARISON
+# ============================================================================
+def _iou(a: List[float], b: List[float]) -> float:
+    ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def match_detections(reference: List[Detection], candidate: List[Detection],
+                     iou_threshold: float = 0.5) -> List[Tuple[Detection, Detection]]:
+    """Greedy same-class matching by IoU, highest reference confidence first"""
+    matches = []
+    unmatched = list(candidate)
+    for ref in sorted(reference, key=lambda d: -d[1]):
+        best, best_iou = None, iou_threshold
+        for cand in unmatched:
+            if cand[0] == ref[0]:
+                iou = _iou(ref[2], cand[2])
+                if iou >= best_iou:
+                    best, best_iou = cand, iou
+        if best is not None:
+            unmatched.remove(best)
+            matches.append((ref, best))
+    return matches
+
+
+def _time_backend(backend, frames: List[np.ndarray], batch_size: int, conf: float,
+                  repeats: int) -> Tuple[List[List[Detection]], List[float]]:
+    backend.detect(frames[:batch_size], conf)  # warm up
+    timings = []
+    results: List[List[Detection]] = []
+    for r in range(repeats):
+        for start in range(0, len(frames), batch_size):
+            batch = frames[start:start + batch_size]
+            t0 = time.perf_counter()
+            out = backend.detect(batch, conf)
+            timings.append((time.perf_counter() - t0) * 1000 / len(batch))
+            if r == 0:
+                results.extend(out)
+    return results, timings
+
+
+def compare_backends(reference, candidate, frames: List[np.ndarray], batch_size: int = 1,
+                     conf: float = 0.3, repeats: int = 3) -> dict:
+    """Detection parity of `candidate` against `reference` plus per-frame latency of both"""
+    ref_results, ref_times = _time_backend(reference, frames, batch_size, conf, repeats)
+    cand_results, cand_times = _time_backend(candidate, frames, batch_size, conf, repeats)
+
+    ref_total = sum(len(r) for r in ref_results)
+    cand_total = sum(len(c) for c in cand_results)
+    matches = [m for r, c in zip(ref_results, cand_results) for m in match_detections(r, c)]
+    conf_diffs = [abs(ref[1] - cand[1]) for ref, cand in matches]
+
+    def latency(times: List[float]) -> dict:
+        return {
+            "p50_ms": round(float(np.percentile(times, 50)), 2),
+            "p95_ms": round(float(np.percentile(times, 95)), 2),
+            "mean_ms": round(float(np.mean(times)), 2),
+        }
+
+    return {
+        "frames": len(frames),
+        "batch_size": batch_size,
+        "reference": reference.name,
+        "candidate": candidate.name,
+        "reference_detections": ref_total,
+        "candidate_detections": cand_total,
+        "matched": len(matches),
+        "recall": round(len(matches) / ref_total, 3) if ref_total else 1.0,
+        "precision": round(len(matches) / cand_total, 3) if cand_total else 1.0,
+        "mean_conf_diff": round(float(np.mean(conf_diffs)), 4) if conf_diffs else 0.0,
+        "reference_latency": latency(ref_times),
+        "candidate_latency": latency(cand_times),
+    }
+
+
+def _load_frames(pattern_dir: Optional[str], imgsz: int, count: int) -> List[np.ndarray]:
+    if pattern_dir:
+        paths = sorted(p for ext in ("jpg", "jpeg", "png")
+                       for p in glob.glob(os.path.join(pattern_dir, f"*.{ext}")))
+        frames = [cv2.imread(p) for p in paths]
+        return [cv2.resize(f, (imgsz, imgsz)) for f in frames if f is not None]
+    # Latency only: synthetic frames carry no devices
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 255, (imgsz, imgsz, 3), dtype=np.uint8) for _ in range(count)]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Device detector backends: export and parity/latency check")
+    parser.add_argument("--weights", default=os.getenv("PROCTOR_DETECTOR_WEIGHTS", "yolov8n.pt"))
+    parser.add_argument("--imgsz", type=int, default=360)
+    parser.add_argument("--threads", type=int, default=0)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export = sub.add_parser("export", help="export to ONNX (and INT8) once")
+    export.add_argument("--int8", action="store_true")
+    export.add_argument("--calibration-dir", help="webcam captures for static INT8 calibration")
+
+    compare = sub.add_parser("compare", help="compare a backend with the PyTorch path")
+    compare.add_argument("--backend", choices=[b for b in BACKENDS if b != "torch"], default="onnx")
+    compare.add_argument("--images", help="directory of sample frames; synthetic frames (latency only) if omitted")
+    compare.add_argument("--frames", type=int, default=32, help="number of synthetic frames")
+    compare.add_argument("--batch-size", type=int, default=1)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "export":
+        path = export_onnx(args.weights, args.imgsz)
+        print(f"ONNX model: {path}")
+        if args.int8:
+            calibration = _load_frames(args.calibration_dir, args.imgsz, 0) if args.calibration_dir else None
+            print(f"INT8 model: {quantize_int8(path, calibration, args.imgsz)}")
+        return 0
+
+    from ultralytics import YOLO
+
+    reference = UltralyticsBackend(YOLO(args.weights, task="detect"), args.imgsz)
+    candidate = load_detector_backend(args.backend, args.weights, args.imgsz, args.threads)
+    frames = _load_frames(args.images, args.imgsz, args.frames)
+    report = compare_backends(reference, candidate, frames, batch_size=args.batch_size)
+    for key, value in report.items():
+        print(f"{key:>22}: {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,279 @@
+# utils/proctoring/evidence.py
+"""
+Evidence clips: the encoded frames around a confirmed alert.
+
+EvidenceRecorder keeps the last `seconds` of a connection's incoming frames
+exactly as they arrived (the JPEG bytes of the binary protocol, the base64
+string of the JSON one) by reference, so nothing is decoded or copied on the
+frame loop and memory is bounded by time and by `max_bytes`. When a trigger
+alert is confirmed it freezes that ring into a clip, keeps adding frames for
+`post_roll` seconds and then hands the clip to EvidenceWriter, whose
+background thread stores it:
+
+- GridFSEvidenceStore: one GridFS file per clip (the JPEGs back to back,
+  i.e. an MJPEG stream) plus an index document in `<bucket>_clips`
+- DirectoryEvidenceStore: <clip_id>.mjpeg and <clip_id>.json on disk
+
+The index lists every frame's arrival time, frame number, offset and length
+in the bundle, so a reviewer can step through the clip or cut single frames.
+Clips carry the connection's meta ({session, user, quiz}); the user there
+is the authenticated one, so clips can be looked up per user.
+"""
+
+import base64
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (wall clock time, frame number, payload as received)
+EvidenceFrame = Tuple[float, int, Any]
+
+
+def payload_size(payload: Any) -> int:
+    return len(payload)
+
+
+def payload_to_jpeg(payload: Any) -> bytes:
+    """JPEG bytes of a received frame (base64 is only undone when storing)"""
+    if isinstance(payload, (bytes, bytearray, memoryview)):
+        return bytes(payload)
+    if "," in payload:
+        payload = payload.split(",", 1)[1]  # data URL prefix
+    return base64.b64decode(payload)
+
+
+class EvidenceClip:
+    """Frames of one alert: the ring at trigger time plus the post-roll"""
+
+    def __init__(self, meta: Dict, alerts: Iterable[str], triggered_at: float,
+                 frames: List[EvidenceFrame], until: float):
+        self.clip_id = uuid.uuid4().hex
+        self.meta = meta
+        self.alerts: Set[str] = set(alerts)
+        self.triggered_at = triggered_at
+        self.frames = frames
+        self.until = until
+        self.nbytes = sum(payload_size(frame[2]) for frame in frames)
+
+    def bundle(self) -> Tuple[bytes, Dict]:
+        """(MJPEG bytes, index document); decodes base64 payloads, so call off the event loop"""
+        chunks, index, offset = [], [], 0
+        for received_at, frame_number, payload in self.frames:
+            jpeg = payload_to_jpeg(payload)
+            chunks.append(jpeg)
+            index.append({"t": received_at, "frame": frame_number, "offset": offset, "length": len(jpeg)})
+            offset += len(jpeg)
+
+        def utc(t: float) -> datetime:
+            return datetime.fromtimestamp(t, tz=timezone.utc)
+
+        document = {
+            "clip_id": self.clip_id,
+            **self.meta,
+            "alerts": sorted(self.alerts),
+            "triggered_at": utc(self.triggered_at),
+            "start": utc(self.frames[0][0]) if self.frames else utc(self.triggered_at),
+            "end": utc(self.frames[-1][0]) if self.frames else utc(self.triggered_at),
+            "frame_count": len(index),
+            "bytes": offset,
+            "content_type": "video/x-motion-jpeg",
+            "frames": index,
+        }
+        return b"".join(chunks), document
+
+
+class EvidenceRecorder:
+    """
+    Per-connection ring of received frames and the clip being recorded
+    (event loop only). A trigger alert starts a clip unless the same alert
+    started one less than `cooldown` seconds ago; alerts during a clip's
+    post-roll are added to that clip.
+    """
+
+    def __init__(self, writer: "EvidenceWriter", meta: Dict, trigger_alerts: Set[str],
+                 seconds: float = 10.0, post_roll: float = 3.0, max_bytes: int = 8 * 1024 * 1024,
+                 cooldown: float = 30.0):
+        self.writer = writer
+        self.meta = meta
+        self.trigger_alerts = trigger_alerts
+        self.seconds = seconds
+        self.post_roll = post_roll
+        self.max_bytes = max_bytes
+        self.cooldown = cooldown
+        self._ring: Deque[EvidenceFrame] = deque()
+        self._ring_bytes = 0
+        self._clip: Optional[EvidenceClip] = None
+        self._last_trigger: Dict[str, float] = {}
+        self.clips = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self._ring_bytes + (self._clip.nbytes if self._clip is not None else 0)
+
+    def add_frame(self, payload: Any, frame_number: int, now: Optional[float] = None):
+        """Keep a received frame (a reference, not a copy)"""
+        now = time.time() if now is None else now
+        frame = (now, frame_number, payload)
+        size = payload_size(payload)
+        self._ring.append(frame)
+        self._ring_bytes += size
+        while self._ring and (now - self._ring[0][0] > self.seconds or self._ring_bytes > self.max_bytes):
+            self._ring_bytes -= payload_size(self._ring.popleft()[2])
+
+        clip = self._clip
+        if clip is not None:
+            if now > clip.until or clip.nbytes + size > self.max_bytes:
+                self.finish()
+            else:
+                clip.frames.append(frame)
+                clip.nbytes += size
+
+    def on_alerts(self, alerts: Iterable[str], now: Optional[float] = None):
+        """Feed the confirmed alerts of an analyzed frame"""
+        now = time.time() if now is None else now
+        triggered = [alert for alert in alerts if alert in self.trigger_alerts]
+        if not triggered:
+            return
+        if self._clip is not None:
+            self._clip.alerts.update(triggered)
+            return
+        fresh = [alert for alert in triggered if now - self._last_trigger.get(alert, float("-inf")) >= self.cooldown]
+        if not fresh:
+            return
+        for alert in triggered:
+            self._last_trigger[alert] = now
+        self._clip = EvidenceClip(self.meta, triggered, now, list(self._ring), now + self.post_roll)
+
+    def finish(self):
+        """Hand the clip being recorded (if any) to the writer"""
+        clip, self._clip = self._clip, None
+        if clip is not None and clip.frames:
+            self.clips += 1
+            self.writer.submit(clip)
+
+
+class DirectoryEvidenceStore:
+    """Clips as <clip_id>.mjpeg plus <clip_id>.json in one directory"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, clip: EvidenceClip):
+        data, document = clip.bundle()
+        path = os.path.join(self.directory, f"{clip.clip_id}.mjpeg")
+        with open(path, "wb") as f:
+            f.write(data)
+        document["path"] = path
+        with open(os.path.join(self.directory, f"{clip.clip_id}.json"), "w") as f:
+            json.dump(document, f, default=str)
+
+
+class GridFSEvidenceStore:
+    """Clips in the GridFS bucket `bucket`, index documents in `<bucket>_clips`"""
+
+    def __init__(self, db, bucket: str = "proctoring_evidence"):
+        import gridfs
+        self.fs = gridfs.GridFSBucket(db, bucket_name=bucket)
+        self.index = db[f"{bucket}_clips"]
+        self.index.create_index([("quiz", 1), ("triggered_at", 1)])
+        self.index.create_index([("user", 1), ("triggered_at", 1)])
+
+    def write(self, clip: EvidenceClip):
+        data, document = clip.bundle()
+        document["file_id"] = self.fs.upload_from_stream(
+            f"{clip.clip_id}.mjpeg", data,
+            metadata={"clip_id": clip.clip_id, "user": document.get("user"),
+                      "content_type": document["content_type"]}
+        )
+        self.index.insert_one(document)
+
+
+class EvidenceWriter:
+    """
+    Background writer of evidence clips. `store_factory()` runs on the writer
+    thread and returns a store with write(clip). submit() never blocks: with
+    `max_clips` clips waiting the new one is dropped.
+    """
+
+    def __init__(self, store_factory, max_clips: int = 16):
+        self.store_factory = store_factory
+        self._queue: "queue.Queue[Optional[EvidenceClip]]" = queue.Queue(maxsize=max_clips)
+        self._thread: Optional[threading.Thread] = None
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._thread = threading.Thread(target=self._run, name="proctor-evidence", daemon=True)
+        self._thread.start()
+
+    def submit(self, clip: EvidenceClip) -> bool:
+        if not self.running:
+            self.dropped += 1
+            return False
+        try:
+            self._queue.put_nowait(clip)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            logger.warning(f"⚠️  Evidence writer behind, dropped clip of {sorted(clip.alerts)}")
+            return False
+
+    def stop(self, timeout: float = 10.0):
+        """Write what is queued, then stop the thread"""
+        if not self.running:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            logger.warning("⚠️  Evidence writer did not drain before shutdown")
+            return
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        try:
+            store = self.store_factory()
+        except Exception as e:
+            logger.error(f"❌ Evidence clips disabled, store unavailable: {e}")
+            store = None
+
+        while True:
+            clip = self._queue.get()
+            if clip is None:
+                return
+            if store is None:
+                self.dropped += 1
+                continue
+            try:
+                store.write(clip)
+                self.written += 1
+                logger.info(f"🎞️  Evidence clip {clip.clip_id}: {sorted(clip.alerts)}, {len(clip.frames)} frames")
+            except Exception as e:
+                self.failed += 1
+                logger.warning(f"⚠️  Evidence clip write failed: {e}")
+
+    def stats(self) -> Dict:
+        return {
+            "running": self.running,
+            "queued_clips": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
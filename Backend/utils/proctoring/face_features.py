@@ -0,0 +1,339 @@
+# utils/proctoring/face_features.py
+"""
+Face features from a FaceMesh result held as one (N, 3) float32 array.
+
+FaceMesh returns a protobuf list of 468 (478 with iris refinement)
+landmarks; reading `.landmark[i].x` goes through a protobuf accessor every
+time. The pipeline converts each face once per frame with
+landmarks_to_array() and everything after that (crop remap, face box,
+optical flow, EAR and gaze for both eyes, head-pose image points, iris
+drawing) is plain NumPy indexing on that array. Coordinates stay
+normalized: x, y in [0, 1] of the frame, z as MediaPipe reports it.
+
+Run as a module to time a FaceMesh keyframe's landmark work (crop remap,
+face box, features) against per-landmark attribute access
+(tests/test_face_features.py checks that both give the same values):
+
+    python -m utils.proctoring.face_features --frames 2000
+"""
+
+import argparse
+import math
+import sys
+import time
+from functools import lru_cache
+from itertools import chain
+from typing import Callable, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from utils.proctoring.roi import remap_points
+
+# ============================================================================
+# LANDMARK DEFINITIONS (MediaPipe FaceMesh 468-point model)
+# ============================================================================
+LEFT_EYE_LANDMARKS = [33, 160, 158, 133, 153, 144]
+RIGHT_EYE_LANDMARKS = [362, 385, 387, 263, 373, 380]
+LEFT_IRIS_CENTER = 468
+RIGHT_IRIS_CENTER = 473
+
+# Head pose estimation landmarks
+NOSE_TIP = 1
+CHIN = 152
+LEFT_EYE_CORNER = 33
+RIGHT_EYE_CORNER = 263
+LEFT_MOUTH_CORNER = 61
+RIGHT_MOUTH_CORNER = 291
+
+# Index arrays for fancy indexing: (2, 3) EAR distance endpoints per eye
+# (two vertical pairs, then the horizontal one), (2, 3) inner corner / outer
+# corner / iris center per eye, (6,) head-pose points, (2,) iris centers
+EYE_INDEX = np.array([LEFT_EYE_LANDMARKS, RIGHT_EYE_LANDMARKS])
+EAR_FROM_INDEX = EYE_INDEX[:, [1, 2, 0]]
+EAR_TO_INDEX = EYE_INDEX[:, [5, 4, 3]]
+GAZE_INDEX = np.array([[133, 33, LEFT_IRIS_CENTER], [362, 263, RIGHT_IRIS_CENTER]])
+HEAD_POSE_LANDMARKS = (NOSE_TIP, CHIN, LEFT_EYE_CORNER, RIGHT_EYE_CORNER,
+                       LEFT_MOUTH_CORNER, RIGHT_MOUTH_CORNER)
+HEAD_POSE_INDEX = np.array(HEAD_POSE_LANDMARKS)
+IRIS_INDEX = np.array([LEFT_IRIS_CENTER, RIGHT_IRIS_CENTER])
+
+# 3D model points (generic human face model), in HEAD_POSE_LANDMARKS order
+HEAD_MODEL_POINTS = np.array([
+    (0.0, 0.0, 0.0),           # Nose tip
+    (0.0, -330.0, -65.0),      # Chin
+    (-225.0, 170.0, -135.0),   # Left eye left corner
+    (225.0, 170.0, -135.0),    # Right eye right corner
+    (-150.0, -150.0, -125.0),  # Left mouth corner
+    (150.0, -150.0, -125.0)    # Right mouth corner
+], dtype=np.float64)
+DIST_COEFFS = np.zeros((4, 1))  # Assuming no lens distortion
+
+
+def landmarks_to_array(face_landmarks) -> np.ndarray:
+    """(N, 3) float32 array of a FaceMesh NormalizedLandmarkList"""
+    landmarks = face_landmarks.landmark
+    n = len(landmarks)
+    # One pass over the accessors straight into the array, no per-row tuples
+    flat = np.fromiter(chain.from_iterable((lm.x, lm.y, lm.z) for lm in landmarks),
+                       dtype=np.float32, count=3 * n)
+    return flat.reshape(n, 3)
+
+
+def has_iris(points: np.ndarray) -> bool:
+    """Iris centers are only present with refine_landmarks"""
+    return points.shape[0] > RIGHT_IRIS_CENTER
+
+
+def face_box(points: np.ndarray) -> Tuple[float, float, float, float]:
+    """Normalized (x0, y0, x1, y1) spanning the landmarks"""
+    # Per column: axis-0 reductions over a 3-wide array are much slower
+    xs, ys = points[:, 0], points[:, 1]
+    return float(xs.min()), float(ys.min()), float(xs.max()), float(ys.max())
+
+
+# EYE TRACKING & GAZE DETECTION
+
+def eye_aspect_ratios(points: np.ndarray, img_w: int, img_h: int) -> Tuple[float, float]:
+    """
+    Eye Aspect Ratio (EAR) of both eyes for blink detection, in pixels
+    EAR = (vertical_dist1 + vertical_dist2) / (2 * horizontal_dist)
+
+    Returns:
+        (left, right) EAR (typically 0.2-0.4 when open, <0.15 when closed)
+    """
+    # (2, 3, 2): per eye the two vertical and the horizontal distance vector
+    d = (points[EAR_FROM_INDEX, :2] - points[EAR_TO_INDEX, :2]) * (img_w, img_h)
+    dist = np.sqrt((d * d).sum(axis=2))
+    left, right = (
+        0.0 if h < 1e-6 else (v1 + v2) / (2.0 * h)
+        for v1, v2, h in dist.tolist()
+    )
+    return left, right
+
+
+def detect_gaze_direction(points: np.ndarray, img_w: int, img_h: int) -> Tuple[float, float]:
+    """
+    Detect gaze direction using iris-to-eye-center ratio
+
+    Formula: gaze_x = (iris_center_x - eye_center_x) / eye_width * 100
+
+    Returns:
+        (horizontal_angle, vertical_angle) in degrees, averaged over both eyes
+        Positive values = right/down, Negative values = left/up
+    """
+    eyes = points[GAZE_INDEX, :2] * (img_w, img_h)  # (2, 3, 2)
+    inner, outer, iris = eyes[:, 0], eyes[:, 1], eyes[:, 2]
+
+    span = inner - outer
+    eye_width = np.sqrt((span * span).sum(axis=1))
+    offset = iris - (inner + outer) / 2
+    if (eye_width > 0).all():
+        gaze = offset / eye_width[:, None] * 100
+    else:
+        gaze = np.zeros((2, 2))
+        seen = eye_width > 0
+        gaze[seen] = offset[seen] / eye_width[seen, None] * 100
+
+    # Average both eyes
+    avg_gaze_x, avg_gaze_y = gaze.mean(axis=0)
+    return float(avg_gaze_x), float(avg_gaze_y)
+
+
+def draw_iris_points(frame: np.ndarray, points: np.ndarray, img_w: int, img_h: int):
+    """Draw iris centers on the frame for visualization"""
+    for x, y in points[IRIS_INDEX, :2] * (img_w, img_h):
+        cv2.circle(frame, (int(x), int(y)), 3, (0, 255, 255), -1)
+
+
+# HEAD POSE ESTIMATION
+
+@lru_cache(maxsize=16)
+def camera_matrix_for(img_w: int, img_h: int) -> np.ndarray:
+    """Estimated pinhole camera internals for a resolution (cached; do not modify)"""
+    focal_length = img_w
+    center = (img_w / 2, img_h / 2)
+    return np.array([
+        [focal_length, 0, center[0]],
+        [0, focal_length, center[1]],
+        [0, 0, 1]
+    ], dtype=np.float64)
+
+
+def head_pose_image_points(points: np.ndarray, img_w: int, img_h: int,
+                           out: Optional[np.ndarray] = None) -> np.ndarray:
+    """(6, 2) float64 pixel positions of HEAD_POSE_LANDMARKS"""
+    if out is None:
+        out = np.empty((len(HEAD_POSE_LANDMARKS), 2), dtype=np.float64)
+    np.multiply(points[HEAD_POSE_INDEX, :2], (img_w, img_h), out=out)
+    return out
+
+
+def calculate_head_pose(points: np.ndarray, img_w: int, img_h: int,
+                        image_points: Optional[np.ndarray] = None) -> Tuple[float, float, float]:
+    """
+    Calculate head pose (pitch, yaw, roll) using solvePnP
+
+    Returns:
+        (pitch, yaw, roll) in degrees
+        - Pitch: nodding (positive = looking down)
+        - Yaw: turning left/right (positive = looking right)
+        - Roll: tilting head (positive = tilting right)
+
+    Args:
+        image_points: optional preallocated (6, 2) float64 buffer
+    """
+    image_points = head_pose_image_points(points, img_w, img_h, image_points)
+
+    # Solve PnP
+    success, rotation_vector, translation_vector = cv2.solvePnP(
+        HEAD_MODEL_POINTS, image_points, camera_matrix_for(img_w, img_h), DIST_COEFFS,
+        flags=cv2.SOLVEPNP_ITERATIVE
+    )
+
+    if not success:
+        return 0.0, 0.0, 0.0
+
+    # Convert rotation vector to Euler angles
+    rotation_mat, _ = cv2.Rodrigues(rotation_vector)
+    pose_mat = cv2.hconcat((rotation_mat, translation_vector))
+    _, _, _, _, _, _, euler_angles = cv2.decomposeProjectionMatrix(pose_mat)
+
+    pitch, yaw, roll = euler_angles.flatten()[:3]
+
+    return pitch, yaw, roll
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def _landmark_list_class():
+    """MediaPipe's NormalizedLandmarkList, or the same message built from its schema"""
+    try:
+        from mediapipe.framework.formats import landmark_pb2
+        return landmark_pb2.NormalizedLandmarkList
+    except ImportError:
+        pass
+    from google.protobuf import descriptor_pb2, descriptor_pool, message_factory
+
+    fields = descriptor_pb2.FieldDescriptorProto
+    proto = descriptor_pb2.FileDescriptorProto(name="landmark.proto", package="mediapipe", syntax="proto2")
+    landmark = proto.message_type.add(name="NormalizedLandmark")
+    for number, name in enumerate(("x", "y", "z", "visibility", "presence"), 1):
+        landmark.field.add(name=name, number=number, type=fields.TYPE_FLOAT, label=fields.LABEL_OPTIONAL)
+    landmark_list = proto.message_type.add(name="NormalizedLandmarkList")
+    landmark_list.field.add(name="landmark", number=1, type=fields.TYPE_MESSAGE, label=fields.LABEL_REPEATED,
+                            type_name=".mediapipe.NormalizedLandmark")
+    pool = descriptor_pool.DescriptorPool()
+    pool.Add(proto)
+    return message_factory.GetMessageClass(pool.FindMessageTypeByName("mediapipe.NormalizedLandmarkList"))
+
+
+def _synthetic_face(rng: np.random.Generator, n: int = 478):
+    """A FaceMesh-like landmark list, as protobuf whenever protobuf is installed"""
+    coords = rng.uniform(0.3, 0.7, (n, 3)).astype(np.float32)
+    try:
+        landmark_list_class = _landmark_list_class()
+    except ImportError:
+        class _Landmark:
+            __slots__ = ("x", "y", "z")
+
+        class _LandmarkList:
+            def __init__(self):
+                self.landmark = []
+
+        face = _LandmarkList()
+        for x, y, z in coords:
+            lm = _Landmark()
+            lm.x, lm.y, lm.z = float(x), float(y), float(z)
+            face.landmark.append(lm)
+        return face, "python objects (protobuf not installed)"
+
+    face = landmark_list_class()
+    for x, y, z in coords:
+        face.landmark.add(x=float(x), y=float(y), z=float(z))
+    return face, "protobuf NormalizedLandmarkList"
+
+
+def _attribute_path(face_landmarks, roi, img_w: int, img_h: int):
+    """
+    Baseline: what a FaceMesh keyframe cost before, reading and writing
+    protobuf attributes (crop remap, face box, then the features)
+    """
+    x0, y0, x1, y1 = roi
+    rw, rh = x1 - x0, y1 - y0
+    lm = face_landmarks.landmark
+    for point in lm:
+        point.x = x0 + point.x * rw
+        point.y = y0 + point.y * rh
+        point.z = point.z * rw
+    xs = [point.x for point in lm]
+    ys = [point.y for point in lm]
+    box = (min(xs), min(ys), max(xs), max(ys))
+
+    gaze = []
+    for inner_idx, outer_idx, iris_idx in GAZE_INDEX.tolist():
+        inner, outer, iris = lm[inner_idx], lm[outer_idx], lm[iris_idx]
+        width = math.hypot((inner.x - outer.x) * img_w, (inner.y - outer.y) * img_h)
+        center_x = (inner.x + outer.x) / 2 * img_w
+        center_y = (inner.y + outer.y) / 2 * img_h
+        gaze.append(((iris.x * img_w - center_x) / width * 100,
+                     (iris.y * img_h - center_y) / width * 100) if width > 0 else (0.0, 0.0))
+    gaze_x = (gaze[0][0] + gaze[1][0]) / 2
+    gaze_y = (gaze[0][1] + gaze[1][1]) / 2
+
+    ears = []
+    for indices in (LEFT_EYE_LANDMARKS, RIGHT_EYE_LANDMARKS):
+        eye = np.array([[lm[idx].x * img_w, lm[idx].y * img_h] for idx in indices])
+        v1 = np.linalg.norm(eye[1] - eye[5])
+        v2 = np.linalg.norm(eye[2] - eye[4])
+        h = np.linalg.norm(eye[0] - eye[3])
+        ears.append(0.0 if h < 1e-6 else (v1 + v2) / (2.0 * h))
+
+    image_points = np.array([(lm[idx].x * img_w, lm[idx].y * img_h) for idx in HEAD_POSE_LANDMARKS],
+                            dtype=np.float64)
+    return box, (gaze_x, gaze_y), tuple(ears), image_points
+
+
+def _array_path(face_landmarks, roi, img_w: int, img_h: int, image_points: np.ndarray):
+    """The same keyframe work on one converted array"""
+    points = remap_points(landmarks_to_array(face_landmarks), roi)
+    box = face_box(points)
+    gaze = detect_gaze_direction(points, img_w, img_h)
+    ears = eye_aspect_ratios(points, img_w, img_h)
+    return box, gaze, ears, head_pose_image_points(points, img_w, img_h, image_points)
+
+
+def _time_per_call(fn: Callable[[], object], frames: int) -> float:
+    start = time.perf_counter()
+    for _ in range(frames):
+        fn()
+    return (time.perf_counter() - start) / frames
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Per-frame cost of landmark feature extraction")
+    parser.add_argument("--frames", type=int, default=2000)
+    parser.add_argument("--width", type=int, default=360)
+    parser.add_argument("--height", type=int, default=270)
+    args = parser.parse_args(argv)
+
+    w, h = args.width, args.height
+    roi = (0.0, 0.0, 1.0, 1.0)  # Identity crop: the remap leaves values unchanged
+    image_points = np.empty((len(HEAD_POSE_LANDMARKS), 2), dtype=np.float64)
+
+    face, kind = _synthetic_face(np.random.default_rng(0))
+    attribute_s = _time_per_call(lambda: _attribute_path(face, roi, w, h), args.frames)
+    array_s = _time_per_call(lambda: _array_path(face, roi, w, h, image_points), args.frames)
+    convert_s = _time_per_call(lambda: landmarks_to_array(face), args.frames)
+
+    print(f"landmarks: {len(face.landmark)} as {kind}, {args.frames} keyframes")
+    print(f"per-landmark attributes: {attribute_s * 1e6:8.1f} µs/frame")
+    print(f"landmark array:          {array_s * 1e6:8.1f} µs/frame (conversion {convert_s * 1e6:.1f} µs)")
+    print(f"saving: {(attribute_s - array_s) * 1e6:.1f} µs/frame ({attribute_s / array_s:.2f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+# utils/proctoring/frame_ring.py
+
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+class SharedFrameRing:
+    """
+    Fixed number of equally sized frame slots in one shared memory block.
+
+    The owning process copies a decoded frame into a free slot and hands the
+    slot index plus the frame shape to a worker; the worker maps the same
+    bytes as an ndarray view, so frames never get pickled.
+    """
+
+    def __init__(self, slot_count: int, slot_size: int, name: Optional[str] = None):
+        self.slot_count = slot_count
+        self.slot_size = slot_size
+        self.owner = name is None
+
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=slot_count * slot_size)
+        else:
+            self.shm = _attach(name)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def _slot_array(self, slot: int, shape: Tuple[int, ...]) -> np.ndarray:
+        if not 0 <= slot < self.slot_count:
+            raise IndexError(f"Slot {slot} out of range (0-{self.slot_count - 1})")
+        return np.ndarray(shape, dtype=np.uint8, buffer=self.shm.buf, offset=slot * self.slot_size)
+
+    def fits(self, frame: np.ndarray) -> bool:
+        return frame.dtype == np.uint8 and frame.nbytes <= self.slot_size
+
+    def write(self, slot: int, frame: np.ndarray) -> Tuple[int, ...]:
+        """Copy a uint8 frame into a slot and return the shape needed to read it back"""
+        if not self.fits(frame):
+            raise ValueError(f"Frame of {frame.nbytes} bytes does not fit a {self.slot_size} byte slot")
+        np.copyto(self._slot_array(slot, frame.shape), frame)
+        return frame.shape
+
+    def view(self, slot: int, shape: Tuple[int, ...]) -> np.ndarray:
+        """Zero-copy view of a slot; only valid until the slot is reused"""
+        return self._slot_array(slot, shape)
+
+    def close(self):
+        try:
+            self.shm.close()
+        except BufferError:
+            # A view into the block is still alive; the OS releases the
+            # mapping when the process exits.
+            pass
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    # Python 3.13+ lets readers opt out of the resource tracker, otherwise a
+    # worker exiting would try to unlink memory the parent still owns.
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
@@ -0,0 +1,172 @@
+# utils/proctoring/graph_pool.py
+"""
+Per-session leases of stateful model graphs.
+
+MediaPipe graphs in video mode (static_image_mode=False) track from one
+process() call to the next. Shared between sessions, every frame of another
+client breaks that tracking (a full re-detection each time) and landmarks
+of one client can leak into the next one's result. GraphPool leases one
+graph set to each session for as long as it keeps sending frames:
+
+- acquire(session, kind) returns the session's own set, creating one (or
+  reusing a released one of the same kind) on first use
+- release(session) resets the set and keeps it for the next session
+- sessions idle for `idle_seconds` lose their lease (reclaimed lazily)
+- at `max_graphs` the least recently used lease is taken over
+
+`kind` distinguishes graph configurations (e.g. iris refinement on/off);
+only sets of the same kind are reused across sessions.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _Lease:
+    __slots__ = ("kind", "graphs", "last_used")
+
+    def __init__(self, kind: Hashable, graphs: Any, last_used: float):
+        self.kind = kind
+        self.graphs = graphs
+        self.last_used = last_used
+
+
+def _reset(graphs: Any) -> bool:
+    """Clear the tracking state of a graph set; False when it cannot be reset"""
+    reset = getattr(graphs, "reset", None)
+    if reset is None:
+        return False
+    try:
+        reset()
+        return True
+    except Exception as e:
+        logger.warning(f"⚠️  Graph reset failed, discarding graphs: {e}")
+        return False
+
+
+def _close(graphs: Any):
+    close = getattr(graphs, "close", None)
+    if close is not None:
+        try:
+            close()
+        except Exception as e:
+            logger.warning(f"⚠️  Closing graphs failed: {e}")
+
+
+class GraphPool:
+    """
+    Graph sets leased to sessions, created by `factory(kind)`. Sets should
+    provide reset() (clear tracking state) and close(); a set that cannot be
+    reset is closed instead of reused.
+    """
+
+    def __init__(self, factory: Callable[[Hashable], Any], max_graphs: int = 8,
+                 idle_seconds: float = 60.0):
+        self.factory = factory
+        self.max_graphs = max(1, max_graphs)
+        self.idle_seconds = idle_seconds
+        self._leases: "OrderedDict[str, _Lease]" = OrderedDict()  # Least recently used first
+        self._free: Dict[Hashable, List[Any]] = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reclaimed = 0
+        self.evicted = 0
+
+    @property
+    def size(self) -> int:
+        return len(self._leases) + sum(len(free) for free in self._free.values())
+
+    def prewarm(self, kind: Hashable, count: int = 1):
+        """Create free sets ahead of the first sessions"""
+        with self._lock:
+            while len(self._free.get(kind, ())) < count and self.size < self.max_graphs:
+                self._free.setdefault(kind, []).append(self._create(kind))
+
+    def _create(self, kind: Hashable) -> Any:
+        self.created += 1
+        return self.factory(kind)
+
+    def _recycle(self, kind: Hashable, graphs: Any):
+        if _reset(graphs):
+            self._free.setdefault(kind, []).append(graphs)
+        else:
+            _close(graphs)
+
+    def _reclaim_idle(self, now: float):
+        while self._leases:
+            session_id, lease = next(iter(self._leases.items()))
+            if now - lease.last_used < self.idle_seconds:
+                break
+            del self._leases[session_id]
+            self._recycle(lease.kind, lease.graphs)
+            self.reclaimed += 1
+
+    def _take(self, kind: Hashable) -> Any:
+        free = self._free.get(kind)
+        if free:
+            return free.pop()
+        if self.size < self.max_graphs:
+            return self._create(kind)
+        for other_kind, other_free in self._free.items():
+            if other_free:
+                _close(other_free.pop())
+                return self._create(kind)
+
+        # Full with active sessions: take over the least recently used lease
+        session_id, lease = self._leases.popitem(last=False)
+        self.evicted += 1
+        logger.warning(f"⚠️  Graph pool full ({self.max_graphs}), taking over the graphs of session {session_id}")
+        if lease.kind == kind and _reset(lease.graphs):
+            return lease.graphs
+        _close(lease.graphs)
+        return self._create(kind)
+
+    def acquire(self, session_id: str, kind: Hashable, now: Optional[float] = None) -> Any:
+        """The session's graph set (leased on first use, kept while it is in use)"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            lease = self._leases.get(session_id)
+            if lease is not None and lease.kind == kind:
+                lease.last_used = now
+                self._leases.move_to_end(session_id)
+                return lease.graphs
+            if lease is not None:
+                del self._leases[session_id]
+                self._recycle(lease.kind, lease.graphs)
+
+            self._reclaim_idle(now)
+            graphs = self._take(kind)
+            self._leases[session_id] = _Lease(kind, graphs, now)
+            return graphs
+
+    def release(self, session_id: str):
+        """Return a session's graphs to the pool (reset for the next session)"""
+        with self._lock:
+            lease = self._leases.pop(session_id, None)
+            if lease is not None:
+                self._recycle(lease.kind, lease.graphs)
+
+    def close(self):
+        with self._lock:
+            for lease in self._leases.values():
+                _close(lease.graphs)
+            for free in self._free.values():
+                for graphs in free:
+                    _close(graphs)
+            self._leases.clear()
+            self._free.clear()
+
+    def stats(self) -> Dict:
+        return {
+            "leased": len(self._leases),
+            "free": sum(len(free) for free in self._free.values()),
+            "max_graphs": self.max_graphs,
+            "created": self.created,
+            "reclaimed": self.reclaimed,
+            "evicted": self.evicted,
+        }
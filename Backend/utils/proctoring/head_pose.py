@@ -0,0 +1,216 @@
+# utils/proctoring/head_pose.py
+"""
+Per-session head-pose estimation.
+
+calculate_head_pose() solves PnP from scratch every frame and gets Euler
+angles through decomposeProjectionMatrix. A face moves little between
+analyzed frames, so HeadPoseEstimator starts the iterative solver from the
+previous frame's rvec/tvec (useExtrinsicGuess) and reads the angles from
+the rotation matrix in closed form (the same convention as
+decomposeProjectionMatrix). When a MediaPipe facial transformation matrix
+is available (Tasks FaceLandmarker with output_facial_transformation_matrixes)
+the rotation comes straight from it and no PnP runs at all.
+
+Run as a module to time both against calculate_head_pose on a synthetic
+head trajectory (tests/test_head_pose.py checks that the angles agree):
+
+    python -m utils.proctoring.head_pose --frames 2000
+"""
+
+import argparse
+import math
+import sys
+import time
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from utils.proctoring.face_features import (
+    DIST_COEFFS, HEAD_MODEL_POINTS, HEAD_POSE_INDEX, calculate_head_pose, camera_matrix_for,
+    head_pose_image_points,
+)
+
+# MediaPipe's transformation matrix maps the canonical face into an OpenGL
+# style camera space (y up, z towards the viewer); PnP works in OpenCV's
+# (y down, z forward)
+_GL_TO_CV = np.diag([1.0, -1.0, -1.0])
+
+
+def rotation_to_euler(rotation: np.ndarray) -> Tuple[float, float, float]:
+    """(pitch, yaw, roll) in degrees, as decomposeProjectionMatrix reports them"""
+    pitch = math.degrees(math.atan2(rotation[2, 1], rotation[2, 2]))
+    yaw = math.degrees(math.atan2(-rotation[2, 0], math.hypot(rotation[2, 1], rotation[2, 2])))
+    roll = math.degrees(math.atan2(rotation[1, 0], rotation[0, 0]))
+    return pitch, yaw, roll
+
+
+def euler_from_transformation_matrix(matrix) -> Tuple[float, float, float]:
+    """(pitch, yaw, roll) from a MediaPipe 4x4 facial transformation matrix"""
+    rotation = _GL_TO_CV @ np.asarray(matrix, dtype=np.float64).reshape(4, 4)[:3, :3]
+    return rotation_to_euler(rotation)
+
+
+class HeadPoseEstimator:
+    """
+    Warm-started head pose for one session.
+
+    Each solve starts from the previous rvec/tvec. The guess is dropped (cold
+    solve) when the resolution changes, after `refresh_interval` warm solves
+    so a wrong local minimum cannot persist, and when a warm solve fails or
+    puts the head behind the camera. A cold solve that lands behind the
+    camera (the mirrored minimum calculate_head_pose sometimes returns) is
+    reported but never kept as a guess. Call reset() when the face is lost.
+    """
+
+    def __init__(self, refresh_interval: int = 30):
+        self.refresh_interval = refresh_interval
+        self._image_points = np.empty((len(HEAD_POSE_INDEX), 2), dtype=np.float64)
+        self._rvec: Optional[np.ndarray] = None
+        self._tvec: Optional[np.ndarray] = None
+        self._size: Optional[Tuple[int, int]] = None
+        self._warm_streak = 0
+        self.warm_solves = 0
+        self.cold_solves = 0
+        self.matrix_solves = 0
+
+    def reset(self):
+        self._rvec = None
+        self._tvec = None
+        self._warm_streak = 0
+
+    def _solve(self, image_points: np.ndarray, camera_matrix: np.ndarray, warm: bool):
+        if warm:
+            return cv2.solvePnP(HEAD_MODEL_POINTS, image_points, camera_matrix, DIST_COEFFS,
+                                self._rvec, self._tvec, useExtrinsicGuess=True,
+                                flags=cv2.SOLVEPNP_ITERATIVE)
+        return cv2.solvePnP(HEAD_MODEL_POINTS, image_points, camera_matrix, DIST_COEFFS,
+                            flags=cv2.SOLVEPNP_ITERATIVE)
+
+    def estimate(self, points: np.ndarray, img_w: int, img_h: int,
+                 transformation_matrix=None) -> Tuple[float, float, float]:
+        """
+        (pitch, yaw, roll) in degrees for an (N, 3) landmark array, like
+        calculate_head_pose. With a facial transformation matrix the angles
+        come from it directly.
+        """
+        if transformation_matrix is not None:
+            self.matrix_solves += 1
+            return euler_from_transformation_matrix(transformation_matrix)
+
+        image_points = head_pose_image_points(points, img_w, img_h, self._image_points)
+        camera_matrix = camera_matrix_for(img_w, img_h)
+        if self._size != (img_w, img_h):
+            self._size = (img_w, img_h)
+            self.reset()
+
+        warm = self._rvec is not None and self._warm_streak < self.refresh_interval
+        success, rvec, tvec = self._solve(image_points, camera_matrix, warm)
+        if warm and not (success and tvec[2, 0] > 0):
+            warm = False
+            success, rvec, tvec = self._solve(image_points, camera_matrix, warm)
+
+        if not success:
+            self.reset()
+            return 0.0, 0.0, 0.0
+
+        if warm:
+            self.warm_solves += 1
+            self._warm_streak += 1
+        else:
+            self.cold_solves += 1
+            self._warm_streak = 0
+        if tvec[2, 0] > 0:
+            self._rvec, self._tvec = rvec, tvec
+        else:
+            self.reset()
+
+        rotation, _ = cv2.Rodrigues(rvec)
+        return rotation_to_euler(rotation)
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def _synthetic_trajectory(frames: int, img_w: int, img_h: int, noise: float,
+                          rng: np.random.Generator) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+    """Landmark arrays of a head slowly turning in front of the camera, plus its true rotations"""
+    camera_matrix = camera_matrix_for(img_w, img_h)
+    faces, rotations = [], []
+    for i in range(frames):
+        t = i / 30.0
+        # Facing the camera: the model is y-up, so the base pose is a half
+        # turn about x, plus a few degrees of nodding, turning and tilting
+        angles = np.radians([180 + 12 * math.sin(0.7 * t), 20 * math.sin(0.45 * t), 6 * math.sin(0.3 * t)])
+        rotation = cv2.Rodrigues(np.array([angles[0], 0.0, 0.0]))[0]
+        rotation = cv2.Rodrigues(np.array([0.0, angles[1], 0.0]))[0] @ rotation
+        rotation = cv2.Rodrigues(np.array([0.0, 0.0, angles[2]]))[0] @ rotation
+        rvec = cv2.Rodrigues(rotation)[0]
+        tvec = np.array([[30 * math.sin(0.2 * t)], [10.0], [2500.0]])
+        projected, _ = cv2.projectPoints(HEAD_MODEL_POINTS, rvec, tvec, camera_matrix, DIST_COEFFS)
+        projected = projected.reshape(-1, 2) + rng.normal(0, noise, (len(HEAD_POSE_INDEX), 2))
+
+        points = np.zeros((478, 3), dtype=np.float32)
+        points[HEAD_POSE_INDEX, :2] = projected / (img_w, img_h)
+        faces.append(points)
+        rotations.append(rotation)
+    return faces, rotations
+
+
+_MIRROR_THRESHOLD = 30.0  # degrees from the true pose
+
+
+def _angle_error(a, b) -> float:
+    """Largest difference between two angle triples, modulo 360"""
+    return max(abs((x - y + 180) % 360 - 180) for x, y in zip(a, b))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Warm-started head pose vs calculate_head_pose")
+    parser.add_argument("--frames", type=int, default=2000)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--noise", type=float, default=0.5, help="landmark noise in pixels")
+    args = parser.parse_args(argv)
+
+    w, h = args.width, args.height
+    faces, rotations = _synthetic_trajectory(args.frames, w, h, args.noise, np.random.default_rng(0))
+
+    start = time.perf_counter()
+    reference = [calculate_head_pose(points, w, h) for points in faces]
+    reference_s = (time.perf_counter() - start) / args.frames
+
+    estimator = HeadPoseEstimator()
+    start = time.perf_counter()
+    warm = [estimator.estimate(points, w, h) for points in faces]
+    warm_s = (time.perf_counter() - start) / args.frames
+
+    matrices = [np.block([[_GL_TO_CV @ rotation, np.zeros((3, 1))], [np.zeros((1, 3)), np.ones((1, 1))]])
+                for rotation in rotations]
+    matrix_estimator = HeadPoseEstimator()
+    start = time.perf_counter()
+    from_matrix = [matrix_estimator.estimate(None, w, h, matrix) for matrix in matrices]
+    matrix_s = (time.perf_counter() - start) / args.frames
+
+    # A cold solve occasionally lands on the mirrored pose behind the camera;
+    # compare only frames where the reference found the true head
+    truth = [rotation_to_euler(rotation) for rotation in rotations]
+    valid = [i for i, angles in enumerate(reference) if _angle_error(angles, truth[i]) < _MIRROR_THRESHOLD]
+    warm_error = max(_angle_error(reference[i], warm[i]) for i in valid)
+    warm_mirrored = sum(_angle_error(a, b) >= _MIRROR_THRESHOLD for a, b in zip(warm, truth))
+    matrix_error = max(_angle_error(reference[i], from_matrix[i]) for i in valid)
+
+    print(f"{args.frames} frames at {w}x{h}, {args.noise}px landmark noise")
+    print(f"calculate_head_pose: {reference_s * 1e6:7.1f} µs/frame, "
+          f"{args.frames - len(valid)} frames on the mirrored pose")
+    print(f"warm-started:        {warm_s * 1e6:7.1f} µs/frame ({reference_s / warm_s:.1f}x), "
+          f"max difference {warm_error:.4f}°, {warm_mirrored} frames on the mirrored pose "
+          f"({estimator.cold_solves} cold solves)")
+    print(f"transformation matrix: {matrix_s * 1e6:5.1f} µs/frame ({reference_s / matrix_s:.0f}x), "
+          f"max difference to PnP {matrix_error:.2f}° (landmark noise only)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
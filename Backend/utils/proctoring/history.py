@@ -0,0 +1,153 @@
+# utils/proctoring/history.py
+"""
+Fixed-size per-session history: NumPy rings instead of deques of objects.
+
+RingSeries keeps the last N values of a scalar (gaze, EAR, fps) with an
+O(1) running mean. AlertWindow keeps alert timestamps in one ring per alert
+type and answers "how many alerts of this type in the last T seconds" by
+walking back from the newest entry, stopping as soon as the answer is
+known, so the cost is bounded by the count asked for. Its semantics are
+those of the former deque of {'type', 'timestamp'} dicts (maxlen 15,
+pruned of entries older than max_age), without rebuilding anything per
+frame. tests/test_history.py replays random alert streams through both.
+"""
+
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+
+class RingSeries:
+    """Last `capacity` values of a scalar series"""
+
+    def __init__(self, capacity: int = 30, dtype=np.float32):
+        self._data = np.zeros(capacity, dtype=dtype)
+        self._head = 0  # Next write position
+        self._count = 0
+        self._sum = 0.0
+
+    def append(self, value: float):
+        capacity = len(self._data)
+        if self._count == capacity:
+            self._sum -= float(self._data[self._head])
+        else:
+            self._count += 1
+        self._data[self._head] = value
+        self._sum += float(self._data[self._head])
+        self._head = (self._head + 1) % capacity
+        if self._head == 0:
+            # Drop accumulated rounding once per lap
+            self._sum = float(self._data[:self._count].sum(dtype=np.float64))
+
+    def __len__(self) -> int:
+        return self._count
+
+    def mean(self) -> float:
+        return self._sum / self._count if self._count else 0.0
+
+    def values(self) -> np.ndarray:
+        """Oldest first (a copy)"""
+        if self._count < len(self._data):
+            return self._data[:self._count].copy()
+        return np.roll(self._data, -self._head)
+
+    def last(self, default: float = 0.0) -> float:
+        return float(self._data[self._head - 1]) if self._count else default
+
+    @property
+    def nbytes(self) -> int:
+        return self._data.nbytes
+
+
+class _TimestampRing:
+    """Timestamps and global sequence numbers of one alert type, oldest first"""
+
+    __slots__ = ("times", "seqs", "head", "count")
+
+    def __init__(self, capacity: int):
+        self.times = np.zeros(capacity, dtype=np.float64)
+        self.seqs = np.zeros(capacity, dtype=np.int64)
+        self.head = 0
+        self.count = 0
+
+    def push(self, timestamp: float, seq: int):
+        self.times[self.head] = timestamp
+        self.seqs[self.head] = seq
+        self.head = (self.head + 1) % len(self.times)
+        self.count = min(self.count + 1, len(self.times))
+
+    def count_since(self, min_time: float, min_seq: int, limit: int) -> int:
+        """Newest-first count of entries with time >= min_time and seq >= min_seq, up to `limit`"""
+        capacity = len(self.times)
+        found = 0
+        pos = self.head
+        for _ in range(self.count):
+            pos = (pos - 1) % capacity
+            if self.times[pos] < min_time or self.seqs[pos] < min_seq:
+                break
+            found += 1
+            if found >= limit:
+                break
+        return found
+
+
+class AlertWindow:
+    """
+    Recent alerts of a session for temporal smoothing.
+
+    Only the latest `max_alerts` alerts (of any type) count, and prune()
+    forgets those older than its max_age, exactly like a deque(maxlen=
+    max_alerts) that is filtered by age; both are tracked with a global
+    sequence number and a cutoff time instead of removing anything.
+    """
+
+    def __init__(self, max_alerts: int = 15):
+        self.max_alerts = max_alerts
+        self._all = _TimestampRing(max_alerts)
+        self._by_type: Dict[str, _TimestampRing] = {}
+        self._seq = 0  # Number of alerts ever added
+        self._cutoff = float("-inf")  # Alerts before this were pruned
+
+    def add(self, alert_type: str, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        ring = self._by_type.get(alert_type)
+        if ring is None:
+            ring = self._by_type[alert_type] = _TimestampRing(self.max_alerts)
+        ring.push(now, self._seq)
+        self._all.push(now, self._seq)
+        self._seq += 1
+
+    def prune(self, max_age: float, now: Optional[float] = None):
+        """Forget alerts older than max_age seconds"""
+        now = time.monotonic() if now is None else now
+        self._cutoff = max(self._cutoff, now - max_age)
+
+    def _window_start(self, time_window: float, now: float) -> float:
+        return max(self._cutoff, now - time_window)
+
+    def __len__(self) -> int:
+        return self._all.count_since(self._cutoff, self._seq - self.max_alerts, self.max_alerts)
+
+    def count(self, alert_type: str, time_window: float, now: Optional[float] = None,
+              limit: Optional[int] = None) -> int:
+        """Alerts of `alert_type` in the last `time_window` seconds (stops at `limit`)"""
+        ring = self._by_type.get(alert_type)
+        if ring is None:
+            return 0
+        now = time.monotonic() if now is None else now
+        return ring.count_since(self._window_start(time_window, now), self._seq - self.max_alerts,
+                                limit or self.max_alerts)
+
+    def should_trigger(self, alert_type: str, required_count: int = 3, time_window: float = 1.0,
+                       now: Optional[float] = None) -> bool:
+        """At least `required_count` alerts of `alert_type` in the last `time_window` seconds"""
+        now = time.monotonic() if now is None else now
+        if self._all.count_since(self._cutoff, self._seq - self.max_alerts, required_count) < required_count:
+            return False
+        return self.count(alert_type, time_window, now, limit=required_count) >= required_count
+
+    @property
+    def nbytes(self) -> int:
+        rings = [self._all, *self._by_type.values()]
+        return sum(ring.times.nbytes + ring.seqs.nbytes for ring in rings)
@@ -0,0 +1,311 @@
+# utils/proctoring/inference_pool.py
+
+import asyncio
+import importlib
+import itertools
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from utils.proctoring.frame_ring import SharedFrameRing
+from utils.proctoring.shared_detector import SharedDetector, SharedDetectorClient
+
+logger = logging.getLogger(__name__)
+
+# Large enough for a 1080p BGR frame
+DEFAULT_SLOT_SIZE = 1920 * 1080 * 3
+
+
+class _Worker:
+    """Parent-side bookkeeping for one inference process"""
+
+    def __init__(self, index: int, ring: SharedFrameRing):
+        self.index = index
+        self.ring = ring
+        self.process = None
+        self.tasks = None
+        self.free_slots: List[int] = list(range(ring.slot_count))
+        self.slot_available = asyncio.Semaphore(ring.slot_count)
+        # task id -> (future, frame slot or None for calls)
+        self.pending: Dict[int, Tuple[asyncio.Future, Optional[int]]] = {}
+        self.sessions: Set[str] = set()
+
+
+class InferencePool:
+    """
+    Pool of inference processes fed through shared memory frame rings.
+
+    Each worker imports `handler_module` and owns its own model instances.
+    The handler module must provide:
+    - init_inference_worker(index, num_workers): load models once per process
+    - analyze_frame(frame, client_id, **options) -> dict: synchronous pipeline
+    - release_client(client_id): drop per-session state
+
+    call(name) runs any other argument-less handler function (e.g. stats)
+    in every worker and gathers the results.
+
+    With `detector_slot_size`, device detection runs in one shared detector
+    process for all workers (see shared_detector.py): the handler must also
+    provide init_device_detector(), and each worker's
+    init_inference_worker(index, num_workers, device_detector=client) gets
+    its SharedDetectorClient.
+
+    Sessions are pinned to one worker for their whole lifetime so per-client
+    temporal state (FrameBuffer, tracking) stays in a single process.
+    Results travel back over a multiprocessing queue and resolve asyncio
+    futures on the event loop that submitted them.
+    """
+
+    def __init__(self, handler_module: str, num_workers: int,
+                 slots_per_worker: int = 4, slot_size: int = DEFAULT_SLOT_SIZE,
+                 detector_slot_size: int = 0, detector_slots_per_worker: int = 16):
+        self.handler_module = handler_module
+        self.num_workers = num_workers
+        self.slots_per_worker = slots_per_worker
+        self.slot_size = slot_size
+        self.detector_slot_size = detector_slot_size
+        self.detector_slots_per_worker = detector_slots_per_worker
+        self._detector: Optional[SharedDetector] = None
+
+        self._ctx = multiprocessing.get_context("spawn")
+        self._workers: List[_Worker] = []
+        self._assignments: Dict[str, int] = {}
+        self._task_ids = itertools.count()
+        self._results = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reader: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers) and not self._stopping.is_set()
+
+    def start(self):
+        """Spawn the workers; must be called from the serving event loop"""
+        self._loop = asyncio.get_running_loop()
+        self._results = self._ctx.Queue()
+        self._stopping.clear()
+
+        if self.detector_slot_size:
+            self._detector = SharedDetector(self._ctx, self.handler_module, self.num_workers,
+                                            self.detector_slots_per_worker, self.detector_slot_size)
+            self._detector.start()
+
+        for index in range(self.num_workers):
+            ring = SharedFrameRing(self.slots_per_worker, self.slot_size)
+            worker = _Worker(index, ring)
+            self._workers.append(worker)
+            self._spawn(worker)
+
+        self._reader = threading.Thread(target=self._read_results, name="inference-results", daemon=True)
+        self._reader.start()
+        logger.info(f"Inference pool started: {self.num_workers} workers x {self.slots_per_worker} slots"
+                    + (", shared device detector" if self._detector else ""))
+
+    def _spawn(self, worker: _Worker):
+        worker.tasks = self._ctx.Queue()
+        worker.process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker.index, self.num_workers, self.handler_module, worker.ring.name,
+                  worker.ring.slot_count, worker.ring.slot_size, worker.tasks, self._results,
+                  self._detector.channel(worker.index) if self._detector else None),
+            name=f"proctor-inference-{worker.index}",
+            daemon=True,
+        )
+        worker.process.start()
+
+    def _worker_for(self, client_id: str) -> _Worker:
+        index = self._assignments.get(client_id)
+        if index is None:
+            index = min(self._workers, key=lambda w: len(w.sessions)).index
+            self._assignments[client_id] = index
+            self._workers[index].sessions.add(client_id)
+        return self._workers[index]
+
+    async def submit(self, client_id: str, frame: np.ndarray, **options: Any) -> Dict:
+        """Run the handler's analyze_frame for this client in its worker"""
+        if not self.running:
+            raise RuntimeError("Inference pool is not running")
+
+        worker = self._worker_for(client_id)
+        if not worker.ring.fits(frame):
+            raise ValueError(f"Frame too large for inference pool ({frame.nbytes} bytes)")
+
+        await worker.slot_available.acquire()
+        slot = worker.free_slots.pop()
+        try:
+            shape = worker.ring.write(slot, frame)
+        except Exception:
+            worker.free_slots.append(slot)
+            worker.slot_available.release()
+            raise
+
+        task_id = next(self._task_ids)
+        future = self._loop.create_future()
+        worker.pending[task_id] = (future, slot)
+        worker.tasks.put(("frame", task_id, client_id, slot, shape, options))
+        return await future
+
+    def load(self, client_id: str) -> float:
+        """Fraction of busy frame slots on the session's worker (0 when not assigned)"""
+        index = self._assignments.get(client_id)
+        if index is None:
+            return 0.0
+        worker = self._workers[index]
+        return 1.0 - len(worker.free_slots) / worker.ring.slot_count
+
+    async def call(self, function: str, timeout: float = 5.0) -> List[Any]:
+        """Results of the handler's `function()` in every worker (exceptions for failed workers)"""
+        if not self.running:
+            raise RuntimeError("Inference pool is not running")
+        futures = []
+        for worker in self._workers:
+            task_id = next(self._task_ids)
+            future = self._loop.create_future()
+            worker.pending[task_id] = (future, None)
+            worker.tasks.put(("call", task_id, function))
+            futures.append(asyncio.wait_for(future, timeout))
+        return await asyncio.gather(*futures, return_exceptions=True)
+
+    def release(self, client_id: str):
+        """Forget a session and let its worker drop the per-client state"""
+        index = self._assignments.pop(client_id, None)
+        if index is None:
+            return
+        worker = self._workers[index]
+        worker.sessions.discard(client_id)
+        if worker.tasks is not None:
+            worker.tasks.put(("release", client_id))
+
+    def _read_results(self):
+        last_health_check = time.monotonic()
+        while not self._stopping.is_set():
+            try:
+                message = self._results.get(timeout=0.5)
+                self._loop.call_soon_threadsafe(self._complete, *message)
+            except queue.Empty:
+                pass
+            except (EOFError, OSError):
+                break
+
+            if time.monotonic() - last_health_check >= 0.5:
+                last_health_check = time.monotonic()
+                for worker in self._workers:
+                    if worker.process is not None and not worker.process.is_alive():
+                        self._loop.call_soon_threadsafe(self._restart, worker.index)
+                if self._detector is not None and not self._detector.alive:
+                    self._loop.call_soon_threadsafe(self._restart_detector)
+
+    def _free_slot(self, worker: _Worker, slot: Optional[int]):
+        if slot is None:
+            return
+        worker.free_slots.append(slot)
+        worker.slot_available.release()
+
+    def _complete(self, worker_index: int, task_id: int, ok: bool, payload: Any):
+        if worker_index >= len(self._workers):
+            return  # pool already stopped
+        worker = self._workers[worker_index]
+        entry = worker.pending.pop(task_id, None)
+        if entry is None:
+            return
+        future, slot = entry
+        self._free_slot(worker, slot)
+        if future.done():
+            return  # caller went away (disconnect / cancellation)
+        if ok:
+            future.set_result(payload)
+        else:
+            future.set_exception(RuntimeError(payload))
+
+    def _restart(self, worker_index: int):
+        if self._stopping.is_set() or worker_index >= len(self._workers):
+            return
+        worker = self._workers[worker_index]
+        if worker.process is None or worker.process.is_alive():
+            return
+
+        logger.error(f"Inference worker {worker_index} exited with code {worker.process.exitcode}; restarting")
+        for future, slot in worker.pending.values():
+            self._free_slot(worker, slot)
+            if not future.done():
+                future.set_exception(RuntimeError("Inference worker crashed"))
+        worker.pending.clear()
+        # Sessions keep their assignment but restart from fresh state
+        self._spawn(worker)
+
+    def _restart_detector(self):
+        if not self._stopping.is_set() and self._detector is not None:
+            # Requests in flight expire in the workers (SharedDetectorClient.timeout)
+            self._detector.restart_if_dead()
+
+    def stop(self, timeout: float = 5.0):
+        self._stopping.set()
+        for worker in self._workers:
+            if worker.tasks is not None:
+                worker.tasks.put(None)
+        for worker in self._workers:
+            if worker.process is not None:
+                worker.process.join(timeout)
+                if worker.process.is_alive():
+                    worker.process.terminate()
+            for future, _ in worker.pending.values():
+                if not future.done():
+                    future.set_exception(RuntimeError("Inference pool stopped"))
+            worker.pending.clear()
+            worker.ring.close()
+        if self._reader is not None:
+            self._reader.join(timeout)
+        if self._detector is not None:
+            self._detector.stop(timeout)
+            self._detector = None
+        self._workers.clear()
+        self._assignments.clear()
+        logger.info("Inference pool stopped")
+
+
+def _worker_main(index: int, num_workers: int, handler_module: str, ring_name: str,
+                 slot_count: int, slot_size: int, tasks, results, detector_channel: Optional[Tuple] = None):
+    handler = importlib.import_module(handler_module)
+    ring = SharedFrameRing(slot_count, slot_size, name=ring_name)
+    if detector_channel is not None:
+        handler.init_inference_worker(index, num_workers, device_detector=SharedDetectorClient(*detector_channel))
+    else:
+        handler.init_inference_worker(index, num_workers)
+
+    try:
+        while True:
+            message = tasks.get()
+            if message is None:
+                break
+
+            if message[0] == "release":
+                handler.release_client(message[1])
+                continue
+
+            if message[0] == "call":
+                _, task_id, function = message
+                try:
+                    results.put((index, task_id, True, getattr(handler, function)()))
+                except Exception as e:
+                    results.put((index, task_id, False, f"{type(e).__name__}: {e}"))
+                continue
+
+            _, task_id, client_id, slot, shape, options = message
+            frame = ring.view(slot, shape)
+            try:
+                result = handler.analyze_frame(frame, client_id, **options)
+                results.put((index, task_id, True, result))
+            except Exception as e:
+                results.put((index, task_id, False, f"{type(e).__name__}: {e}"))
+            finally:
+                del frame
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ring.close()
@@ -0,0 +1,54 @@
+# utils/proctoring/ingest.py
+
+import asyncio
+from typing import Any, Optional
+
+
+class PendingFrame:
+    """A received, still-encoded frame waiting for the processor task"""
+
+    __slots__ = ("payload", "frame_number", "received_at")
+
+    def __init__(self, payload: Any, frame_number: int, received_at: float):
+        self.payload = payload
+        self.frame_number = frame_number
+        self.received_at = received_at  # time.perf_counter() at receipt
+
+
+class LatestFrameSlot:
+    """
+    Bounded size-1 mailbox between a connection's receiver and processor.
+
+    put() never waits: a frame that has not been taken yet is replaced and
+    counted as dropped, so the processor always works on the newest frame
+    and a slow pipeline sheds load instead of building up latency.
+    """
+
+    def __init__(self):
+        self._item: Optional[PendingFrame] = None
+        self._ready = asyncio.Event()
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, item: PendingFrame) -> bool:
+        """Store the newest frame; returns True if a stale frame was replaced"""
+        replaced = self._item is not None
+        if replaced:
+            self.dropped += 1
+        self._item = item
+        self._ready.set()
+        return replaced
+
+    async def get(self) -> Optional[PendingFrame]:
+        """Wait for the next frame; returns None once the slot is closed"""
+        while self._item is None:
+            if self._closed:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+        item, self._item = self._item, None
+        return item
+
+    def close(self):
+        self._closed = True
+        self._ready.set()
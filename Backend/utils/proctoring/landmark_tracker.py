@@ -0,0 +1,93 @@
+# utils/proctoring/landmark_tracker.py
+
+from typing import Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+
+class LandmarkFlowTracker:
+    """
+    Propagates a subset of FaceMesh landmarks between keyframes with
+    pyramidal Lucas-Kanade optical flow.
+
+    After a FaceMesh keyframe (start), track() moves the points to the next
+    frame and returns the keyframe's (N, 3) landmark array with the tracked
+    rows updated (other rows and z keep their keyframe values); the face box
+    follows the median displacement. Every point is also tracked back to the previous frame:
+    when a point is lost or the forward-backward error exceeds `max_error`
+    pixels, tracking stops and the caller must run FaceMesh again.
+    """
+
+    def __init__(self, indices: Sequence[int], keyframe_interval: int = 3, max_error: float = 1.5,
+                 win_size: Tuple[int, int] = (15, 15), max_level: int = 2):
+        self.indices = np.array(indices)
+        self.keyframe_interval = keyframe_interval
+        self.max_error = max_error
+        self._lk_params = dict(
+            winSize=win_size,
+            maxLevel=max_level,
+            criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03),
+        )
+
+        self.points: Optional[np.ndarray] = None  # (len(indices), 1, 2) float32, pixels
+        self.keyframe: Optional[np.ndarray] = None  # (N, 3) normalized landmarks
+        self.prev_gray: Optional[np.ndarray] = None
+        self.box: Optional[Tuple] = None  # normalized (x0, y0, x1, y1, score)
+        self.frames_since_keyframe = 0
+        self.last_error: Optional[float] = None
+
+    @property
+    def active(self) -> bool:
+        return self.points is not None
+
+    def keyframe_due(self) -> bool:
+        return not self.active or self.frames_since_keyframe + 1 >= self.keyframe_interval
+
+    def start(self, gray: np.ndarray, face_points: np.ndarray, face_box: Tuple):
+        """Take the tracked points from a FaceMesh landmark array computed on `gray`"""
+        h, w = gray.shape[:2]
+        self.keyframe = face_points.copy()
+        self.points = (face_points[self.indices, :2] * (w, h)).astype(np.float32).reshape(-1, 1, 2)
+        self.prev_gray = gray
+        self.box = face_box
+        self.frames_since_keyframe = 0
+        self.last_error = None
+
+    def track(self, gray: np.ndarray) -> Optional[np.ndarray]:
+        """Move the points onto `gray`; None means a new keyframe is needed"""
+        if not self.active or gray.shape != self.prev_gray.shape:
+            self.reset()
+            return None
+
+        points, status, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, self.points, None, **self._lk_params)
+        back, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, self.prev_gray, points, None, **self._lk_params)
+        if not (status.all() and back_status.all()):
+            self.reset()
+            return None
+
+        fb_error = np.linalg.norm((back - self.points).reshape(-1, 2), axis=1)
+        self.last_error = float(np.median(fb_error))
+        if self.last_error > self.max_error or fb_error.max() > 3 * self.max_error:
+            self.reset()
+            return None
+
+        h, w = gray.shape[:2]
+        dx, dy = (float(d) for d in np.median((points - self.points).reshape(-1, 2), axis=0))
+        x0, y0, x1, y1, score = self.box
+        self.box = (x0 + dx / w, y0 + dy / h, x1 + dx / w, y1 + dy / h, score)
+
+        self.points = points
+        self.prev_gray = gray
+        self.frames_since_keyframe += 1
+
+        face_points = self.keyframe.copy()
+        face_points[self.indices, :2] = points.reshape(-1, 2) / (w, h)
+        return face_points
+
+    def reset(self):
+        self.points = None
+        self.keyframe = None
+        self.prev_gray = None
+        self.box = None
+        self.frames_since_keyframe = 0
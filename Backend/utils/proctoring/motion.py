@@ -0,0 +1,81 @@
+# utils/proctoring/motion.py
+
+import time
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """
+    Cheap scene-change detector deciding whether model outputs can be reused.
+
+    Each frame is reduced to a tiny grayscale thumbnail and compared with the
+    thumbnail of the last frame that actually went through the models (not
+    the previous frame, so slow drift still adds up to a refresh). Below
+    `threshold` (mean absolute difference in gray levels) the caller may reuse
+    that frame's results. A refresh is forced after `max_reuse_frames` reuses
+    or `max_reuse_seconds`, so alerts never go stale on a frozen scene.
+    """
+
+    def __init__(self, threshold: float = 3.0, max_reuse_frames: int = 10,
+                 max_reuse_seconds: float = 2.0, thumb_size: Tuple[int, int] = (64, 48)):
+        self.threshold = threshold
+        self.max_reuse_frames = max_reuse_frames
+        self.max_reuse_seconds = max_reuse_seconds
+        self.thumb_size = thumb_size
+
+        self.reference: Optional[np.ndarray] = None
+        self.reference_time = 0.0
+        self.reuse_streak = 0
+        self.last_score: Optional[float] = None  # None until there is a reference
+        self.frames_checked = 0
+        self.frames_reused = 0
+
+        # Thumbnails are written into preallocated buffers: two gray ones
+        # used in turn (one holds the reference) and one for the color resize
+        w, h = thumb_size
+        self._small = np.empty((h, w, 3), dtype=np.uint8)
+        self._grays = (np.empty((h, w), dtype=np.uint8), np.empty((h, w), dtype=np.uint8))
+
+    def _thumbnail(self, bgr_frame: np.ndarray) -> np.ndarray:
+        dst = self._grays[1] if self.reference is self._grays[0] else self._grays[0]
+        cv2.resize(bgr_frame, self.thumb_size, dst=self._small, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=dst)
+
+    def update(self, bgr_frame: np.ndarray, can_reuse: bool = True, now: Optional[float] = None) -> bool:
+        """
+        Returns True when the caller should reuse the previous results.
+        Otherwise this frame becomes the new reference and must be analyzed.
+        """
+        now = time.time() if now is None else now
+        thumb = self._thumbnail(bgr_frame)
+        self.frames_checked += 1
+
+        if self.reference is not None and self.reference.shape == thumb.shape:
+            self.last_score = float(cv2.norm(thumb, self.reference, cv2.NORM_L1)) / thumb.size
+        else:
+            self.last_score = None
+
+        reuse = (
+            can_reuse
+            and self.threshold > 0
+            and self.last_score is not None
+            and self.last_score < self.threshold
+            and self.reuse_streak < self.max_reuse_frames
+            and now - self.reference_time < self.max_reuse_seconds
+        )
+
+        if reuse:
+            self.reuse_streak += 1
+            self.frames_reused += 1
+        else:
+            self.reference = thumb
+            self.reference_time = now
+            self.reuse_streak = 0
+        return reuse
+
+    @property
+    def reuse_ratio(self) -> float:
+        return self.frames_reused / self.frames_checked if self.frames_checked else 0.0
@@ -0,0 +1,284 @@
+# utils/proctoring/offline.py
+"""
+Offline proctoring analysis of recorded exam videos.
+
+Runs the live pipeline (the handler module's analyze_frame, by default
+routes.proctoring) over video files in a pool of spawned processes, one
+video per task. Each worker loads its own model set once and decodes with
+its own cv2.VideoCapture; frames between samples are only grabbed, never
+decoded. Frames are fed at the rate a client with server-driven capture
+would send for the profile (or --fps), numbered on the same frame clock,
+with their video time as timestamp, so alert smoothing follows the video
+and not the speed of the analysis.
+
+Per video it writes <name>.frames.json (or .parquet, needs polars) with one
+telemetry row per analyzed frame and <name>.alerts.json with the alert
+timeline; report.json holds the throughput (frames per second per core).
+
+    python -m utils.proctoring.offline recordings/ --out reports/ --workers 4
+    python -m utils.proctoring.offline exam.webm --profile strict --format parquet
+"""
+
+import argparse
+import hashlib
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from utils.proctoring.telemetry import TELEMETRY_METRICS
+
+logger = logging.getLogger(__name__)
+
+VIDEO_EXTENSIONS = {".mp4", ".webm", ".mkv", ".avi", ".mov", ".m4v", ".mjpeg", ".mjpg"}
+
+# Per-process pipeline settings for reproducible results: YOLO inline on
+# every frame that asks for it, no per-second YOLO budget
+WORKER_ENV = {"PROCTOR_YOLO_MAX_BATCH": "1", "PROCTOR_YOLO_BUDGET": "0"}
+
+_handler = None
+
+
+def find_videos(paths: Iterable[str]) -> List[str]:
+    """Video files among `paths`, directories searched recursively"""
+    videos = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                videos.extend(os.path.join(root, name) for name in sorted(files)
+                              if os.path.splitext(name)[1].lower() in VIDEO_EXTENSIONS)
+        elif os.path.isfile(path):
+            videos.append(path)
+    return sorted(videos)
+
+
+def output_name(video: str) -> str:
+    """File stem plus a hash of the path, unique across directories"""
+    stem = os.path.splitext(os.path.basename(video))[0]
+    digest = hashlib.sha1(os.path.abspath(video).encode("utf-8")).hexdigest()[:8]
+    return f"{stem}-{digest}"
+
+
+def frame_record(result: Dict, frame_index: int, video_time: float) -> Dict:
+    """Telemetry row of one analyzed frame (field names as in the telemetry collection)"""
+    details = result.get("details") or {}
+    record = {
+        "t": round(video_time, 3),
+        "video_frame": frame_index,
+        "alert": result.get("alert", "none"),
+        "conf": result.get("conf", 0.0),
+        "status": result.get("behavior_status"),
+        "devices": ",".join(result.get("devices_detected") or []),
+    }
+    for key, field in TELEMETRY_METRICS.items():
+        record[field] = details.get(key)
+    return record
+
+
+def alert_timeline(records: List[Dict], max_gap: float) -> List[Dict]:
+    """Alert intervals: consecutive frames with the same alert type, at most `max_gap` seconds apart"""
+    open_intervals: Dict[str, Dict] = {}
+    timeline = []
+    for record in records:
+        t = record["t"]
+        alerts = set(record["alert"].split(" AND ")) - {"none"}
+        for alert, interval in list(open_intervals.items()):
+            if alert not in alerts and t - interval["end"] > max_gap:
+                timeline.append(open_intervals.pop(alert))
+        for alert in alerts:
+            interval = open_intervals.get(alert)
+            if interval is None:
+                open_intervals[alert] = {"alert": alert, "start": t, "end": t, "frames": 1,
+                                         "max_conf": record["conf"]}
+            else:
+                interval["end"] = t
+                interval["frames"] += 1
+                interval["max_conf"] = max(interval["max_conf"], record["conf"])
+    timeline.extend(open_intervals.values())
+    return sorted(timeline, key=lambda interval: (interval["start"], interval["alert"]))
+
+
+def write_frames(records: List[Dict], path: str, fmt: str):
+    if fmt == "parquet":
+        import polars as pl
+        pl.DataFrame(records).write_parquet(path)
+    else:
+        with open(path, "w") as f:
+            json.dump(records, f)
+
+
+# ============================================================================
+# WORKERS
+# ============================================================================
+
+def _init_worker(handler_module: str, num_workers: int, counter):
+    global _handler
+    os.environ.update(WORKER_ENV)
+    with counter.get_lock():
+        index = counter.value
+        counter.value += 1
+    _handler = importlib.import_module(handler_module)
+    _handler.init_inference_worker(index, num_workers)
+
+
+def analyze_video(video: str, out_dir: str, fps: Optional[float] = None,
+                  profile: Optional[str] = None, fmt: str = "json") -> Dict:
+    """Analyze one video in this worker and write its outputs; returns its summary"""
+    import cv2
+
+    session = _handler.resolve_profile(profile, _handler.PROFILES, _handler.DEFAULT_PROFILE)
+    sample_fps = fps or session.capture_fps
+    capture = cv2.VideoCapture(video)
+    if not capture.isOpened():
+        raise ValueError(f"Cannot open video {video}")
+    video_fps = capture.get(cv2.CAP_PROP_FPS)
+    if not video_fps or video_fps != video_fps or video_fps > 240:
+        video_fps = 30.0  # Missing or bogus container rate (common for webm)
+    step = max(1, round(video_fps / sample_fps))
+
+    client_id = f"offline:{os.getpid()}:{video}"
+    records = []
+    frame_index = 0
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        while True:
+            if frame_index % step:
+                # Between samples: demux only, no decode
+                if not capture.grab():
+                    break
+                frame_index += 1
+                continue
+            ok, frame = capture.read()
+            if not ok:
+                break
+            video_time = frame_index / video_fps
+            result = _handler.analyze_frame(
+                frame, client_id, frame_number=(len(records) + 1) * session.skip_frames,
+                viz_mode="vector", profile=session.name, timestamp=video_time
+            )
+            records.append(frame_record(result, frame_index, video_time))
+            frame_index += 1
+    finally:
+        capture.release()
+        _handler.release_client(client_id)
+    wall_s = time.perf_counter() - wall_start
+    cpu_s = time.process_time() - cpu_start
+
+    name = output_name(video)
+    frames_path = os.path.join(out_dir, f"{name}.frames.{'parquet' if fmt == 'parquet' else 'json'}")
+    write_frames(records, frames_path, fmt)
+    timeline = alert_timeline(records, max_gap=2.0 * step / video_fps)
+    alerts_path = os.path.join(out_dir, f"{name}.alerts.json")
+    with open(alerts_path, "w") as f:
+        json.dump({"video": video, "profile": session.name, "sample_fps": video_fps / step,
+                   "alerts": timeline}, f, indent=2)
+
+    return {
+        "video": video,
+        "duration_s": round(frame_index / video_fps, 2),
+        "frames_read": frame_index,
+        "frames_analyzed": len(records),
+        "alert_intervals": len(timeline),
+        "wall_s": round(wall_s, 3),
+        "cpu_s": round(cpu_s, 3),
+        "fps": round(len(records) / wall_s, 2) if wall_s > 0 else 0.0,
+        "frames": frames_path,
+        "alerts": alerts_path,
+    }
+
+
+def _analyze_task(task) -> Dict:
+    video = task[0]
+    try:
+        return analyze_video(*task)
+    except Exception as e:
+        logger.error(f"❌ Offline analysis of {video} failed: {e}")
+        return {"video": video, "error": str(e), "frames_analyzed": 0, "cpu_s": 0.0}
+
+
+# ============================================================================
+# DRIVER
+# ============================================================================
+
+def run_offline_analysis(videos: List[str], out_dir: str, workers: Optional[int] = None,
+                         fps: Optional[float] = None, profile: Optional[str] = None,
+                         fmt: str = "json", handler_module: str = "routes.proctoring",
+                         progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """Analyze `videos` in a process pool; writes report.json to `out_dir` and returns it"""
+    if fmt not in ("json", "parquet"):
+        raise ValueError(f"Unknown output format '{fmt}'")
+    if not videos:
+        raise ValueError("No videos to analyze")
+    workers = max(1, min(workers or max(1, (os.cpu_count() or 2) - 1), len(videos)))
+    os.makedirs(out_dir, exist_ok=True)
+
+    ctx = multiprocessing.get_context("spawn")
+    counter = ctx.Value("i", 0)
+    tasks = [(video, out_dir, fps, profile, fmt) for video in videos]
+    summaries = []
+    start = time.perf_counter()
+    with ctx.Pool(workers, initializer=_init_worker, initargs=(handler_module, workers, counter)) as pool:
+        for summary in pool.imap_unordered(_analyze_task, tasks):
+            summaries.append(summary)
+            if progress is not None:
+                progress(summary)
+    wall_s = time.perf_counter() - start
+
+    frames = sum(summary["frames_analyzed"] for summary in summaries)
+    cpu_s = sum(summary["cpu_s"] for summary in summaries)
+    report = {
+        "videos": len(videos),
+        "failed": sum("error" in summary for summary in summaries),
+        "workers": workers,
+        "profile": profile,
+        "frames_analyzed": frames,
+        "wall_s": round(wall_s, 2),
+        "fps": round(frames / wall_s, 2) if wall_s > 0 else 0.0,
+        # Pool throughput spread over its cores, and per second of CPU time
+        "fps_per_core": round(frames / wall_s / workers, 2) if wall_s > 0 else 0.0,
+        "fps_per_cpu_second": round(frames / cpu_s, 2) if cpu_s > 0 else 0.0,
+        "results": sorted(summaries, key=lambda summary: summary["video"]),
+    }
+    with open(os.path.join(out_dir, "report.json"), "w") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the proctoring pipeline over recorded exam videos")
+    parser.add_argument("paths", nargs="+", help="video files or directories of clips")
+    parser.add_argument("--out", default="proctoring_reports", help="output directory")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: cores - 1)")
+    parser.add_argument("--fps", type=float, default=None, help="analyzed frames per second of video "
+                                                                  "(default: the profile's capture rate)")
+    parser.add_argument("--profile", default=None, help="lite, standard or strict")
+    parser.add_argument("--format", choices=("json", "parquet"), default="json")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    videos = find_videos(args.paths)
+    if not videos:
+        print("❌ No videos found")
+        return 1
+
+    def progress(summary: Dict):
+        if "error" in summary:
+            print(f"❌ {summary['video']}: {summary['error']}")
+        else:
+            print(f"✅ {summary['video']}: {summary['frames_analyzed']} frames, "
+                  f"{summary['alert_intervals']} alert intervals, {summary['fps']} fps")
+
+    report = run_offline_analysis(videos, args.out, args.workers, args.fps, args.profile,
+                                  args.format, progress=progress)
+    print(f"{report['frames_analyzed']} frames of {report['videos']} videos in {report['wall_s']}s "
+          f"on {report['workers']} workers: {report['fps']} fps, {report['fps_per_core']} fps per core "
+          f"({report['fps_per_cpu_second']} per CPU second)")
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+# utils/proctoring/profiles.py
+
+import logging
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ProctoringProfile:
+    """
+    Named quality tier for a proctoring session, chosen by the quiz when it
+    opens /ws/proctor (?profile=<name>). It decides how much work the
+    pipeline spends per session:
+
+    - skip_frames / inference_size: analysis rate and MediaPipe input width
+    - refine_landmarks: iris refinement (needed for gaze tracking)
+    - run_pose / pose_interval: hand-near-face and looking-down checks
+    - landmark_keyframe_interval: FaceMesh keyframes vs optical flow
+    - motion_threshold: reuse of results on static scenes (0 = off)
+    - yolo_*_skip_frames: device detection cadence (base, evidence, calm)
+    - viz_mode / viz_quality: forced visualization mode (None = client's
+      choice) and JPEG quality of rendered frames
+    - capture_fps / capture_width / capture_quality: what clients with
+      server-driven capture send (see utils/proctoring/capture_control.py)
+    """
+
+    def __init__(self, name: str, *, inference_size: int, skip_frames: int,
+                 refine_landmarks: bool = True, run_pose: bool = True, pose_interval: int = 4,
+                 landmark_keyframe_interval: int = 3, motion_threshold: float = 3.0,
+                 yolo_skip_frames: int = 10, yolo_min_skip_frames: int = 3, yolo_max_skip_frames: int = 40,
+                 viz_mode: Optional[str] = None, viz_quality: int = 85,
+                 capture_fps: float = 2.5, capture_width: int = 640, capture_quality: int = 80):
+        self.name = name
+        self.inference_size = inference_size
+        self.skip_frames = max(1, skip_frames)
+        self.refine_landmarks = refine_landmarks
+        self.run_pose = run_pose
+        self.pose_interval = pose_interval
+        self.landmark_keyframe_interval = max(1, landmark_keyframe_interval)
+        self.motion_threshold = motion_threshold
+        self.yolo_skip_frames = yolo_skip_frames
+        self.yolo_min_skip_frames = yolo_min_skip_frames
+        self.yolo_max_skip_frames = yolo_max_skip_frames
+        self.viz_mode = viz_mode
+        self.viz_quality = viz_quality
+        self.capture_fps = capture_fps
+        self.capture_width = capture_width
+        self.capture_quality = capture_quality
+
+    def summary(self) -> Dict:
+        return dict(vars(self))
+
+
+def resolve_profile(name: Optional[str], profiles: Dict[str, ProctoringProfile],
+                    default: str) -> ProctoringProfile:
+    """Look up a profile by name; unknown or missing names get the default"""
+    if name:
+        profile = profiles.get(name.strip().lower())
+        if profile is not None:
+            return profile
+        logger.warning(f"⚠️  Unknown proctoring profile '{name}', using '{default}'")
+    return profiles[default]
+
+
+class AlertThresholds:
+    """
+    Decision thresholds of the alert rules (see assess_frame in
+    utils/proctoring/alert_rules.py). The defaults are the live values; the landmark
+    replay (utils/proctoring/replay.py) sweeps them without running models.
+
+    - gaze_degrees: gaze deviation that raises gaze_off_screen at once
+    - no_face_count / no_face_window: no_face_detected smoothing
+    - visibility: minimum pose landmark visibility
+    - hand_face_distance: wrist-to-nose distance of hand_near_face
+    - looking_down_diff / looking_down_count / looking_down_window: nose
+      below the shoulder line, and its smoothing
+    - device_conf: minimum YOLO confidence of a device alert
+    """
+
+    def __init__(self, *, gaze_degrees: float = 10.0, no_face_count: int = 2, no_face_window: float = 1.0,
+                 visibility: float = 0.5, hand_face_distance: float = 0.15, looking_down_diff: float = 0.15,
+                 looking_down_count: int = 3, looking_down_window: float = 1.5, device_conf: float = 0.0):
+        self.gaze_degrees = gaze_degrees
+        self.no_face_count = no_face_count
+        self.no_face_window = no_face_window
+        self.visibility = visibility
+        self.hand_face_distance = hand_face_distance
+        self.looking_down_diff = looking_down_diff
+        self.looking_down_count = looking_down_count
+        self.looking_down_window = looking_down_window
+        self.device_conf = device_conf
+
+    def replace(self, **changes) -> "AlertThresholds":
+        """A copy with some thresholds changed"""
+        return AlertThresholds(**{**vars(self), **changes})
+
+    def summary(self) -> Dict:
+        return dict(vars(self))
@@ -0,0 +1,420 @@
+# utils/proctoring/replay.py
+"""
+Recorded landmark streams and a model-free replay of the alert rules.
+
+With PROCTOR_LANDMARK_RECORD_DIR set, analyze_frame hands every analyzed
+frame's model outputs to the session's LandmarkRecorder: exactly what the
+alert rules saw (face boxes, the first face's landmarks, pose landmarks,
+the device detections in use, frame sizes and time) plus the alert string
+it produced. Sessions are written as .npz files of plain arrays (no
+pickles), split every `max_frames` frames:
+
+    frame (T,) int64          frame number        t (T,) float64   seconds
+    sizes (T, 4) int32        img_w, img_h, proc_w, proc_h
+    points (T, 478, 3) f32    first face, NaN padded; n_points (T,) int16
+    pose (T, 33, 4) f32       x, y, z, visibility; pose_valid, pose_ran (T,) bool
+    box_frame (B,) int32      frame index of each face box; boxes (B, 5) f32
+    det_frame (D,) int32      frame index of each detection; det_label (D,) str,
+                              det_conf (D,) f32, det_box (D, 4) int32
+    alert (T,) str            live alert string; meta () str (JSON)
+
+replay_stream() feeds a stream through assess_frame and finish_assessment
+of utils/proctoring/alert_rules.py (the same functions analyze_frame uses,
+with a fresh AlertState on the recorded clock) under any AlertThresholds,
+at thousands of frames per second since no model runs. Only NumPy and
+OpenCV are needed: neither MediaPipe nor the web app is imported.
+
+    python -m utils.proctoring.replay streams/ --out replay.json
+    python -m utils.proctoring.replay streams/ --sweep gaze_degrees=6,8,10,12 \\
+        --sweep looking_down_count=2,3
+    python -m utils.proctoring.replay streams/ --expect replay.json   # regression check
+
+Streams of recorded videos (offline analysis) start at video time 0.0 and
+must replay to live_agreement 1.0 like live ones:
+
+    PROCTOR_LANDMARK_RECORD_DIR=streams/ python -m utils.proctoring.offline exam.webm --out reports/
+    python -m utils.proctoring.replay streams/ --out replay.json
+    python -m utils.proctoring.replay streams/ --expect replay.json
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import logging
+import os
+import re
+import sys
+import time
+from collections import Counter, namedtuple
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from utils.proctoring.alert_rules import AlertState, assess_frame, finish_assessment
+from utils.proctoring.offline import alert_timeline
+from utils.proctoring.profiles import AlertThresholds
+
+logger = logging.getLogger(__name__)
+
+STREAM_VERSION = 1
+MAX_FACE_POINTS = 478      # FaceMesh with refine_landmarks (iris)
+POSE_POINTS = 33
+
+
+# ============================================================================
+# STREAM FORMAT
+# ============================================================================
+
+class LandmarkStream:
+    """The arrays of one recorded stream (see the module docstring)"""
+
+    FIELDS = ("frame", "t", "sizes", "points", "n_points", "pose", "pose_valid", "pose_ran",
+              "box_frame", "boxes", "det_frame", "det_label", "det_conf", "det_box", "alert")
+
+    def __init__(self, meta: Dict, **arrays: np.ndarray):
+        self.meta = meta
+        for field in self.FIELDS:
+            setattr(self, field, arrays[field])
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    @classmethod
+    def load(cls, path: str) -> "LandmarkStream":
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta.get("version") != STREAM_VERSION:
+                raise ValueError(f"Unsupported landmark stream version {meta.get('version')} in {path}")
+            return cls(meta, **{field: data[field] for field in cls.FIELDS})
+
+    def save(self, path: str):
+        np.savez_compressed(path, meta=np.array(json.dumps(self.meta)),
+                            **{field: getattr(self, field) for field in self.FIELDS})
+
+
+class LandmarkRecorder:
+    """
+    Collects the alert-rule inputs of one session (in the process that
+    analyzes it) and writes them to `directory` every `max_frames` frames
+    and on close().
+    """
+
+    def __init__(self, directory: str, session: str, meta: Optional[Dict] = None, max_frames: int = 20000):
+        self.directory = directory
+        self.meta = {"version": STREAM_VERSION, "session": session, **(meta or {})}
+        self.max_frames = max_frames
+        safe = re.sub(r"[^A-Za-z0-9_.-]", "_", session)[:64]
+        self._stem = f"{safe}-{int(time.time())}"
+        self._part = 0
+        self._reset()
+
+    def _reset(self):
+        self._frames: List[Tuple] = []
+        self._boxes: List[Tuple] = []
+        self._detections: List[Tuple] = []
+
+    def add(self, frame_number: int, t: float, sizes: Tuple[int, int, int, int], face_boxes: List[Tuple],
+            face_points: Optional[List[np.ndarray]], pose_landmarks, pose_ran: bool,
+            detections: List[Dict], alert: str):
+        index = len(self._frames)
+        # A copy: the landmark tracker updates its arrays in place
+        points = np.array(face_points[0], dtype=np.float32) if face_points else None
+        pose = None
+        if pose_landmarks:
+            pose = np.array([(lm.x, lm.y, lm.z, lm.visibility) for lm in pose_landmarks.landmark],
+                            dtype=np.float32)
+        self._frames.append((frame_number, t, sizes, points, pose, pose_ran, alert))
+        self._boxes.extend((index, box) for box in face_boxes)
+        self._detections.extend((index, d["label"], d["conf"], d.get("box") or [0, 0, 0, 0])
+                                for d in detections)
+        if len(self._frames) >= self.max_frames:
+            self.flush()
+
+    def to_stream(self) -> LandmarkStream:
+        count = len(self._frames)
+        points = np.full((count, MAX_FACE_POINTS, 3), np.nan, dtype=np.float32)
+        n_points = np.zeros(count, dtype=np.int16)
+        pose = np.full((count, POSE_POINTS, 4), np.nan, dtype=np.float32)
+        pose_valid = np.zeros(count, dtype=bool)
+        for i, (_, _, _, face, body, _, _) in enumerate(self._frames):
+            if face is not None:
+                n = min(len(face), MAX_FACE_POINTS)
+                points[i, :n] = face[:n]
+                n_points[i] = n
+            if body is not None:
+                pose[i] = body[:POSE_POINTS]
+                pose_valid[i] = True
+        return LandmarkStream(
+            dict(self.meta, part=self._part),
+            frame=np.array([f[0] for f in self._frames], dtype=np.int64),
+            t=np.array([f[1] for f in self._frames], dtype=np.float64),
+            sizes=np.array([f[2] for f in self._frames], dtype=np.int32).reshape(count, 4),
+            points=points, n_points=n_points, pose=pose, pose_valid=pose_valid,
+            pose_ran=np.array([f[5] for f in self._frames], dtype=bool),
+            box_frame=np.array([b[0] for b in self._boxes], dtype=np.int32),
+            boxes=np.array([b[1] for b in self._boxes], dtype=np.float32).reshape(-1, 5),
+            det_frame=np.array([d[0] for d in self._detections], dtype=np.int32),
+            det_label=np.array([d[1] for d in self._detections], dtype=str),
+            det_conf=np.array([d[2] for d in self._detections], dtype=np.float32),
+            det_box=np.array([d[3] for d in self._detections], dtype=np.int32).reshape(-1, 4),
+            alert=np.array([f[6] for f in self._frames], dtype=str),
+        )
+
+    def flush(self) -> Optional[str]:
+        """Write the frames collected so far as the next part; returns its path"""
+        if not self._frames:
+            return None
+        path = os.path.join(self.directory, f"{self._stem}-{self._part:03d}.npz")
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self.to_stream().save(path)
+            logger.info(f"📼 Landmark stream {path}: {len(self._frames)} frames")
+        except Exception as e:
+            logger.warning(f"⚠️  Landmark stream {path} not written: {e}")
+            path = None
+        self._part += 1
+        self._reset()
+        return path
+
+    def close(self) -> Optional[str]:
+        return self.flush()
+
+
+def find_streams(paths: Iterable[str]) -> List[str]:
+    """.npz streams among `paths`, directories searched recursively"""
+    streams = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                streams.extend(os.path.join(root, name) for name in files if name.endswith(".npz"))
+        elif os.path.isfile(path):
+            streams.append(path)
+    return sorted(streams)
+
+
+# ============================================================================
+# REPLAY
+# ============================================================================
+
+# Stands in for a MediaPipe landmark: the alert rules only read these fields
+ReplayLandmark = namedtuple("ReplayLandmark", "x y z visibility")
+
+
+class ReplayPose:
+    """Recorded pose landmarks with the shape of MediaPipe's result (.landmark[i].x)"""
+
+    __slots__ = ("landmark",)
+
+    def __init__(self, rows: np.ndarray):
+        self.landmark = [ReplayLandmark(*row) for row in rows.tolist()]
+
+
+def _group(frame_index: np.ndarray, count: int) -> List[slice]:
+    """Per frame, the slice of a flat per-item array (items sorted by frame)"""
+    bounds = np.searchsorted(frame_index, np.arange(count + 1))
+    return [slice(bounds[i], bounds[i + 1]) for i in range(count)]
+
+
+def stream_refine_landmarks(stream: LandmarkStream) -> bool:
+    """Whether the recorded session had iris landmarks (gaze rules)"""
+    refine = stream.meta.get("refine_landmarks")
+    if refine is None:
+        logger.warning(f"⚠️  Stream of session {stream.meta.get('session')} does not record "
+                       f"refine_landmarks, assuming iris landmarks")
+        return True
+    return bool(refine)
+
+
+def replay_stream(stream: LandmarkStream, thresholds: AlertThresholds,
+                  refine_landmarks: Optional[bool] = None) -> List[Dict]:
+    """
+    Per frame {"t", "alert", "conf", "status"} of the alert rules over
+    `stream`; `refine_landmarks` overrides what the stream recorded
+    """
+    count = len(stream)
+    if not count:
+        return []
+    if refine_landmarks is None:
+        refine_landmarks = stream_refine_landmarks(stream)
+    buffer = AlertState(maxlen=30, refine_landmarks=refine_landmarks)
+
+    box_slices = _group(stream.box_frame, count)
+    det_slices = _group(stream.det_frame, count)
+    boxes = [tuple(box) for box in stream.boxes.tolist()]
+    detections = [{"label": label, "conf": conf, "box": box} for label, conf, box in
+                  zip(stream.det_label.tolist(), stream.det_conf.tolist(), stream.det_box.tolist())]
+    times, sizes = stream.t.tolist(), stream.sizes.tolist()
+    n_points, pose_valid, pose_ran = stream.n_points.tolist(), stream.pose_valid.tolist(), stream.pose_ran.tolist()
+
+    records = []
+    pose, pose_source = None, -1
+    for i in range(count):
+        buffer.frame_time = times[i]
+        buffer.clear_old_alerts(max_age=5.0)
+
+        face_points = [stream.points[i, :n_points[i]]] if n_points[i] else None
+        if not pose_valid[i]:
+            pose = None
+        elif pose is None or pose_ran[i] or not np.array_equal(stream.pose[i], stream.pose[pose_source]):
+            # Cached pose landmarks repeat between Pose runs: build them once
+            pose, pose_source = ReplayPose(stream.pose[i]), i
+        _, _, proc_w, proc_h = sizes[i]
+
+        assessment = assess_frame(buffer, boxes[box_slices[i]], face_points, pose, pose_ran[i],
+                                  proc_w, proc_h, thresholds)
+        finish_assessment(buffer, assessment, detections[det_slices[i]], pose, thresholds)
+        records.append({"t": times[i], "alert": assessment["alert"], "conf": assessment["conf"],
+                        "status": assessment["behavior_status"]})
+    return records
+
+
+def alert_digest(records: List[Dict]) -> str:
+    """Fingerprint of a replay's per-frame alert strings (regression checks)"""
+    digest = hashlib.sha1()
+    for record in records:
+        digest.update(record["alert"].encode("utf-8") + b"\n")
+    return digest.hexdigest()
+
+
+def _alert_set(alert: str) -> List[str]:
+    return sorted(set(alert.split(" AND ")))
+
+
+def summarize_replay(stream: LandmarkStream, records: List[Dict]) -> Dict:
+    alerts = Counter(alert for record in records for alert in record["alert"].split(" AND "))
+    alerts.pop("none", None)
+    recorded = stream.alert.tolist()
+    # Agreement with what the live pipeline decided (meaningful for the live thresholds)
+    same = sum(_alert_set(record["alert"]) == _alert_set(live) for record, live in zip(records, recorded))
+    duration = float(stream.t[-1] - stream.t[0]) if len(stream) > 1 else 0.0
+    gap = 2.0 * duration / max(1, len(stream) - 1)
+    return {
+        "frames": len(records),
+        "duration_s": round(duration, 2),
+        "alert_frames": dict(sorted(alerts.items())),
+        "alert_intervals": dict(Counter(interval["alert"] for interval in alert_timeline(records, gap))),
+        "live_agreement": round(same / len(records), 4) if records else None,
+        "digest": alert_digest(records),
+    }
+
+
+def threshold_grid(base: AlertThresholds, sweeps: Dict[str, List[float]]) -> List[AlertThresholds]:
+    """Every combination of the swept values on top of `base`"""
+    if not sweeps:
+        return [base]
+    names = sorted(sweeps)
+    return [base.replace(**dict(zip(names, values)))
+            for values in itertools.product(*(sweeps[name] for name in names))]
+
+
+def run_replay(paths: List[str], thresholds: List[AlertThresholds],
+               refine_landmarks: Optional[bool] = None) -> Dict:
+    """Replay every stream under every threshold set"""
+    streams = [(path, LandmarkStream.load(path)) for path in paths]
+    runs = []
+    frames = 0
+    start = time.perf_counter()
+    for config in thresholds:
+        results = {}
+        for path, stream in streams:
+            records = replay_stream(stream, config, refine_landmarks)
+            frames += len(records)
+            results[path] = summarize_replay(stream, records)
+        totals = Counter()
+        for result in results.values():
+            totals.update(result["alert_frames"])
+        runs.append({"thresholds": config.summary(), "alert_frames": dict(sorted(totals.items())),
+                     "streams": results})
+    wall_s = time.perf_counter() - start
+    return {
+        "streams": len(streams),
+        "configs": len(runs),
+        "frames_replayed": frames,
+        "wall_s": round(wall_s, 3),
+        "fps": round(frames / wall_s, 1) if wall_s > 0 else 0.0,
+        "runs": runs,
+    }
+
+
+def regressions(report: Dict, expected: Dict) -> Tuple[List[str], int]:
+    """
+    Streams whose alerts differ from an earlier report under the same
+    thresholds, and how many stream runs could be compared at all
+    """
+    problems, compared = [], 0
+    for run in report["runs"]:
+        before = next((previous["streams"] for previous in expected.get("runs", [])
+                       if previous["thresholds"] == run["thresholds"]), None)
+        if before is None:
+            continue
+        for path, result in run["streams"].items():
+            if path not in before:
+                continue
+            compared += 1
+            if before[path]["digest"] != result["digest"]:
+                problems.append(f"{path} {run['thresholds']}: {before[path]['alert_frames']} -> "
+                                f"{result['alert_frames']}")
+    return problems, compared
+
+
+def _parse_value(text: str):
+    return int(text) if re.fullmatch(r"-?\d+", text) else float(text)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay recorded landmark streams through the alert rules")
+    parser.add_argument("paths", nargs="+", help="streams (.npz) or directories of them")
+    parser.add_argument("--out", default=None, help="JSON report path")
+    parser.add_argument("--refine-landmarks", choices=("yes", "no"), default=None,
+                        help="override whether the recorded session had iris landmarks (gaze rules)")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE",
+                        help="threshold for every run, e.g. gaze_degrees=12")
+    parser.add_argument("--sweep", action="append", default=[], metavar="NAME=V1,V2,...",
+                        help="threshold values to sweep (combinations of all sweeps)")
+    parser.add_argument("--expect", default=None, help="earlier report; exit 1 when alerts changed")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    known = set(vars(AlertThresholds()))
+    settings, sweeps = {}, {}
+    for option, target in ((args.set, settings), (args.sweep, sweeps)):
+        for setting in option:
+            name, sep, value = setting.partition("=")
+            if not sep or name not in known:
+                parser.error(f"Expected NAME=VALUE with NAME one of {', '.join(sorted(known))}, got '{setting}'")
+            values = [_parse_value(v) for v in value.split(",")]
+            target[name] = values if target is sweeps else values[0]
+
+    paths = find_streams(args.paths)
+    if not paths:
+        print("❌ No landmark streams found")
+        return 1
+    refine = None if args.refine_landmarks is None else args.refine_landmarks == "yes"
+    report = run_replay(paths, threshold_grid(AlertThresholds(**settings), sweeps), refine)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    for run in report["runs"]:
+        swept = {name: run["thresholds"][name] for name in sweeps} or run["thresholds"]
+        print(f"{swept}: {run['alert_frames']}")
+    print(f"{report['frames_replayed']} frames of {report['streams']} streams x {report['configs']} "
+          f"threshold sets in {report['wall_s']}s ({report['fps']} fps)")
+
+    if args.expect:
+        with open(args.expect) as f:
+            problems, compared = regressions(report, json.load(f))
+        for problem in problems:
+            print(f"❌ {problem}")
+        if not compared:
+            print("❌ Nothing to compare: no stream replayed under the same thresholds")
+            return 1
+        if problems:
+            return 1
+        print(f"✅ Alerts unchanged in {compared} stream runs")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+# utils/proctoring/roi.py
+"""
+Region-of-interest crops for the landmark models.
+
+Boxes are normalized (x0, y0, x1, y1) in full-frame coordinates. Landmarks
+computed on a crop are mapped back into the full frame in place, so code
+downstream keeps multiplying by the full frame size as before.
+"""
+
+import math
+from typing import Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+Box = Tuple[float, float, float, float]
+
+
+def _clip(box: Box) -> Box:
+    x0, y0, x1, y1 = box
+    return max(0.0, x0), max(0.0, y0), min(1.0, x1), min(1.0, y1)
+
+
+def _face_size(face_box: Sequence[float], aspect: float) -> float:
+    """Larger side of the face box, in units of the frame height"""
+    x0, y0, x1, y1 = face_box[:4]
+    return max((x1 - x0) * aspect, y1 - y0)
+
+
+def face_roi(face_box: Sequence[float], aspect: float, scale: float = 2.0) -> Box:
+    """Square window (in pixels) `scale` times the face size around its center"""
+    x0, y0, x1, y1 = face_box[:4]
+    cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+    half = _face_size(face_box, aspect) * scale / 2
+    return _clip((cx - half / aspect, cy - half, cx + half / aspect, cy + half))
+
+
+def upper_body_roi(face_box: Sequence[float], aspect: float) -> Box:
+    """Head, shoulders and raised hands: 5 face widths wide, down to mid-chest"""
+    x0, y0, x1, y1 = face_box[:4]
+    cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+    size = _face_size(face_box, aspect)
+    half_w = 2.5 * size / aspect
+    return _clip((cx - half_w, cy - 1.2 * size, cx + half_w, cy + 3.5 * size))
+
+
+def _contains(outer: Box, inner: Sequence[float], margin: float) -> bool:
+    mx = (outer[2] - outer[0]) * margin
+    my = (outer[3] - outer[1]) * margin
+    return (inner[0] >= outer[0] + mx and inner[1] >= outer[1] + my
+            and inner[2] <= outer[2] - mx and inner[3] <= outer[3] - my)
+
+
+class StickyRoi:
+    """
+    Crop window with hysteresis.
+
+    MediaPipe's video mode tracks landmarks from frame to frame in input
+    coordinates, so the crop must not move with every jitter of the face.
+    The window is kept while the target stays inside its inner margin and
+    its size is still about right, and re-centered otherwise.
+    """
+
+    def __init__(self, margin: float = 0.1, resize_tolerance: float = 0.3):
+        self.margin = margin
+        self.resize_tolerance = resize_tolerance
+        self.box: Optional[Box] = None
+
+    def update(self, target: Sequence[float], candidate: Box) -> Box:
+        if self.box is None or not _contains(self.box, target, self.margin):
+            self.box = candidate
+        else:
+            # Re-fit when the face got noticeably closer or farther away
+            current_w = self.box[2] - self.box[0]
+            candidate_w = candidate[2] - candidate[0]
+            if abs(candidate_w - current_w) > self.resize_tolerance * current_w:
+                self.box = candidate
+        return self.box
+
+    def reset(self):
+        self.box = None
+
+
+def crop_rgb(bgr_frame: np.ndarray, roi: Box, max_side: int,
+             workspace=None, name: str = "crop") -> Tuple[np.ndarray, Box]:
+    """
+    Cut `roi` out of the full-resolution frame as RGB, downscaled so its
+    longer side is at most `max_side`. Returns the crop and the normalized
+    box it actually covers after rounding to whole pixels. With a
+    FrameWorkspace the result lives in its buffer `name` (valid until the
+    next call with that name).
+    """
+    h, w = bgr_frame.shape[:2]
+    x0 = int(math.floor(roi[0] * w))
+    y0 = int(math.floor(roi[1] * h))
+    x1 = max(x0 + 2, int(math.ceil(roi[2] * w)))
+    y1 = max(y0 + 2, int(math.ceil(roi[3] * h)))
+    x1, y1 = min(x1, w), min(y1, h)
+
+    crop = bgr_frame[y0:y1, x0:x1]
+    longer = max(crop.shape[:2])
+    if longer > max_side:
+        scale = max_side / longer
+        size = (max(1, round(crop.shape[1] * scale)), max(1, round(crop.shape[0] * scale)))
+        dst = workspace.get(f"{name}_scaled", (size[1], size[0], 3)) if workspace is not None else None
+        crop = cv2.resize(crop, size, dst=dst, interpolation=cv2.INTER_AREA)
+    dst = workspace.get(name, crop.shape) if workspace is not None else None
+    return cv2.cvtColor(crop, cv2.COLOR_BGR2RGB, dst=dst), (x0 / w, y0 / h, x1 / w, y1 / h)
+
+
+def remap_landmarks(landmark_list, roi: Box):
+    """Map crop-normalized landmarks (x, y and width-scaled z) into the full frame, in place"""
+    x0, y0, x1, y1 = roi
+    rw, rh = x1 - x0, y1 - y0
+    for lm in landmark_list.landmark:
+        lm.x = x0 + lm.x * rw
+        lm.y = y0 + lm.y * rh
+        lm.z = lm.z * rw
+
+
+def remap_points(points: np.ndarray, roi: Box) -> np.ndarray:
+    """remap_landmarks for an (N, 3) landmark array, in place"""
+    x0, y0, x1, y1 = roi
+    rw, rh = x1 - x0, y1 - y0
+    points[:, 0] = x0 + points[:, 0] * rw
+    points[:, 1] = y0 + points[:, 1] * rh
+    points[:, 2] *= rw
+    return points
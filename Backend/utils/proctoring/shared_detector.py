@@ -0,0 +1,359 @@
+# utils/proctoring/shared_detector.py
+"""
+One YOLO device-detection process shared by all inference workers.
+
+Sessions are pinned to inference workers, so a DeviceDetectionBatcher per
+worker only batches the few sessions of that worker: with YOLO every ~10th
+frame per session its batches are almost always of one frame. Here the
+workers hand their (INFERENCE_SIZE x INFERENCE_SIZE) detector inputs to a
+single detector process instead, which runs one DeviceDetectionBatcher over
+the requests of every session:
+
+- each worker owns a SharedFrameRing of detector slots (created by the
+  parent); it copies the input into a free slot and queues
+  (worker, request id, key, slot, shape, size) on one request queue
+- the detector process maps the slot (no copy, no pickling), submits it to
+  its batcher and puts (request id, detections, max_conf, batch_size) on
+  the worker's reply queue
+- a reader thread in the worker frees the slot and hands the result to the
+  session's callback (FrameBuffer.store_yolo_result)
+
+A session has at most one request in flight: a frame submitted while the
+previous one is still out is dropped (its result is on the way), as is a
+frame when all slots are busy. Requests whose reply does not arrive within
+`timeout` (detector restarting) free their slot.
+
+The handler module provides init_device_detector() -> DeviceDetectionBatcher
+(or None without a model), called once in the detector process.
+
+Run as a module to measure the batch sizes that form under a simulated
+load, per worker and shared (the detector is simulated: a sleep of
+--detect-ms plus --per-frame-ms per batched frame):
+
+    python -m utils.proctoring.shared_detector --workers 4 --sessions 40
+"""
+
+import argparse
+import importlib
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.proctoring.frame_ring import SharedFrameRing
+from utils.proctoring.yolo_batcher import DeviceDetectionBatcher, ResultCallback
+
+logger = logging.getLogger(__name__)
+
+
+class _InFlight:
+    __slots__ = ("client_id", "slot", "on_result", "submitted_at")
+
+    def __init__(self, client_id: Optional[str], slot: int, on_result: Optional[ResultCallback]):
+        self.client_id = client_id
+        self.slot = slot
+        self.on_result = on_result
+        self.submitted_at = time.monotonic()
+
+
+class SharedDetectorClient:
+    """
+    Worker side of the shared detector, in place of a DeviceDetectionBatcher
+    (submit / cancel / stop, plus a blocking detect for forced frames).
+    """
+
+    def __init__(self, worker_index: int, ring_name: str, slot_count: int, slot_size: int,
+                 requests, replies, timeout: float = 5.0):
+        self.worker_index = worker_index
+        self.ring = SharedFrameRing(slot_count, slot_size, name=ring_name)
+        self.timeout = timeout
+        self._requests = requests
+        self._replies = replies
+        self._lock = threading.Lock()
+        self._free: List[int] = list(range(slot_count))
+        # Request ids carry the pid: replies to a crashed predecessor of this
+        # worker may still arrive on the same queue
+        self._in_flight: Dict[Tuple[int, int], _InFlight] = {}
+        self._by_client: Dict[str, Tuple[int, int]] = {}
+        self._pid = os.getpid()
+        self._ids = itertools.count()
+        # Frames by the size of the batch they ran in
+        self.batch_sizes: Counter = Counter()
+        self.dropped = 0
+
+        self._thread = threading.Thread(target=self._read_replies, name="shared-detector-replies", daemon=True)
+        self._thread.start()
+
+    def _expire(self):
+        deadline = time.monotonic() - self.timeout
+        for request_id in [rid for rid, entry in self._in_flight.items() if entry.submitted_at < deadline]:
+            entry = self._in_flight.pop(request_id)
+            self._free.append(entry.slot)
+            if entry.client_id is not None and self._by_client.get(entry.client_id) == request_id:
+                del self._by_client[entry.client_id]
+
+    def _submit(self, client_id: Optional[str], frame: np.ndarray, size: Tuple[int, int],
+                on_result: ResultCallback) -> bool:
+        with self._lock:
+            self._expire()
+            if client_id is not None and client_id in self._by_client:
+                return True  # The previous request's result is on its way
+            if not self._free or not self.ring.fits(frame):
+                self.dropped += 1
+                return False
+            slot = self._free.pop()
+            shape = self.ring.write(slot, frame)
+            request_id = (self._pid, next(self._ids))
+            self._in_flight[request_id] = _InFlight(client_id, slot, on_result)
+            if client_id is not None:
+                self._by_client[client_id] = request_id
+        key = client_id if client_id is not None else f"#{request_id[1]}"
+        self._requests.put((self.worker_index, request_id, key, slot, shape, size))
+        return True
+
+    def submit(self, client_id: str, frame: np.ndarray, size: Tuple[int, int], on_result: ResultCallback) -> bool:
+        """Queue a frame for the shared batch; False when it was dropped (no free slot)"""
+        return self._submit(client_id, frame, size, on_result)
+
+    def detect(self, frame: np.ndarray, size: Tuple[int, int]) -> Tuple[List[Dict], float]:
+        """Detections of one frame, waiting for its batch (at most `timeout`)"""
+        done = threading.Event()
+        result: List[Tuple[List[Dict], float]] = [([], 0.0)]
+
+        def on_result(detections: List[Dict], max_conf: float, batch_size: int):
+            result[0] = (detections, max_conf)
+            done.set()
+
+        if self._submit(None, frame, size, on_result):
+            done.wait(self.timeout)
+        return result[0]
+
+    def cancel(self, client_id: str):
+        """Forget a session; its in-flight result is discarded when it arrives"""
+        with self._lock:
+            request_id = self._by_client.pop(client_id, None)
+            if request_id is not None:
+                self._in_flight[request_id].on_result = None
+
+    @property
+    def mean_batch_size(self) -> float:
+        frames = sum(self.batch_sizes.values())
+        return sum(size * count for size, count in self.batch_sizes.items()) / frames if frames else 0.0
+
+    def _read_replies(self):
+        while True:
+            try:
+                message = self._replies.get()
+            except (EOFError, OSError):
+                return
+            if message is None:
+                return
+            request_id, detections, max_conf, batch_size = message
+            with self._lock:
+                entry = self._in_flight.pop(request_id, None)
+                if entry is None:
+                    continue  # Expired, or sent before this worker restarted
+                self._free.append(entry.slot)
+                if entry.client_id is not None and self._by_client.get(entry.client_id) == request_id:
+                    del self._by_client[entry.client_id]
+                self.batch_sizes[batch_size] += 1
+            if entry.on_result is not None:
+                try:
+                    entry.on_result(detections, max_conf, batch_size)
+                except Exception as e:
+                    logger.warning(f"Error delivering device detections: {e}")
+
+    def stop(self):
+        self._replies.put(None)
+        self._thread.join(timeout=5.0)
+        self.ring.close()
+
+
+class SharedDetector:
+    """
+    Parent side: the detector slot rings of every worker, the request and
+    reply queues, and the detector process (restarted when it dies).
+    """
+
+    def __init__(self, ctx, handler_module: str, num_workers: int, slots_per_worker: int, slot_size: int,
+                 hook: str = "init_device_detector"):
+        self._ctx = ctx
+        self.handler_module = handler_module
+        self.hook = hook
+        self.rings = [SharedFrameRing(slots_per_worker, slot_size) for _ in range(num_workers)]
+        self.requests = ctx.Queue()
+        self.replies = [ctx.Queue() for _ in range(num_workers)]
+        self.process = None
+
+    def channel(self, worker_index: int) -> Tuple:
+        """SharedDetectorClient arguments for a worker (picklable for spawn)"""
+        ring = self.rings[worker_index]
+        return (worker_index, ring.name, ring.slot_count, ring.slot_size, self.requests, self.replies[worker_index])
+
+    def start(self):
+        channels = [(ring.name, ring.slot_count, ring.slot_size) for ring in self.rings]
+        self.process = self._ctx.Process(
+            target=_detector_main,
+            args=(self.handler_module, self.hook, channels, self.requests, self.replies),
+            name="proctor-detector",
+            daemon=True,
+        )
+        self.process.start()
+        logger.info(f"Shared device detector started for {len(self.rings)} workers")
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+    def restart_if_dead(self):
+        if self.process is not None and not self.process.is_alive():
+            logger.error(f"Shared device detector exited with code {self.process.exitcode}; restarting")
+            self.start()
+
+    def stop(self, timeout: float = 5.0):
+        self.requests.put(None)
+        if self.process is not None:
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+        for ring in self.rings:
+            ring.close()
+
+
+def _reply(replies, request_id: int, detections: List[Dict], max_conf: float, batch_size: int):
+    replies.put((request_id, detections, max_conf, batch_size))
+
+
+def _detector_main(handler_module: str, hook: str, channels: List[Tuple[str, int, int]], requests, replies):
+    handler = importlib.import_module(handler_module)
+    rings = [SharedFrameRing(count, size, name=name) for name, count, size in channels]
+    batcher: Optional[DeviceDetectionBatcher] = getattr(handler, hook)()
+    try:
+        while True:
+            message = requests.get()
+            if message is None:
+                break
+            worker_index, request_id, key, slot, shape, size = message
+            if batcher is None:
+                _reply(replies[worker_index], request_id, [], 0.0, 0)
+                continue
+            # The slot stays reserved until the reply, so the view stays valid
+            batcher.submit(f"{worker_index}:{key}", rings[worker_index].view(slot, shape), tuple(size),
+                           partial(_reply, replies[worker_index], request_id))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if batcher is not None:
+            batcher.stop()
+        for ring in rings:
+            ring.close()
+
+
+# ============================================================================
+# BATCH SIZE SIMULATION
+# ============================================================================
+
+def _simulated_detect(frames: List[np.ndarray], sizes: List[Tuple[int, int]]) -> List[Tuple[List[Dict], float]]:
+    base_ms = float(os.environ["PROCTOR_SIM_DETECT_MS"])
+    per_frame_ms = float(os.environ["PROCTOR_SIM_PER_FRAME_MS"])
+    time.sleep((base_ms + per_frame_ms * len(frames)) / 1000.0)
+    return [([], 0.0)] * len(frames)
+
+
+def _simulated_batcher() -> DeviceDetectionBatcher:
+    return DeviceDetectionBatcher(_simulated_detect, int(os.environ["PROCTOR_SIM_MAX_BATCH"]),
+                                  float(os.environ["PROCTOR_SIM_MAX_WAIT_MS"]))
+
+
+def _simulated_worker(channel: Optional[Tuple], sessions: int, rate: float, seconds: float, imgsz: int,
+                      seed: int, out):
+    """Sessions of one worker submitting YOLO frames at `rate` Hz each, with jitter"""
+    detector = SharedDetectorClient(*channel) if channel else _simulated_batcher()
+    frame = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+    rng = np.random.default_rng(seed)
+    start = time.monotonic()
+    due = start + rng.uniform(0, 1.0 / rate, sessions)
+
+    def on_result(detections, max_conf, batch_size):
+        pass
+
+    while time.monotonic() - start < seconds:
+        session = int(np.argmin(due))
+        wait = due[session] - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        detector.submit(f"session-{session}", frame, (640, 480), on_result)
+        due[session] += rng.uniform(0.5, 1.5) / rate
+    time.sleep(0.5)  # Let the last batches come back
+    detector.stop()
+    out.put(dict(detector.batch_sizes))
+
+
+def simulate(workers: int, sessions: int, rate: float, seconds: float, shared: bool, detect_ms: float,
+             per_frame_ms: float, max_batch: int, max_wait_ms: float, imgsz: int = 360) -> Dict:
+    """Frames by batch size with the sessions spread over `workers` processes"""
+    os.environ.update({"PROCTOR_SIM_DETECT_MS": str(detect_ms), "PROCTOR_SIM_PER_FRAME_MS": str(per_frame_ms),
+                       "PROCTOR_SIM_MAX_BATCH": str(max_batch), "PROCTOR_SIM_MAX_WAIT_MS": str(max_wait_ms)})
+    ctx = multiprocessing.get_context("spawn")
+    detector = None
+    if shared:
+        detector = SharedDetector(ctx, __name__, workers, slots_per_worker=max(4, sessions // workers + 1),
+                                  slot_size=imgsz * imgsz * 3, hook="_simulated_batcher")
+        detector.start()
+    out = ctx.Queue()
+    processes = []
+    for index in range(workers):
+        count = sessions // workers + (index < sessions % workers)
+        process = ctx.Process(target=_simulated_worker,
+                              args=(detector.channel(index) if detector else None, count, rate, seconds,
+                                    imgsz, index, out))
+        process.start()
+        processes.append(process)
+    sizes: Counter = Counter()
+    for _ in processes:
+        sizes.update({int(size): count for size, count in out.get(timeout=seconds + 60).items()})
+    for process in processes:
+        process.join()
+    if detector is not None:
+        detector.stop()
+    frames = sum(sizes.values())
+    return {
+        "mode": "shared" if shared else "per_worker",
+        "frames": frames,
+        "mean_batch_size": round(sum(s * c for s, c in sizes.items()) / frames, 2) if frames else 0.0,
+        "frames_by_batch_size": {size: sizes[size] for size in sorted(sizes)},
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="YOLO batch sizes per worker vs shared, simulated load")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--sessions", type=int, default=40)
+    parser.add_argument("--rate", type=float, default=0.5,
+                        help="YOLO frames per second per session (5 fps capture, every 10th frame)")
+    parser.add_argument("--seconds", type=float, default=20.0)
+    parser.add_argument("--detect-ms", type=float, default=25.0, help="simulated cost of a forward pass")
+    parser.add_argument("--per-frame-ms", type=float, default=6.0, help="simulated cost per batched frame")
+    parser.add_argument("--max-batch", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=10.0)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    for shared in (False, True):
+        report = simulate(args.workers, args.sessions, args.rate, args.seconds, shared, args.detect_ms,
+                          args.per_frame_ms, args.max_batch, args.max_wait_ms)
+        print(json.dumps(report))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
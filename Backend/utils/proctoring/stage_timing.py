@@ -0,0 +1,193 @@
+# utils/proctoring/stage_timing.py
+"""
+Per-stage timing of the proctoring pipeline.
+
+analyze_frame times its stages (decode, face detection, mesh, pose, YOLO,
+overlay, JPEG encode, ...) with perf_counter_ns through a StageTimer. Only
+every `sample_every`-th frame of a process is timed; the other frames get a
+disabled timer whose stage() does nothing. Sampled durations go into
+StageStats: per stage a log-bucketed histogram (BUCKETS_PER_OCTAVE buckets
+per doubling, about 9% resolution from 1 µs to a minute) for the current
+and the previous window, so percentiles cover the last one to two windows.
+
+Histograms of several processes (the inference workers) merge by adding
+their bucket counts: StageStats.state() is a small picklable dict and
+summarize() turns one or more of them into p50/p95/p99 per stage.
+"""
+
+import math
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+BUCKETS_PER_OCTAVE = 8
+MIN_NS = 1_000                      # Everything below 1 µs lands in bucket 0
+NUM_BUCKETS = 26 * BUCKETS_PER_OCTAVE + 1  # Up to 2^26 µs (about 67 s)
+
+
+def bucket_index(ns: int) -> int:
+    if ns <= MIN_NS:
+        return 0
+    return min(NUM_BUCKETS - 1, int(math.log2(ns / MIN_NS) * BUCKETS_PER_OCTAVE) + 1)
+
+
+def bucket_upper_ns(index: int) -> float:
+    return MIN_NS * 2.0 ** (index / BUCKETS_PER_OCTAVE)
+
+
+class StageTimer:
+    """
+    Stage durations of one frame, in nanoseconds. Use `with timer.stage(name):`
+    around each stage (stages do not nest); repeated stages add up.
+    """
+
+    __slots__ = ("enabled", "durations", "_name", "_start", "_frame_start")
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.durations: Dict[str, int] = {}
+        self._name = ""
+        self._start = 0
+        self._frame_start = time.perf_counter_ns() if enabled else 0
+
+    def stage(self, name: str) -> "StageTimer":
+        self._name = name
+        return self
+
+    def __enter__(self):
+        if self.enabled:
+            self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        if self.enabled:
+            elapsed = time.perf_counter_ns() - self._start
+            self.durations[self._name] = self.durations.get(self._name, 0) + elapsed
+        return False
+
+    def start(self) -> int:
+        """Start of a stage that does not fit a with block (see add)"""
+        return time.perf_counter_ns() if self.enabled else 0
+
+    def add(self, name: str, start: int):
+        """Time since `start` (from start()) as stage `name`"""
+        if self.enabled:
+            self.durations[name] = self.durations.get(name, 0) + time.perf_counter_ns() - start
+
+    def finish(self) -> Dict[str, int]:
+        """Durations including "total" (time since the timer was created)"""
+        if self.enabled:
+            self.durations["total"] = time.perf_counter_ns() - self._frame_start
+        return self.durations
+
+    def as_ms(self) -> Optional[Dict[str, float]]:
+        if not self.enabled:
+            return None
+        return {name: round(ns / 1e6, 3) for name, ns in self.durations.items()}
+
+
+DISABLED_TIMER = StageTimer(enabled=False)
+
+
+class _Histogram:
+    __slots__ = ("counts", "total_ns", "max_ns")
+
+    def __init__(self):
+        self.counts = np.zeros(NUM_BUCKETS, dtype=np.int64)
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def record(self, ns: int):
+        self.counts[bucket_index(ns)] += 1
+        self.total_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+
+
+class StageStats:
+    """Rolling per-stage latency histograms of one process (thread-safe)"""
+
+    def __init__(self, sample_every: int = 4, window_seconds: float = 60.0):
+        self.sample_every = max(1, sample_every)
+        self.window_seconds = window_seconds
+        self._current: Dict[str, _Histogram] = {}
+        self._previous: Dict[str, _Histogram] = {}
+        self._window_start = time.monotonic()
+        self._frames = 0
+        self._lock = threading.Lock()
+
+    def timer(self) -> StageTimer:
+        """A timer for the next frame: enabled on every sample_every-th frame"""
+        self._frames += 1
+        if self._frames % self.sample_every:
+            return DISABLED_TIMER
+        return StageTimer()
+
+    def record(self, durations: Dict[str, int], now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if now - self._window_start >= self.window_seconds:
+                # Two idle windows leave nothing worth keeping
+                stale = now - self._window_start >= 2 * self.window_seconds
+                self._previous = {} if stale else self._current
+                self._current = {}
+                self._window_start = now
+            for name, ns in durations.items():
+                histogram = self._current.get(name)
+                if histogram is None:
+                    histogram = self._current[name] = _Histogram()
+                histogram.record(ns)
+
+    def state(self) -> Dict[str, Dict]:
+        """Bucket counts per stage over both windows (sparse, picklable, mergeable)"""
+        with self._lock:
+            state: Dict[str, Dict] = {}
+            for window in (self._previous, self._current):
+                for name, histogram in window.items():
+                    entry = state.setdefault(name, {"buckets": {}, "total_ns": 0, "max_ns": 0})
+                    for index in np.flatnonzero(histogram.counts).tolist():
+                        entry["buckets"][index] = entry["buckets"].get(index, 0) + int(histogram.counts[index])
+                    entry["total_ns"] += histogram.total_ns
+                    entry["max_ns"] = max(entry["max_ns"], histogram.max_ns)
+            return state
+
+
+def _percentile_ms(buckets: Dict[int, int], count: int, q: float, max_ns: int) -> float:
+    rank = max(1, math.ceil(q * count))
+    seen = 0
+    for index in sorted(buckets):
+        seen += buckets[index]
+        if seen >= rank:
+            # The bucket bound can lie above anything actually recorded
+            return round(min(bucket_upper_ns(index), max_ns) / 1e6, 3)
+    return 0.0
+
+
+def summarize(states: Iterable[Dict[str, Dict]], quantiles: List[float] = (0.5, 0.95, 0.99)) -> Dict[str, Dict]:
+    """Merge StageStats.state() dicts (e.g. of all workers) into count, mean, max and percentiles (ms)"""
+    merged: Dict[str, Dict] = {}
+    for state in states:
+        for name, entry in state.items():
+            target = merged.setdefault(name, {"buckets": {}, "total_ns": 0, "max_ns": 0})
+            for index, count in entry["buckets"].items():
+                target["buckets"][int(index)] = target["buckets"].get(int(index), 0) + count
+            target["total_ns"] += entry["total_ns"]
+            target["max_ns"] = max(target["max_ns"], entry["max_ns"])
+
+    summary = {}
+    for name, entry in merged.items():
+        count = sum(entry["buckets"].values())
+        if not count:
+            continue
+        stage = {
+            "count": count,
+            "mean_ms": round(entry["total_ns"] / count / 1e6, 3),
+            "max_ms": round(entry["max_ns"] / 1e6, 3),
+        }
+        for q in quantiles:
+            stage[f"p{round(q * 100):g}_ms"] = _percentile_ms(entry["buckets"], count, q, entry["max_ns"])
+        summary[name] = stage
+    # Slowest stages first
+    return dict(sorted(summary.items(), key=lambda item: -item[1]["mean_ms"]))
@@ -0,0 +1,241 @@
+# utils/proctoring/telemetry.py
+"""
+Write-behind persistence of per-frame proctoring telemetry.
+
+Every analyzed frame yields a small telemetry point (the numbers of the
+result's `details` plus alert and status). SessionTelemetry buffers the
+points of one connection on the event loop and hands full batches to
+TelemetryWriter, whose background thread stores them with one unordered
+insert_many per batch under a relaxed write concern. The frame loop only
+ever appends to a list and puts a batch on a queue without waiting; when
+the database falls behind, whole batches are dropped and counted instead.
+
+Points go to a MongoDB time-series collection (timeField "ts", metaField
+"meta" = {session, user, quiz}) and telemetry_timeline() returns a
+downsampled timeline of one quiz attempt for review.
+"""
+
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# details key -> stored field (numeric metrics, averaged in timelines)
+TELEMETRY_METRICS = {
+    "num_faces": "faces",
+    "gaze_horizontal": "gaze_h",
+    "gaze_vertical": "gaze_v",
+    "ear": "ear",
+    "head_pitch": "pitch",
+    "head_yaw": "yaw",
+    "head_roll": "roll",
+    "hand_face_distance_left": "hand_l",
+    "hand_face_distance_right": "hand_r",
+    "nose_shoulder_diff": "nose_shoulder",
+    "processing_time_ms": "processing_ms",
+}
+
+
+def telemetry_point(result: Dict, meta: Dict, timestamp: Optional[float] = None) -> Optional[Dict]:
+    """Time-series document of one analyzed frame; None for skips and errors"""
+    details = result.get("details")
+    if not details or details.get("skipped"):
+        return None
+    point = {
+        "ts": datetime.fromtimestamp(timestamp or result.get("timestamp") or time.time(), tz=timezone.utc),
+        "meta": meta,
+        "frame": details.get("frame_count"),
+        "alert": result.get("alert", "none"),
+        "status": result.get("behavior_status"),
+    }
+    for key, field in TELEMETRY_METRICS.items():
+        value = details.get(key)
+        if value is not None:
+            point[field] = value
+    devices = result.get("devices_detected")
+    if devices:
+        point["devices"] = devices
+    return point
+
+
+class TelemetryWriter:
+    """
+    Background writer of telemetry batches.
+
+    `collection_factory()` is called once on the writer thread (so database
+    setup never runs on the caller's thread) and must return a pymongo
+    collection. submit() never blocks: with `max_batches` batches already
+    waiting the new one is dropped.
+    """
+
+    def __init__(self, collection_factory: Callable[[], Any], max_batches: int = 64):
+        self.collection_factory = collection_factory
+        self._queue: "queue.Queue[Optional[List[Dict]]]" = queue.Queue(maxsize=max_batches)
+        self._thread: Optional[threading.Thread] = None
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._thread = threading.Thread(target=self._run, name="proctor-telemetry", daemon=True)
+        self._thread.start()
+
+    def submit(self, batch: List[Dict]) -> bool:
+        """Queue a batch for writing; False when it was dropped"""
+        if not batch:
+            return True
+        if not self.running:
+            self.dropped += len(batch)
+            return False
+        try:
+            self._queue.put_nowait(batch)
+            return True
+        except queue.Full:
+            self.dropped += len(batch)
+            logger.warning(f"⚠️  Telemetry writer behind, dropped {len(batch)} points")
+            return False
+
+    def stop(self, timeout: float = 5.0):
+        """Write what is queued, then stop the thread"""
+        if not self.running:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            logger.warning("⚠️  Telemetry writer did not drain before shutdown")
+            return
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        try:
+            collection = self.collection_factory()
+        except Exception as e:
+            logger.error(f"❌ Telemetry disabled, collection unavailable: {e}")
+            collection = None
+
+        while True:
+            batch = self._queue.get()
+            if batch is None:
+                return
+            if collection is None:
+                self.dropped += len(batch)
+                continue
+            try:
+                collection.insert_many(batch, ordered=False)
+                self.written += len(batch)
+            except Exception as e:
+                # Unordered: a bulk write error still stored the other points
+                inserted = getattr(e, "details", {}) or {}
+                self.written += inserted.get("nInserted", 0)
+                self.failed += len(batch) - inserted.get("nInserted", 0)
+                logger.warning(f"⚠️  Telemetry write failed: {e}")
+
+    def stats(self) -> Dict:
+        return {
+            "running": self.running,
+            "queued_batches": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+class SessionTelemetry:
+    """
+    Telemetry buffer of one connection (event loop only). A batch is handed
+    to the writer once it holds `batch_size` points or its oldest point is
+    `flush_seconds` old; flush() hands over the rest on disconnect.
+    """
+
+    def __init__(self, writer: TelemetryWriter, meta: Dict, batch_size: int = 100,
+                 flush_seconds: float = 5.0):
+        self.writer = writer
+        self.meta = meta
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._points: List[Dict] = []
+        self._first_at = 0.0
+
+    def add(self, result: Dict, now: Optional[float] = None):
+        point = telemetry_point(result, self.meta)
+        if point is None:
+            return
+        now = time.monotonic() if now is None else now
+        if not self._points:
+            self._first_at = now
+        self._points.append(point)
+        if len(self._points) >= self.batch_size or now - self._first_at >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        if self._points:
+            points, self._points = self._points, []
+            self.writer.submit(points)
+
+
+def ensure_telemetry_collection(db, name: str, expire_after_seconds: Optional[int] = None):
+    """The time-series collection `name` of `db`, created on first use"""
+    if name not in db.list_collection_names():
+        options = {"timeseries": {"timeField": "ts", "metaField": "meta", "granularity": "seconds"}}
+        if expire_after_seconds:
+            options["expireAfterSeconds"] = expire_after_seconds
+        try:
+            db.create_collection(name, **options)
+            logger.info(f"✅ Created time-series collection '{name}'")
+        except Exception as e:
+            # Created concurrently, or a server without time-series support
+            logger.warning(f"⚠️  Could not create time-series collection '{name}': {e}")
+        db[name].create_index([("meta.quiz", 1), ("ts", 1)])
+    return db[name]
+
+
+def telemetry_timeline(collection, quiz_id: str, points: int = 200,
+                       user_id: Optional[str] = None) -> List[Dict]:
+    """
+    Timeline of a quiz attempt downsampled to about `points` buckets of equal
+    frame count: averaged metrics, frame count, and the alerts and devices
+    seen in each bucket
+    """
+    match: Dict[str, Any] = {"meta.quiz": quiz_id}
+    if user_id:
+        match["meta.user"] = user_id
+    output: Dict[str, Any] = {field: {"$avg": f"${field}"} for field in TELEMETRY_METRICS.values()}
+    output.update({
+        "frames": {"$sum": 1},
+        "end": {"$max": "$ts"},
+        "alerts": {"$addToSet": "$alert"},
+        "devices": {"$addToSet": "$devices"},
+        "sessions": {"$addToSet": "$meta.session"},
+    })
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"ts": 1}},
+        {"$bucketAuto": {"groupBy": "$ts", "buckets": max(1, points), "output": output}},
+    ]
+
+    timeline = []
+    for bucket in collection.aggregate(pipeline, allowDiskUse=True):
+        entry = {
+            "start": bucket["_id"]["min"].isoformat(),
+            "end": bucket["end"].isoformat(),
+            "frames": bucket["frames"],
+            "alerts": sorted(a for a in bucket["alerts"] if a and a != "none"),
+            "devices": sorted({d for ds in bucket["devices"] if ds for d in ds}),
+            "sessions": len(bucket["sessions"]),
+        }
+        for field in TELEMETRY_METRICS.values():
+            value = bucket.get(field)
+            entry[field] = round(value, 3) if value is not None else None
+        timeline.append(entry)
+    return timeline
@@ -0,0 +1,81 @@
+# utils/proctoring/wire.py
+"""
+Binary framing for the /ws/proctor "immersia.proctor.v1.binary" subprotocol.
+
+Client -> server: each binary message is one raw JPEG frame.
+
+Server -> client: each binary message is
+
+    header   <4sBBHII  magic b"IMPR", version, kind, flags, meta_len, payload_len
+    meta     meta_len bytes of compact UTF-8 JSON (the JSON result minus "viz")
+    payload  payload_len bytes; raw JPEG of the visualization when FLAG_VIZ_JPEG
+
+Compared to the JSON protocol this removes the base64 inflation of both
+frames and visualizations and the string copies that go with it.
+"""
+
+import json
+import struct
+from typing import Dict, Optional, Tuple
+
+BINARY_SUBPROTOCOL = "immersia.proctor.v1.binary"
+JSON_SUBPROTOCOL = "immersia.proctor.v1.json"
+
+MAGIC = b"IMPR"
+VERSION = 1
+HEADER = struct.Struct("<4sBBHII")
+
+# Message kinds
+KIND_RESULT = 0
+KIND_SKIPPED = 1
+KIND_ERROR = 2
+KIND_CONTROL = 3
+
+# Flags
+FLAG_VIZ_JPEG = 0x01
+
+
+def negotiate_subprotocol(offered) -> Optional[str]:
+    """Pick the binary protocol when the client offers it, else fall back to JSON"""
+    offered = offered or []
+    if BINARY_SUBPROTOCOL in offered:
+        return BINARY_SUBPROTOCOL
+    if JSON_SUBPROTOCOL in offered:
+        return JSON_SUBPROTOCOL
+    return None
+
+
+def message_kind(payload: Dict) -> int:
+    if "error" in payload:
+        return KIND_ERROR
+    if "type" in payload:
+        return KIND_CONTROL
+    if payload.get("status") == "frame_skipped":
+        return KIND_SKIPPED
+    return KIND_RESULT
+
+
+def encode_message(payload: Dict) -> bytes:
+    """Pack a result/skip/error dict; a bytes "viz" value travels as raw JPEG"""
+    viz = payload.get("viz")
+    flags = 0
+    jpeg = b""
+    if isinstance(viz, (bytes, bytearray, memoryview)):
+        payload = {k: v for k, v in payload.items() if k != "viz"}
+        jpeg = viz
+        flags |= FLAG_VIZ_JPEG
+
+    meta = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    header = HEADER.pack(MAGIC, VERSION, message_kind(payload), flags, len(meta), len(jpeg))
+    return b"".join((header, meta, jpeg))
+
+
+def decode_message(data: bytes) -> Tuple[int, Dict, bytes]:
+    """Inverse of encode_message: (kind, meta, jpeg_bytes)"""
+    magic, version, kind, flags, meta_len, payload_len = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not an Immersia proctoring message")
+    start = HEADER.size
+    meta = json.loads(data[start:start + meta_len])
+    jpeg = bytes(data[start + meta_len:start + meta_len + payload_len]) if flags & FLAG_VIZ_JPEG else b""
+    return kind, meta, jpeg
@@ -0,0 +1,99 @@
+# utils/proctoring/workspace.py
+"""
+Preallocated per-session work buffers for the per-frame path.
+
+Buffers are keyed by name and reused while the requested shape and dtype
+stay the same, so once a session's resolution settles the hot path passes
+them as `dst` to OpenCV instead of allocating new images every frame.
+
+measure_steady_state() and measure_peak() track a step's allocations with
+tracemalloc; tests/test_workspace_alloc.py bounds them for the per-frame
+path.
+"""
+
+import tracemalloc
+from typing import Callable, Dict, Tuple
+
+import cv2
+import numpy as np
+
+
+class FrameWorkspace:
+    def __init__(self):
+        self._buffers: Dict[str, np.ndarray] = {}
+        self._flips: Dict[str, int] = {}
+        self.allocations = 0
+
+    def get(self, name: str, shape: Tuple[int, ...], dtype=np.uint8) -> np.ndarray:
+        """Buffer `name` with this shape; contents are whatever the last user left"""
+        buf = self._buffers.get(name)
+        if buf is None or buf.shape != tuple(shape) or buf.dtype != dtype:
+            buf = np.empty(shape, dtype=dtype)
+            self._buffers[name] = buf
+            self.allocations += 1
+        return buf
+
+    def get_alternating(self, name: str, shape: Tuple[int, ...], dtype=np.uint8) -> np.ndarray:
+        """
+        Two buffers used in turn, for results that must survive until the
+        next call (e.g. the previous gray frame kept by optical flow)
+        """
+        flip = self._flips.get(name, 0) ^ 1
+        self._flips[name] = flip
+        return self.get(f"{name}#{flip}", shape, dtype)
+
+    def copy_of(self, name: str, image: np.ndarray) -> np.ndarray:
+        """`image` copied into buffer `name` (a reusable frame.copy())"""
+        buf = self.get(name, image.shape, image.dtype)
+        np.copyto(buf, image)
+        return buf
+
+    @property
+    def nbytes(self) -> int:
+        return sum(buf.nbytes for buf in self._buffers.values())
+
+
+def prepare_inference_frame(workspace: FrameWorkspace, frame: np.ndarray, inference_size: int) -> np.ndarray:
+    """Frame scaled to `inference_size` wide, in the session's reusable "small" buffer"""
+    img_h, img_w = frame.shape[:2]
+    new_w, new_h = inference_size, int(img_h * inference_size / img_w)
+    return cv2.resize(frame, (new_w, new_h), dst=workspace.get("small", (new_h, new_w, 3)),
+                      interpolation=cv2.INTER_LINEAR)
+
+
+def to_rgb(workspace: FrameWorkspace, bgr_frame: np.ndarray) -> np.ndarray:
+    """RGB copy for MediaPipe, in the session's reusable "rgb" buffer"""
+    return cv2.cvtColor(bgr_frame, cv2.COLOR_BGR2RGB, dst=workspace.get("rgb", bgr_frame.shape))
+
+
+def measure_steady_state(step: Callable[[], object], warmup: int = 5, frames: int = 50) -> float:
+    """Average bytes still allocated per call of `step` after warm-up (tracemalloc)"""
+    for _ in range(warmup):
+        step()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        for _ in range(frames):
+            step()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    growth = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return growth / frames
+
+
+def measure_peak(step: Callable[[], object], warmup: int = 5, frames: int = 50) -> int:
+    """Peak bytes allocated during a single steady-state call of `step`"""
+    for _ in range(warmup):
+        step()
+    peak = 0
+    tracemalloc.start()
+    try:
+        for _ in range(frames):
+            tracemalloc.reset_peak()
+            start, _ = tracemalloc.get_traced_memory()
+            step()
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - start)
+    finally:
+        tracemalloc.stop()
+    return peak
@@ -0,0 +1,128 @@
+# utils/proctoring/yolo_batcher.py
+
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# detect_batch(frames, sizes) -> [(detections, max_conf), ...] in input order
+BatchDetector = Callable[[List[np.ndarray], List[Tuple[int, int]]], List[Tuple[List[Dict], float]]]
+# on_result(detections, max_conf, batch_size)
+ResultCallback = Callable[[List[Dict], float, int], None]
+
+
+class _Request:
+    __slots__ = ("frame", "size", "on_result", "submitted_at")
+
+    def __init__(self, frame: np.ndarray, size: Tuple[int, int], on_result: ResultCallback):
+        self.frame = frame
+        self.size = size
+        self.on_result = on_result
+        self.submitted_at = time.monotonic()
+
+
+class DeviceDetectionBatcher:
+    """
+    Micro-batching scheduler for YOLO device detection.
+
+    Sessions submit frames without waiting. A background thread collects
+    requests from every session served by this process for at most
+    `max_wait_ms` (or until `max_batch_size` frames are pending) and runs a
+    single batched forward pass. Results are delivered through each request's
+    callback, which stores them in the session's FrameBuffer cache.
+
+    A session has at most one request in flight: a newer frame replaces an
+    older one that has not been batched yet, keeping its queue position.
+    
+    With several inference workers, one batcher in a shared detector process
+    serves all of them (see shared_detector.py).
+    """
+
+    def __init__(self, detect_batch: BatchDetector, max_batch_size: int = 8, max_wait_ms: float = 10.0):
+        self.detect_batch = detect_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._pending: "OrderedDict[str, _Request]" = OrderedDict()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self.batches_run = 0
+        self.frames_run = 0
+        # Frames by the size of the batch they ran in
+        self.batch_sizes: Counter = Counter()
+
+        self._thread = threading.Thread(target=self._run, name="yolo-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, client_id: str, frame: np.ndarray, size: Tuple[int, int], on_result: ResultCallback) -> bool:
+        """Queue a frame for the next batch; `frame` must not be modified afterwards"""
+        with self._cond:
+            previous = self._pending.get(client_id)
+            request = _Request(frame, size, on_result)
+            if previous is not None:
+                request.submitted_at = previous.submitted_at
+            self._pending[client_id] = request
+            self._cond.notify()
+        return True
+
+    def cancel(self, client_id: str):
+        with self._cond:
+            self._pending.pop(client_id, None)
+
+    @property
+    def mean_batch_size(self) -> float:
+        return self.frames_run / self.batches_run if self.batches_run else 0.0
+
+    def _next_batch(self) -> List[_Request]:
+        with self._cond:
+            while not self._pending and not self._stopped:
+                self._cond.wait()
+            if self._stopped:
+                return []
+
+            # Wait for more sessions until the batch is full or the oldest
+            # request has waited max_wait
+            oldest = next(iter(self._pending.values())).submitted_at
+            while len(self._pending) < self.max_batch_size and not self._stopped:
+                remaining = oldest + self.max_wait - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch = []
+            while self._pending and len(batch) < self.max_batch_size:
+                batch.append(self._pending.popitem(last=False)[1])
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+
+            try:
+                results = self.detect_batch([r.frame for r in batch], [r.size for r in batch])
+            except Exception as e:
+                logger.warning(f"Error in batched device detection: {e}")
+                results = [([], 0.0)] * len(batch)
+
+            self.batches_run += 1
+            self.frames_run += len(batch)
+            self.batch_sizes[len(batch)] += len(batch)
+            for request, (detections, max_conf) in zip(batch, results):
+                try:
+                    request.on_result(detections, max_conf, len(batch))
+                except Exception as e:
+                    logger.warning(f"Error delivering device detections: {e}")
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._pending.clear()
+            self._cond.notify_all()
+        self._thread.join(timeout=5.0)
@@ -0,0 +1,101 @@
+# utils/proctoring/yolo_scheduler.py
+
+import threading
+import time
+from typing import Iterable, Optional
+
+
+class YoloBudget:
+    """
+    Token bucket limiting YOLO runs per second across all sessions of a
+    process. A quarter of the bucket is held back for sessions with
+    suspicious evidence, so calm sessions cannot starve them.
+    """
+
+    def __init__(self, runs_per_second: float, reserve_ratio: float = 0.25):
+        self.rate = runs_per_second
+        self.capacity = max(1.0, runs_per_second)
+        self.reserve = self.capacity * reserve_ratio
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.denied = 0
+
+    def try_acquire(self, priority: bool = False) -> bool:
+        if self.rate <= 0:
+            return True  # unlimited
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            floor = 1.0 if priority else 1.0 + self.reserve
+            if self._tokens >= floor:
+                self._tokens -= 1.0
+                return True
+            self.denied += 1
+            return False
+
+
+class AdaptiveYoloScheduler:
+    """
+    Per-session YOLO cadence driven by evidence.
+
+    - Suspicious evidence (hand near face, looking down, a device in the last
+      YOLO result) drops the interval to `min_interval` frames for
+      `evidence_hold` seconds.
+    - Otherwise the session runs at `base_interval`; after `calm_after`
+      seconds without evidence the interval doubles for every further
+      `calm_after` seconds, up to `max_interval`.
+    - Every run also needs a token from the shared YoloBudget; a denied run
+      is retried on the next frame.
+
+    `interval` and `reason` describe the cadence used for the last decision.
+    """
+
+    def __init__(self, base_interval: int = 10, min_interval: int = 3, max_interval: int = 40,
+                 calm_after: float = 30.0, evidence_hold: float = 5.0, now: Optional[float] = None):
+        self.base_interval = base_interval
+        self.min_interval = min(min_interval, base_interval)
+        self.max_interval = max(max_interval, base_interval)
+        self.calm_after = calm_after
+        self.evidence_hold = evidence_hold
+
+        now = time.time() if now is None else now
+        self.calm_since = now
+        self.last_evidence_time: Optional[float] = None
+        self.evidence = ""
+        self.interval = base_interval
+        self.reason = "default"
+
+    def observe(self, evidence: Iterable[str], now: Optional[float] = None):
+        """Record this frame's suspicious evidence (empty when calm)"""
+        evidence = sorted(set(evidence))
+        if evidence:
+            now = time.time() if now is None else now
+            self.last_evidence_time = now
+            self.calm_since = now
+            self.evidence = "+".join(evidence)
+
+    def _cadence(self, now: float):
+        if self.last_evidence_time is not None and now - self.last_evidence_time < self.evidence_hold:
+            return self.min_interval, self.evidence
+
+        calm_for = now - self.calm_since
+        if self.calm_after > 0 and calm_for >= self.calm_after:
+            interval = self.base_interval * 2 ** int(calm_for // self.calm_after)
+            return min(self.max_interval, interval), "calm"
+        return self.base_interval, "default"
+
+    def should_run(self, frames_since_run: int, budget: Optional[YoloBudget] = None,
+                   force: bool = False, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        self.interval, self.reason = self._cadence(now)
+        if force:
+            self.reason = "forced"
+            return True
+        if frames_since_run < self.interval:
+            return False
+        if budget is not None and not budget.try_acquire(priority=self.reason not in ("default", "calm")):
+            self.reason = "budget"
+            return False
+        return True
@@ -7,18 +7,95 @@
  * - useEffect cleanup uses a separate isMounted ref so it always fires
  * - Frame capture interval starts AFTER camera is confirmed ready
  * - No double-start / double-stop race conditions
+ * - captureSettings (fps / width / JPEG quality sent by the server) override
+ *   frameRate / videoWidth and take effect without restarting the camera
  */
 
 import React, { useRef, useEffect, useCallback, useState } from 'react';
 import { Camera, CameraOff, AlertCircle } from 'lucide-react';
 
+// MediaPipe Pose skeleton (mp_pose.POSE_CONNECTIONS)
+const POSE_CONNECTIONS = [
+    [0, 1], [1, 2], [2, 3], [3, 7], [0, 4], [4, 5], [5, 6], [6, 8], [9, 10],
+    [11, 12], [11, 13], [13, 15], [15, 17], [15, 19], [15, 21], [17, 19],
+    [12, 14], [14, 16], [16, 18], [16, 20], [16, 22], [18, 20], [11, 23],
+    [12, 24], [23, 24], [23, 25], [24, 26], [25, 27], [26, 28], [27, 29],
+    [28, 30], [29, 31], [30, 32], [27, 31], [28, 32],
+];
+const VISIBILITY_THRESHOLD = 0.5;
+
+// Draws server-side overlay primitives (vector mode) — same look as the
+// server-rendered visualization. Coordinates arrive normalized to [0, 1].
+const drawOverlay = (ctx, overlay, w, h) => {
+    ctx.clearRect(0, 0, w, h);
+    ctx.lineWidth = 2;
+    ctx.font      = '12px sans-serif';
+
+    const faceColor = overlay.face_boxes.length === 1 ? 'rgb(0,255,0)' : 'rgb(255,0,0)';
+    overlay.face_boxes.forEach(([x1, y1, x2, y2, score]) => {
+        ctx.strokeStyle = faceColor;
+        ctx.fillStyle   = faceColor;
+        ctx.strokeRect(x1 * w, y1 * h, (x2 - x1) * w, (y2 - y1) * h);
+        ctx.fillText(`Face: ${score.toFixed(2)}`, x1 * w, y1 * h - 10);
+    });
+
+    ctx.fillStyle = 'rgb(255,255,0)';
+    overlay.iris_points.forEach(([x, y]) => {
+        ctx.beginPath();
+        ctx.arc(x * w, y * h, 3, 0, 2 * Math.PI);
+        ctx.fill();
+    });
+
+    const kp = overlay.pose_keypoints;
+    if (kp.length) {
+        ctx.strokeStyle = 'rgb(230,66,245)';
+        POSE_CONNECTIONS.forEach(([a, b]) => {
+            if (!kp[a] || !kp[b] || kp[a][2] < VISIBILITY_THRESHOLD || kp[b][2] < VISIBILITY_THRESHOLD) return;
+            ctx.beginPath();
+            ctx.moveTo(kp[a][0] * w, kp[a][1] * h);
+            ctx.lineTo(kp[b][0] * w, kp[b][1] * h);
+            ctx.stroke();
+        });
+        ctx.fillStyle = 'rgb(66,117,245)';
+        kp.forEach(([x, y, v]) => {
+            if (v < VISIBILITY_THRESHOLD) return;
+            ctx.beginPath();
+            ctx.arc(x * w, y * h, 2, 0, 2 * Math.PI);
+            ctx.fill();
+        });
+    }
+
+    ctx.strokeStyle = 'rgb(255,165,0)';
+    ctx.fillStyle   = 'rgb(255,165,0)';
+    overlay.device_boxes.forEach(({ label, conf, box: [x1, y1, x2, y2] }) => {
+        ctx.strokeRect(x1 * w, y1 * h, (x2 - x1) * w, (y2 - y1) * h);
+        ctx.fillText(`${label} ${conf.toFixed(2)}`, x1 * w, y1 * h - 10);
+    });
+
+    // Status bar
+    const hasAlerts = overlay.alerts.length > 0;
+    ctx.fillStyle = hasAlerts ? 'rgba(255,0,0,0.3)' : 'rgba(0,255,0,0.2)';
+    ctx.fillRect(0, 0, w, 60);
+    ctx.fillStyle = 'rgb(255,255,255)';
+    if (hasAlerts) {
+        ctx.fillText(`ALERT: ${overlay.alerts.join(' | ')}`, 10, 25);
+        ctx.fillText(`Status: ${overlay.behavior_status}`, 10, 50);
+    } else {
+        ctx.fillText(`Status: ${overlay.behavior_status}`, 10, 25);
+        ctx.fillText('All Clear - Monitoring Active', 10, 50);
+    }
+    ctx.fillText(`FPS: ${overlay.fps.toFixed(1)}`, w - 80, h - 15);
+};
+
 const ProctorFeed = ({
     isProctoring,
     onFrame,
     visualization,
+    overlay,
     frameRate = 5,
     videoWidth = 640,
-    videoHeight = 480
+    videoHeight = 480,
+    captureSettings = null
 }) => {
     // ========================================================================
     // REFS
@@ -30,6 +107,16 @@ const ProctorFeed = ({
     const intervalRef      = useRef(null);
     const lastFrameTimeRef = useRef(0);
     const isMounted        = useRef(false); // tracks whether effect is active
+    const captureRef       = useRef({ fps: frameRate, width: videoWidth, quality: 0.8 });
+
+    // Server settings win over the props; read by the capture loop via ref
+    useEffect(() => {
+        captureRef.current = {
+            fps:     captureSettings?.fps     || frameRate,
+            width:   captureSettings?.width   || videoWidth,
+            quality: captureSettings?.quality ? captureSettings.quality / 100 : 0.8,
+        };
+    }, [captureSettings, frameRate, videoWidth]);
 
     // ========================================================================
     // STATE
@@ -80,26 +167,35 @@ const ProctorFeed = ({
 
         if (!video || !canvas || video.readyState !== video.HAVE_ENOUGH_DATA) return;
 
+        const { fps, width, quality } = captureRef.current;
         const now              = Date.now();
-        const minFrameInterval = 1000 / frameRate;
+        const minFrameInterval = 1000 / fps;
         if (now - lastFrameTimeRef.current < minFrameInterval) return;
         lastFrameTimeRef.current = now;
 
         try {
             const ctx = canvas.getContext('2d');
-            canvas.width  = videoWidth;
-            canvas.height = Math.round((video.videoHeight / video.videoWidth) * videoWidth);
+            canvas.width  = width;
+            canvas.height = Math.round((video.videoHeight / video.videoWidth) * width);
             ctx.drawImage(video, 0, 0, canvas.width, canvas.height);
 
-            const frameData = canvas.toDataURL('image/jpeg', 0.8);
-            if (onFrame) {
-                const success = onFrame(frameData);
+            // JPEG Blob: sent as-is on the binary protocol (no base64 string)
+            canvas.toBlob((blob) => {
+                if (!blob || !onFrame) return;
+                const success = onFrame(blob);
                 if (success !== false) setFrameCount(prev => prev + 1);
-            }
+            }, 'image/jpeg', quality);
         } catch (error) {
             console.error('❌ Error capturing frame:', error);
         }
-    }, [onFrame, frameRate, videoWidth]);
+    }, [onFrame]);
+
+    const startCaptureLoop = useCallback(() => {
+        if (intervalRef.current) clearInterval(intervalRef.current);
+        const ms = 1000 / captureRef.current.fps;
+        intervalRef.current = setInterval(captureFrame, ms);
+        return ms;
+    }, [captureFrame]);
 
     // ========================================================================
     // START CAMERA
@@ -140,10 +236,8 @@ const ProctorFeed = ({
                     console.log('✅ Camera ready');
 
                     // Start frame capture ONLY after camera is confirmed ready
-                    if (intervalRef.current) clearInterval(intervalRef.current);
-                    const ms = 1000 / frameRate;
-                    intervalRef.current = setInterval(captureFrame, ms);
-                    console.log(`📸 Frame capture started at ${frameRate} FPS (${ms}ms)`);
+                    const ms = startCaptureLoop();
+                    console.log(`📸 Frame capture started at ${captureRef.current.fps} FPS (${ms}ms)`);
                 };
             }
 
@@ -178,9 +272,7 @@ const ProctorFeed = ({
                                 setCameraReady(true);
                                 setCameraError(null);
 
-                                if (intervalRef.current) clearInterval(intervalRef.current);
-                                const ms = 1000 / frameRate;
-                                intervalRef.current = setInterval(captureFrame, ms);
+                                startCaptureLoop();
                                 console.log('✅ Camera ready after retry');
                             };
                         }
@@ -195,7 +287,16 @@ const ProctorFeed = ({
                 setCameraError(`Camera error: ${err.message}`);
             }
         }
-    }, [killAllStreams, captureFrame, frameRate, videoWidth, videoHeight]);
+    }, [killAllStreams, startCaptureLoop, videoWidth, videoHeight]);
+
+    // ========================================================================
+    // EFFECT — follow capture rate changes while capturing
+    // ========================================================================
+    useEffect(() => {
+        if (!intervalRef.current) return;
+        const ms = startCaptureLoop();
+        console.log(`📸 Frame capture now at ${captureRef.current.fps} FPS (${ms}ms)`);
+    }, [captureSettings, frameRate, startCaptureLoop]);
 
     // ========================================================================
     // STOP CAMERA
@@ -272,9 +373,31 @@ const ProctorFeed = ({
         };
 
         img.onerror = err => console.error('❌ Overlay image load error:', err);
-        img.src = `data:image/jpeg;base64,${visualization}`;
+        // Binary protocol delivers an object URL, JSON protocol base64
+        img.src = visualization.startsWith('blob:')
+            ? visualization
+            : `data:image/jpeg;base64,${visualization}`;
     }, [visualization]);
 
+    // ========================================================================
+    // EFFECT — vector overlay (drawn locally, no server-rendered image)
+    // ========================================================================
+    useEffect(() => {
+        const canvas = overlayCanvasRef.current;
+        const video  = videoRef.current;
+        if (!canvas) return;
+
+        const ctx = canvas.getContext('2d');
+        if (!overlay) {
+            ctx.clearRect(0, 0, canvas.width, canvas.height);
+            return;
+        }
+
+        canvas.width  = video?.videoWidth  || videoWidth;
+        canvas.height = video?.videoHeight || videoHeight;
+        drawOverlay(ctx, overlay, canvas.width, canvas.height);
+    }, [overlay, videoWidth, videoHeight]);
+
     // ========================================================================
     // RENDER
     // ========================================================================
@@ -10,10 +10,53 @@
  *    → state updates inside ws.onclose were triggering re-renders which
  *      re-created connectWebSocket → infinite reconnect storm
  * 4. Cleanup useEffect now calls stopProctoring reliably
+ *
+ * Wire protocol (negotiated via WebSocket subprotocol):
+ * - binary: raw JPEG frames up, struct-framed results down with the
+ *   visualization as raw JPEG bytes (no base64 in either direction)
+ * - json:   legacy {"frame": base64} / JSON results, used as fallback
+ *
+ * Server-driven capture (?capture=server): the server sends
+ * {"type": "capture_settings", fps, width, quality} on connect and whenever
+ * its load changes; they are exposed as `captureSettings` for the capture
+ * loop (ProctorFeed), so frames the server would not analyze are never sent.
  */
 
 import { useState, useRef, useEffect, useCallback } from 'react';
 
+const BINARY_SUBPROTOCOL = 'immersia.proctor.v1.binary';
+const JSON_SUBPROTOCOL   = 'immersia.proctor.v1.json';
+
+// Mirrors Backend/utils/proctoring/wire.py
+// header <4sBBHII: magic "IMPR", version, kind, flags, meta_len, payload_len
+const WIRE_MAGIC     = 0x52504d49;   // "IMPR" read as little-endian uint32
+const WIRE_HEADER    = 16;
+const FLAG_VIZ_JPEG  = 0x01;
+const textDecoder    = new TextDecoder();
+
+const decodeBinaryMessage = (buffer) => {
+    const view = new DataView(buffer);
+    if (view.getUint32(0, true) !== WIRE_MAGIC) {
+        throw new Error('Unexpected proctoring message');
+    }
+    const flags      = view.getUint16(6, true);
+    const metaLen    = view.getUint32(8, true);
+    const payloadLen = view.getUint32(12, true);
+
+    const data = JSON.parse(textDecoder.decode(new Uint8Array(buffer, WIRE_HEADER, metaLen)));
+    const vizBlob = (flags & FLAG_VIZ_JPEG)
+        ? new Blob([new Uint8Array(buffer, WIRE_HEADER + metaLen, payloadLen)], { type: 'image/jpeg' })
+        : null;
+    return { data, vizBlob };
+};
+
+const blobToBase64 = (blob) => new Promise((resolve, reject) => {
+    const reader = new FileReader();
+    reader.onload  = () => resolve(reader.result.split(',')[1]);
+    reader.onerror = reject;
+    reader.readAsDataURL(blob);
+});
+
 const useProctoring = (options = {}) => {
     const {
         url                 = 'ws://localhost:8000/ws/proctor',
@@ -23,6 +66,11 @@ const useProctoring = (options = {}) => {
         autoReconnect       = true,
         reconnectDelay      = 2000,
         maxReconnectAttempts = 5,
+        binary              = true,
+        overlayMode         = 'image',   // 'vector' → server sends overlay primitives, no viz JPEG
+        profile             = null,      // 'lite' | 'standard' | 'strict' → server-side quality tier
+        serverCapture       = true,      // let the server set capture fps / width / JPEG quality
+        quizId              = null,      // quiz attempt the server stores telemetry under (user: login session)
     } = options;
 
     // ── stable refs for options so callbacks never need them as deps ──────────
@@ -32,6 +80,11 @@ const useProctoring = (options = {}) => {
     const autoReconnectRef        = useRef(autoReconnect);
     const reconnectDelayRef       = useRef(reconnectDelay);
     const maxReconnectAttemptsRef = useRef(maxReconnectAttempts);
+    const binaryRef               = useRef(binary);
+    const overlayModeRef          = useRef(overlayMode);
+    const profileRef              = useRef(profile);
+    const serverCaptureRef        = useRef(serverCapture);
+    const quizIdRef               = useRef(quizId);
 
     useEffect(() => { urlRef.current                  = url;                  }, [url]);
     useEffect(() => { onAlertRef.current              = onAlert;              }, [onAlert]);
@@ -39,6 +92,11 @@ const useProctoring = (options = {}) => {
     useEffect(() => { autoReconnectRef.current        = autoReconnect;        }, [autoReconnect]);
     useEffect(() => { reconnectDelayRef.current       = reconnectDelay;       }, [reconnectDelay]);
     useEffect(() => { maxReconnectAttemptsRef.current = maxReconnectAttempts; }, [maxReconnectAttempts]);
+    useEffect(() => { binaryRef.current               = binary;               }, [binary]);
+    useEffect(() => { overlayModeRef.current          = overlayMode;          }, [overlayMode]);
+    useEffect(() => { profileRef.current              = profile;              }, [profile]);
+    useEffect(() => { serverCaptureRef.current        = serverCapture;        }, [serverCapture]);
+    useEffect(() => { quizIdRef.current               = quizId;               }, [quizId]);
 
     // ── state ─────────────────────────────────────────────────────────────────
     const [isProctoring,      setIsProctoring     ] = useState(false);
@@ -46,6 +104,7 @@ const useProctoring = (options = {}) => {
     const [behaviorStatus,    setBehaviorStatus   ] = useState('Not started');
     const [devicesDetected,   setDevicesDetected  ] = useState([]);
     const [visualization,     setVisualization    ] = useState('');
+    const [overlay,           setOverlay          ] = useState(null);
     const [stats,             setStats            ] = useState({
         numFaces: 0, gazeHorizontal: 0, gazeVertical: 0,
         ear: 0, headPitch: 0, headYaw: 0, headRoll: 0,
@@ -54,6 +113,7 @@ const useProctoring = (options = {}) => {
     });
     const [lastAlert,         setLastAlert        ] = useState(null);
     const [reconnectAttempts, setReconnectAttempts] = useState(0);
+    const [captureSettings,   setCaptureSettings  ] = useState(null);   // { fps, width, quality } from the server
 
     // ── refs ──────────────────────────────────────────────────────────────────
     const wsRef                = useRef(null);
@@ -62,6 +122,22 @@ const useProctoring = (options = {}) => {
     const isRunningRef         = useRef(false);          // ← FIX 1: guard flag
     const reconnectCountRef    = useRef(0);              // ← FIX 3: ref not state
     const isProctoringRef      = useRef(false);          // mirrors state for ws callbacks
+    const vizUrlRef            = useRef(null);           // object URL of last binary viz
+
+    const setVisualizationBlob = useCallback((blob) => {
+        const nextUrl = URL.createObjectURL(blob);
+        if (vizUrlRef.current) URL.revokeObjectURL(vizUrlRef.current);
+        vizUrlRef.current = nextUrl;
+        setVisualization(nextUrl);
+    }, []);
+
+    const clearVisualization = useCallback(() => {
+        if (vizUrlRef.current) {
+            URL.revokeObjectURL(vizUrlRef.current);
+            vizUrlRef.current = null;
+        }
+        setVisualization('');
+    }, []);
 
     // ── WebSocket connection ──────────────────────────────────────────────────
     // FIX 2: empty dep array + read everything from refs → stable function,
@@ -81,10 +157,23 @@ const useProctoring = (options = {}) => {
         setConnectionStatus('connecting');
 
         try {
-            const ws = new WebSocket(urlRef.current);
+            const protocols = binaryRef.current
+                ? [BINARY_SUBPROTOCOL, JSON_SUBPROTOCOL]
+                : [JSON_SUBPROTOCOL];
+            const params = [];
+            if (overlayModeRef.current === 'vector') params.push('overlay=vector');
+            if (profileRef.current) params.push(`profile=${encodeURIComponent(profileRef.current)}`);
+            if (serverCaptureRef.current) params.push('capture=server');
+            if (quizIdRef.current) params.push(`quiz_id=${encodeURIComponent(quizIdRef.current)}`);
+            let wsUrl = urlRef.current;
+            if (params.length) {
+                wsUrl += `${wsUrl.includes('?') ? '&' : '?'}${params.join('&')}`;
+            }
+            const ws = new WebSocket(wsUrl, protocols);
+            ws.binaryType = 'arraybuffer';
 
             ws.onopen = () => {
-                console.log('✅ Proctoring WebSocket connected');
+                console.log(`✅ Proctoring WebSocket connected (${ws.protocol || 'json'})`);
                 setConnectionStatus('connected');
                 reconnectCountRef.current = 0;
                 setReconnectAttempts(0);
@@ -92,7 +181,20 @@ const useProctoring = (options = {}) => {
 
             ws.onmessage = (event) => {
                 try {
-                    const data = JSON.parse(event.data);
+                    let data;
+                    if (event.data instanceof ArrayBuffer) {
+                        const decoded = decodeBinaryMessage(event.data);
+                        data = decoded.data;
+                        if (decoded.vizBlob) setVisualizationBlob(decoded.vizBlob);
+                    } else {
+                        data = JSON.parse(event.data);
+                    }
+
+                    if (data.type === 'capture_settings') {
+                        console.log(`📷 Capture settings: ${data.fps} FPS, ${data.width}px, quality ${data.quality}`);
+                        setCaptureSettings({ fps: data.fps, width: data.width, quality: data.quality });
+                        return;
+                    }
 
                     if (data.error) {
                         console.error('❌ Proctoring server error:', data.error);
@@ -102,7 +204,8 @@ const useProctoring = (options = {}) => {
 
                     if (data.behavior_status) setBehaviorStatus(data.behavior_status);
                     if (data.devices_detected) setDevicesDetected(data.devices_detected);
-                    if (data.viz)              setVisualization(data.viz);
+                    if (typeof data.viz === 'string') setVisualization(data.viz);
+                    if (data.overlay)          setOverlay(data.overlay);
 
                     if (data.details) {
                         setStats({
@@ -176,24 +279,38 @@ const useProctoring = (options = {}) => {
     }, []); // ← stable — reads everything via refs
 
     // ── frame transmission ────────────────────────────────────────────────────
+    // Accepts a JPEG Blob (preferred) or a data URL string.
     const sendFrame = useCallback((frameData) => {
-        if (!wsRef.current || wsRef.current.readyState !== WebSocket.OPEN) {
+        const ws = wsRef.current;
+        if (!ws || ws.readyState !== WebSocket.OPEN) {
             return false;
         }
 
         if (isSendingRef.current) return false;
 
+        const sendJson = (base64Frame) => ws.send(JSON.stringify({
+            frame:     base64Frame,
+            timestamp: Date.now(),
+        }));
+
         try {
             isSendingRef.current = true;
 
-            const cleanFrame = frameData.includes(',')
-                ? frameData.split(',')[1]
-                : frameData;
-
-            wsRef.current.send(JSON.stringify({
-                frame:     cleanFrame,
-                timestamp: Date.now(),
-            }));
+            if (frameData instanceof Blob) {
+                if (ws.protocol === BINARY_SUBPROTOCOL) {
+                    ws.send(frameData);           // raw JPEG, no base64
+                } else {
+                    // JSON fallback: base64 once, asynchronously
+                    blobToBase64(frameData)
+                        .then(b64 => { if (ws.readyState === WebSocket.OPEN) sendJson(b64); })
+                        .catch(error => console.error('❌ Error encoding frame:', error));
+                }
+            } else {
+                const cleanFrame = frameData.includes(',')
+                    ? frameData.split(',')[1]
+                    : frameData;
+                sendJson(cleanFrame);
+            }
 
             isSendingRef.current = false;
             return true;
@@ -246,13 +363,15 @@ const useProctoring = (options = {}) => {
 
         setConnectionStatus('disconnected');
         setBehaviorStatus('Stopped');
-        setVisualization('');
+        clearVisualization();
+        setOverlay(null);
         setDevicesDetected([]);
         setLastAlert(null);
+        setCaptureSettings(null);
         setReconnectAttempts(0);
         reconnectCountRef.current = 0;
         isSendingRef.current      = false;
-    }, []);
+    }, [clearVisualization]);
 
     const restartConnection = useCallback(() => {
         console.log('🔄 Manually restarting connection...');
@@ -274,6 +393,10 @@ const useProctoring = (options = {}) => {
             if (reconnectTimeoutRef.current) {
                 clearTimeout(reconnectTimeoutRef.current);
             }
+            if (vizUrlRef.current) {
+                URL.revokeObjectURL(vizUrlRef.current);
+                vizUrlRef.current = null;
+            }
         };
     }, []);
 
@@ -284,9 +407,11 @@ const useProctoring = (options = {}) => {
         behaviorStatus,
         devicesDetected,
         visualization,
+        overlay,
         stats,
         lastAlert,
         reconnectAttempts,
+        captureSettings,
 
         startProctoring,
         stopProctoring,
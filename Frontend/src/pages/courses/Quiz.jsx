@@ -20,7 +20,7 @@ const getCsrfToken = () => {
   return match ? decodeURIComponent(match[1]) : null;
 };
 
-const Quiz = ({ questions: propQuestions, quizId, userId, projectId }) => {
+const Quiz = ({ questions: propQuestions, quizId, userId, projectId, proctoringProfile }) => {
   const { courseId } = useParams();
   const navigate = useNavigate();
   const location = useLocation();
@@ -379,13 +379,22 @@ const Quiz = ({ questions: propQuestions, quizId, userId, projectId }) => {
     behaviorStatus,
     devicesDetected,
     visualization,
+    overlay,
     stats,
     startProctoring,
     stopProctoring,
-    sendFrame
+    sendFrame,
+    captureSettings
   } = useProctoring({
     onAlert: handleAlert,
-    frameRate: 5
+    frameRate: 5,
+    overlayMode: 'vector',
+    // Project quizzes count towards the attempt freeze → strict proctoring;
+    // locally scored course quizzes are low stakes
+    profile: proctoringProfile || (quizId ? 'strict' : 'lite'),
+    // Telemetry of this attempt is stored under the quiz (and the logged-in
+    // user, taken from the session) for review
+    quizId
   });
 
   // ========================================================================
@@ -892,6 +901,8 @@ const Quiz = ({ questions: propQuestions, quizId, userId, projectId }) => {
               isProctoring={isProctoring}
               onFrame={sendFrame}
               visualization={visualization}
+              overlay={overlay}
+              captureSettings={captureSettings}
             />
 
             {chances < 3 && (